@@ -43,7 +43,6 @@ a = Analysis(
         'transformers',
         'cv2',
         'sklearn',
-        'skimage',
         'PIL',
         'numpy',
         'psycopg2',
@@ -1,23 +1,16 @@
 """Base thumbnail viewer: loads images (incl. common RAWs), builds thumbnails,
 tracks selection, and notifies linked viewers (EXIF/score/filmstrip/faces)."""
 
-# stdlib first
-import os
-from io import BytesIO
-
 # third-party
 import ttkbootstrap as ttk
 from PIL import Image, ImageTk
 import rawpy
 
-# --- Compatibility shims (minimal) -------------------------------------------
+# local
+from image_context import is_raw, open_image
+from thumbnail_cache import THUMB_BG, get_thumbnail_cache, make_uniform_thumbnail
 
-# Pillow resampling compatibility (avoid E1101 and always define a value)
-try:
-    RESAMPLE_LANCZOS = Image.Resampling.LANCZOS  # type: ignore[attr-defined]
-except (NameError, AttributeError):
-    # Fall back to LANCZOS or BICUBIC; final fallback uses 0 (NEAREST).
-    RESAMPLE_LANCZOS = getattr(Image, "LANCZOS", getattr(Image, "BICUBIC", 0))
+# --- Compatibility shims (minimal) -------------------------------------------
 
 # rawpy exception compatibility (avoid E1101 on some builds)
 try:
@@ -28,6 +21,9 @@ except AttributeError:
         # no pass needed; docstring provides the body
         ...
 
+# Fill colour of the placeholder shown until a thumbnail has loaded
+PLACEHOLDER_BG = (45, 45, 45)
+
 class BaseThumbnailViewer(  # pylint: disable=too-many-ancestors
     ttk.Frame
 ):
@@ -49,57 +45,36 @@ class BaseThumbnailViewer(  # pylint: disable=too-many-ancestors
 
     def _open_image(self, file_path):
         """Open an image path and return a PIL Image. Handles common RAWs via rawpy."""
-        raw_extensions = {
-            ".cr2", ".nef", ".arw", ".dng", ".rw2",
-            ".orf", ".raf", ".srw", ".pef",
-        }
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext in raw_extensions:
-            with rawpy.imread(file_path) as raw:
-                thumb = raw.extract_thumb()
-                # Avoid direct enum reference to silence E1101 on some rawpy versions
-                is_jpeg = getattr(getattr(thumb, "format", None), "name", None) == "JPEG"
-                if is_jpeg:
-                    return Image.open(BytesIO(thumb.data))
-                return Image.fromarray(thumb.data)
-        return Image.open(file_path)
+        return open_image(file_path, raw=is_raw(file_path))
 
-    def create_uniform_thumbnail_pil(self, file_path, bg_color=(30, 30, 30)):
+    def create_uniform_thumbnail_pil(
+        self, file_path, bg_color=THUMB_BG, content_hash=None, size=None
+    ):
         """
-        Create a square, letterboxed thumbnail as a PIL.Image with side = self.thumb_size.
+        Create a square, letterboxed thumbnail as a PIL.Image with side = size
+        (default self.thumb_size).
         Preserves aspect ratio (no stretching) and centers on a background.
-        Returns None on error.
+        Thumbnails with the default background come from the on-disk thumbnail
+        cache (keyed by content_hash when known) and are rendered into it on a miss.
+        Safe to call from a worker thread. Returns None on error.
         """
+        size = size or self.thumb_size
         try:
-            img = self._open_image(file_path)
-            # Ensure RGB (avoid issues with palette/LA modes)
-            if img.mode not in ("RGB", "RGBA"):
-                img = img.convert("RGB")
-
-            # Scale to fit within the square
-            size = int(self.thumb_size)
-            img_copy = img.copy()
-            img_copy.thumbnail((size, size), RESAMPLE_LANCZOS)
-
-            # Create square canvas and paste centered
-            canvas = Image.new("RGB", (size, size), color=bg_color)
-            x = (size - img_copy.width) // 2
-            y = (size - img_copy.height) // 2
-            if img_copy.mode == "RGBA":
-                canvas.paste(img_copy, (x, y), mask=img_copy.split()[-1])
-            else:
-                canvas.paste(img_copy, (x, y))
-            return canvas
+            if tuple(bg_color) == THUMB_BG:
+                return get_thumbnail_cache().thumbnail(file_path, size, key=content_hash)
+            return make_uniform_thumbnail(self._open_image(file_path), size, bg_color)
         except (OSError, RawpyLibRawError, ValueError) as exc:
             # OSError covers PIL IO/decoding.
             # RawpyLibRawError covers RAW decoding issues; ValueError for malformed data.
             print(f"Failed to create uniform thumbnail for {file_path}: {exc}")
             return None
 
-    def load_thumbnail(self, file_path):
+    def load_thumbnail(self, file_path, content_hash=None):
         """Return ImageTk.PhotoImage uniform square thumbnail for display (or None on error)."""
         try:
-            pil_thumb = self.create_uniform_thumbnail_pil(file_path)
+            pil_thumb = self.create_uniform_thumbnail_pil(
+                file_path, content_hash=content_hash
+            )
             if pil_thumb is None:
                 return None
             return ImageTk.PhotoImage(pil_thumb)
@@ -107,6 +82,16 @@ class BaseThumbnailViewer(  # pylint: disable=too-many-ancestors
             print(f"Failed to load thumbnail for {file_path}: {exc}")
             return None
 
+    def placeholder_image(self, size=None):
+        """Plain square shown while a thumbnail is still loading."""
+        size = int(size or self.thumb_size)
+        cache = getattr(self, "_placeholders", None)
+        if cache is None:
+            cache = self._placeholders = {}
+        if size not in cache:
+            cache[size] = ImageTk.PhotoImage(Image.new("RGB", (size, size), PLACEHOLDER_BG))
+        return cache[size]
+
     def clear_thumbnails(self):
         """Destroy all thumbnail labels and clear image references."""
         for lbl in self.labels:
@@ -0,0 +1,77 @@
+# bursts.py
+"""Capture-time helpers for finding burst shots among imported photos."""
+
+from datetime import datetime
+
+# Tag names as stored in exif_data: piexif names for JPEG/TIFF, exifread
+# "IFD Name" keys for RAW files
+DATETIME_TAGS = ("DateTimeOriginal", "EXIF DateTimeOriginal")
+SUBSEC_TAGS = ("SubSecTimeOriginal", "EXIF SubSecTimeOriginal")
+SERIAL_TAGS = (
+    "BodySerialNumber",
+    "EXIF BodySerialNumber",
+    "MakerNote SerialNumber",
+    "MakerNote InternalSerialNumber",
+)
+MODEL_TAGS = ("Model", "Image Model")
+CAPTURE_TAGS = DATETIME_TAGS + SUBSEC_TAGS + SERIAL_TAGS + MODEL_TAGS
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _first(tags, names):
+    for name in names:
+        value = str(tags.get(name) or "").strip().strip("\x00").strip()
+        if value:
+            return value
+    return None
+
+
+def capture_time(tags):
+    """
+    Seconds since the epoch (camera local time) from EXIF tags, including
+    sub-second precision when SubSecTimeOriginal is present.
+
+    :param tags: {tag_name: value} as stored in exif_data
+    :return: float, or None when the photo has no usable DateTimeOriginal
+    """
+    stamp = _first(tags, DATETIME_TAGS)
+    if not stamp:
+        return None
+    try:
+        taken = datetime.strptime(stamp[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    seconds = (taken - _EPOCH).total_seconds()
+    subsec = _first(tags, SUBSEC_TAGS)
+    if subsec and subsec.isdigit():
+        seconds += float("0." + subsec)
+    return seconds
+
+
+def camera_key(tags):
+    """Body serial number, else camera model, else None (unknown camera)."""
+    return _first(tags, SERIAL_TAGS) or _first(tags, MODEL_TAGS)
+
+
+def burst_pairs(shots, window):
+    """
+    Pairs of shots from the same camera taken at most `window` seconds apart.
+
+    Shots are sorted by (camera, time) and each one is only paired with the
+    shots that follow it inside the window, so a multi-day shoot costs about
+    n * (shots per window) comparisons instead of n^2.
+
+    :param shots: iterable of (item, capture_time, camera_key)
+    :param window: maximum gap in seconds
+    :return: generator of (item, item)
+    """
+    ordered = sorted(shots, key=lambda s: (s[2] or "", s[1]))
+    for i, (item, when, camera) in enumerate(ordered):
+        j = i + 1
+        while j < len(ordered):
+            other, other_when, other_camera = ordered[j]
+            if other_camera != camera or other_when - when > window:
+                break
+            yield item, other
+            j += 1
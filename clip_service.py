@@ -0,0 +1,136 @@
+# clip_service.py
+
+import gc
+import threading
+
+import torch
+import clip
+
+
+class ClipModelService:
+    """
+    Process-wide holder for the CLIP model.
+
+    The model is loaded on first use (or by warm_up() in the background) and
+    shared by every PhotoAnalyzer, so it is only ever in memory once.
+    Call unload() to free it; the next use loads it again.
+
+    torch's intra-op thread count is process-wide, so it is only changed
+    here, when the service is given torch_threads (see configure).
+    """
+
+    MODEL_NAME = "ViT-B/32"
+
+    def __init__(
+        self, model_name: str = MODEL_NAME, device: str = None, torch_threads: int = None
+    ):
+        self.model_name = model_name
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.torch_threads = torch_threads
+        self._model = None
+        self._preprocess = None
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    def configure(self, device: str = None, torch_threads: int = None):
+        """
+        Apply a caller's settings to the shared service. The device is fixed
+        when the service is created; torch_threads can be set once, and takes
+        effect when the model loads (immediately if it already has).
+
+        Raises:
+            ValueError: if a setting conflicts with the one already in use.
+        """
+        if device is not None and device != self.device:
+            raise ValueError(
+                f"CLIP service already uses device {self.device!r}, not {device!r}"
+            )
+        if torch_threads is None or torch_threads == self.torch_threads:
+            return
+        if self.torch_threads is not None:
+            raise ValueError(
+                f"CLIP service already uses {self.torch_threads} torch threads, "
+                f"not {torch_threads}"
+            )
+        with self._lock:
+            self.torch_threads = torch_threads
+            if self._model is not None:
+                torch.set_num_threads(torch_threads)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        """The CLIP model, loaded on first access."""
+        return self.load()[0]
+
+    @property
+    def preprocess(self):
+        """The CLIP image preprocessing transform, loaded on first access."""
+        return self.load()[1]
+
+    def load(self):
+        """
+        Load the model if needed.
+
+        Returns:
+            tuple: (model, preprocess)
+        """
+        with self._lock:
+            if self._model is None:
+                if self.torch_threads:
+                    torch.set_num_threads(self.torch_threads)
+                print(f"Loading CLIP model {self.model_name} on {self.device}...")
+                self._model, self._preprocess = clip.load(
+                    self.model_name, device=self.device
+                )
+                self._model.eval()
+            return self._model, self._preprocess
+
+    def warm_up(self):
+        """
+        Start loading the model on a background thread so the first
+        embedding request does not pay the load time.
+
+        Returns:
+            threading.Thread: The loader thread (already started).
+        """
+        if self._warmup_thread is None or not self._warmup_thread.is_alive():
+            self._warmup_thread = threading.Thread(
+                target=self.load, name="clip-warmup", daemon=True
+            )
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    def unload(self):
+        """Release the model so its memory can be reclaimed."""
+        with self._lock:
+            if self._model is None:
+                return
+            self._model = None
+            self._preprocess = None
+        gc.collect()
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+        print(f"Unloaded CLIP model {self.model_name}")
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_clip_service(device: str = None, torch_threads: int = None) -> ClipModelService:
+    """
+    Return the shared ClipModelService, creating it on first call. Later
+    calls pass their settings to ClipModelService.configure, which raises
+    ValueError if they conflict with the ones already in use.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ClipModelService(device=device, torch_threads=torch_threads)
+        else:
+            _service.configure(device, torch_threads)
+        return _service
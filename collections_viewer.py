@@ -3,10 +3,13 @@ import os
 import tkinter as tk  # <-- NEW
 from tkinter import messagebox  # <-- NEW
 import ttkbootstrap as ttk
-from PIL import Image, ImageTk, UnidentifiedImageError
 from main_viewer import MainViewer
+from thumbnail_cache import ThumbnailCache, get_thumbnail_cache
+from thumbnail_loader import ThumbnailLoader
 
 THUMBNAIL_SIZE = (90, 90)
+# Smallest pre-rendered grid thumbnail that covers the card
+COVER_SOURCE_SIZE = min(s for s in ThumbnailCache.GRID_SIZES if s >= THUMBNAIL_SIZE[0])
 
 
 class CollectionsViewer(MainViewer):
@@ -26,6 +29,7 @@ class CollectionsViewer(MainViewer):
         self.collection_rows = []
         self.collection_ids = []
         self._thumbnail_cache = {}  # {collection_id: PhotoImage}
+        self.thumb_loader = ThumbnailLoader(self, workers=2)
         self.selected_idx = None
 
         # ---- NEW: context menu state for deleting a collection ----
@@ -77,8 +81,11 @@ class CollectionsViewer(MainViewer):
 
         self.refresh_collections()
 
-    def get_thumbnail(self, coll: dict) -> str | None:
-        """Return a filesystem path to a cover image for this collection."""
+    def get_thumbnail(self, coll: dict) -> tuple[str, str | None] | None:
+        """
+        Return (filesystem path, stored content hash) of a cover image for
+        this collection, or None.
+        """
         try:
             row = self.db.get_first_photo_for_collection(coll["id"])
             if not row:
@@ -88,27 +95,34 @@ class CollectionsViewer(MainViewer):
                 return None
             p = os.path.abspath(p)
             if os.path.exists(p):
-                return p
+                return p, row.get("content_hash")
         except Exception as e:
             print(
                 f"[thumb] Failed to fetch thumbnail path for coll {coll.get('id')}: {e}"
             )
         return None
 
-    def _load_thumbnail(self, path: str) -> ImageTk.PhotoImage:
-        """Open, thumbnail, and wrap as PhotoImage."""
-        try:
-            with Image.open(path) as img:
-                img = img.convert("RGB")
-                img.thumbnail(THUMBNAIL_SIZE)
-                return ImageTk.PhotoImage(img)
-        except UnidentifiedImageError:
-            raise
-        except Exception:
-            raise
+    def _load_thumbnail(self, path: str, content_hash=None):
+        """Load a cached grid thumbnail and shrink it to card size. Runs on a loader thread."""
+        img = get_thumbnail_cache().thumbnail(path, COVER_SOURCE_SIZE, key=content_hash)
+        img = img.convert("RGB")
+        img.thumbnail(THUMBNAIL_SIZE)
+        return img
+
+    def _on_thumbnail_loaded(self, thumb_lbl, coll_id, ph):
+        """Loader callback: show a collection cover once it has been loaded."""
+        if not thumb_lbl.winfo_exists():
+            return
+        if ph is None:
+            thumb_lbl.configure(text="[Error loading thumbnail]")
+            return
+        self._thumbnail_cache[coll_id] = ph
+        thumb_lbl.configure(image=ph, text="")
+        thumb_lbl.image = ph  # keep reference
 
     def refresh_collections(self):
         """Reload collection list from DB and (re)build the UI rows."""
+        self.thumb_loader.cancel_all()
         for row in self.collection_rows:
             row.destroy()
         self.collection_rows.clear()
@@ -138,18 +152,23 @@ class CollectionsViewer(MainViewer):
             thumb_lbl = ttk.Label(card)
             thumb_lbl.pack(side="top")
 
-            path = self.get_thumbnail(coll)
-            if path:
-                try:
-                    ph = self._thumbnail_cache.get(coll["id"])
-                    if ph is None:
-                        ph = self._load_thumbnail(path)
-                        self._thumbnail_cache[coll["id"]] = ph
+            cover = self.get_thumbnail(coll)
+            if cover:
+                ph = self._thumbnail_cache.get(coll["id"])
+                if ph is not None:
                     thumb_lbl.configure(image=ph)
                     thumb_lbl.image = ph  # keep reference
-                except Exception as e:
-                    print(f"[thumb] Error loading '{path}' for coll {coll['id']}: {e}")
-                    thumb_lbl.configure(text="[Error loading thumbnail]")
+                else:
+                    # Cards show up immediately; covers fill in as they load
+                    thumb_lbl.configure(text="[Loading…]")
+                    self.thumb_loader.request(
+                        coll["id"],
+                        lambda c=cover: self._load_thumbnail(*c),
+                        lambda ph, lbl=thumb_lbl, cid=coll["id"]: (
+                            self._on_thumbnail_loaded(lbl, cid, ph)
+                        ),
+                        priority=idx,
+                    )
             else:
                 thumb_lbl.configure(text="[No thumbnail]")
 
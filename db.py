@@ -1,8 +1,11 @@
 import os
 import sys
+import threading
+from contextlib import contextmanager
 import psycopg2
 from psycopg2 import sql, OperationalError
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 
 load_dotenv()  # loads DB credentials from .env
@@ -13,27 +16,65 @@ def resource_path(filename):
         return os.path.join(sys._MEIPASS, filename)
     return os.path.join(os.path.dirname(__file__), filename)
 
+def _to_signed64(value: int) -> int:
+    """Map an unsigned 64-bit hash onto Postgres' signed BIGINT range."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+# Metric columns of photo_metrics: the raw value is stored in <name>, the
+# scaled one in <name>_scaled. Keep in step with image_metrics.METRICS.
+PHOTO_METRICS = (
+    "laplacian_var",
+    "sobel_energy",
+    "noise",
+    "brightness_mean",
+    "brightness_median",
+    "saturation_mean",
+    "saturation_std",
+    "contrast_std",
+    "contrast_range",
+    "colorfulness",
+    "entropy",
+    "width",
+    "height",
+    "aspect_ratio",
+)
+_METRIC_COLUMNS = PHOTO_METRICS + tuple(f"{name}_scaled" for name in PHOTO_METRICS)
+
+
 class Database:
+    """
+    Thread-safe access to the AutoCull database.
+
+    Connections come from a pool sized by DB_POOL_MIN / DB_POOL_MAX. Every
+    fetch()/execute() checks a connection out for that one statement (in
+    autocommit mode) and returns it, so the Tk thread and the import,
+    duplicate and suggestion threads can all query at once. When every
+    connection is busy, callers wait for one instead of failing. Use
+    transaction() to run several statements on one connection atomically.
+    """
+
     def __init__(self):
         dbname = os.getenv("DB_NAME", "autocull_db")
-        user = os.getenv("DB_USER", "postgres")
-        password = os.getenv("DB_PASS", "admin")
-        host = os.getenv("DB_HOST", "localhost")
-        port = os.getenv("DB_PORT", "5432")
+        params = dict(
+            dbname=dbname,
+            user=os.getenv("DB_USER", "postgres"),
+            password=os.getenv("DB_PASS", "admin"),
+            host=os.getenv("DB_HOST", "localhost"),
+            port=os.getenv("DB_PORT", "5432"),
+        )
+        self.pool_min = max(1, int(os.getenv("DB_POOL_MIN", "1")))
+        self.pool_max = max(self.pool_min, int(os.getenv("DB_POOL_MAX", "8")))
         try:
-            self.conn = psycopg2.connect(
-                dbname=dbname, user=user, password=password, host=host, port=port
-            )
+            self._pool = ThreadedConnectionPool(self.pool_min, self.pool_max, **params)
         except OperationalError as e:
             if f'database "{dbname}" does not exist' in str(e):
                 # Connect to default database and create the target database
-                conn = psycopg2.connect(
-                    dbname="postgres",
-                    user=user,
-                    password=password,
-                    host=host,
-                    port=port,
-                )
+                conn = psycopg2.connect(**dict(params, dbname="postgres"))
                 conn.autocommit = True
                 with conn.cursor() as cur:
                     cur.execute(
@@ -41,23 +82,131 @@ class Database:
                     )
                 conn.close()
                 # Try connecting again
-                self.conn = psycopg2.connect(
-                    dbname=dbname, user=user, password=password, host=host, port=port
+                self._pool = ThreadedConnectionPool(
+                    self.pool_min, self.pool_max, **params
                 )
             else:
                 raise
-        self.conn.autocommit = True
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait
+        self._slots = threading.BoundedSemaphore(self.pool_max)
+        self._local = threading.local()  # per-thread transaction connection
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "queries": 0,
+        }
+
+    # ----------------- Connections -----------------
+    @contextmanager
+    def connection(self):
+        """
+        Check a connection out of the pool for the duration of the block.
+        Inside transaction() the transaction's connection is reused.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._stats["waits"] += 1
+            self._slots.acquire()
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._stats_lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(
+                self._stats["peak_in_use"], self._stats["in_use"]
+            )
+        try:
+            conn.autocommit = True
+            yield conn
+        finally:
+            with self._stats_lock:
+                self._stats["in_use"] -= 1
+            self._pool.putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run every fetch()/execute() in the block on one connection and commit
+        at the end; roll back if the block raises. Nested calls join the
+        outer transaction.
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield
+            return
+        with self.connection() as conn:
+            conn.autocommit = False
+            self._local.conn = conn
+            try:
+                yield
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self._local.conn = None
+                if not conn.closed:
+                    conn.autocommit = True
+
+    def pool_stats(self):
+        """
+        Snapshot of pool metrics.
+
+        :return: dict with checkouts, waits (checkouts that had to wait for a
+            free connection), in_use, peak_in_use, queries, and min/max size
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(min=self.pool_min, max=self.pool_max)
+        return stats
+
+    def close(self):
+        """Close every pooled connection."""
+        self._pool.closeall()
 
     # ----------------- Helper Methods -----------------
     def fetch(self, query, params=None):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query, params or ())
-            return cur.fetchall()
+        with self.connection() as conn:
+            self._count_query()
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params or ())
+                return cur.fetchall()
 
     def execute(self, query, params=None):
-        with self.conn.cursor() as cur:
-            cur.execute(query, params or ())
+        with self.connection() as conn:
+            self._count_query()
+            with conn.cursor() as cur:
+                cur.execute(query, params or ())
+                return True
+
+    def execute_values(self, query, rows, page_size=1000):
+        """
+        Multi-row INSERT: `query` has a single VALUES %s placeholder that is
+        expanded to up to page_size rows per statement.
+        """
+        rows = list(rows)
+        if not rows:
             return True
+        with self.connection() as conn:
+            self._count_query(-(-len(rows) // page_size))  # statements sent
+            with conn.cursor() as cur:
+                execute_values(cur, query, rows, page_size=page_size)
+                return True
+
+    def _count_query(self, n=1):
+        with self._stats_lock:
+            self._stats["queries"] += n
 
     # ----------------- Schema -----------------
     def create_schema(self, schema_file="schema.sql"):
@@ -95,13 +244,74 @@ class Database:
 
     # ----------------- Photos -----------------
     def add_photo(
-        self, collection_id: int, file_path: str, file_name: str, status="undecided"
+        self,
+        collection_id: int,
+        file_path: str,
+        file_name: str,
+        status="undecided",
+        content_hash=None,
+        analysis_version=None,
     ):
         query = """
-        INSERT INTO photos (collection_id, file_path, file_name, status)
-        VALUES (%s,%s,%s,%s) RETURNING id
+        INSERT INTO photos
+            (collection_id, file_path, file_name, status, content_hash, analysis_version)
+        VALUES (%s,%s,%s,%s,%s,%s) RETURNING id
+        """
+        return self.fetch(
+            query,
+            (collection_id, file_path, file_name, status, content_hash, analysis_version),
+        )[0]["id"]
+
+    def set_photo_content_hash(self, photo_id: int, content_hash: str):
+        """Store the content hash for a photo imported before hashes existed."""
+        self.execute(
+            "UPDATE photos SET content_hash=%s WHERE id=%s", (content_hash, photo_id)
+        )
+
+    def find_analysed_photo(self, content_hash, analysis_version):
+        """
+        Most recent photo with the same file content that was fully analysed
+        with analysis_version, for the import analysis cache.
+
+        :return: dict with id and file_path, or None on a miss
+        """
+        if not content_hash:
+            return None
+        rows = self.fetch(
+            """
+            SELECT id, file_path FROM photos
+            WHERE content_hash=%s AND analysis_version=%s
+            ORDER BY id DESC LIMIT 1
+            """,
+            (content_hash, analysis_version),
+        )
+        return rows[0] if rows else None
+
+    def copy_analysis(self, source_id, target_id):
+        """
+        Copy everything computed from a photo's file (EXIF, metrics and
+        quality score, embedding and perceptual hashes) from source_id to
+        target_id, server-side in a single round trip.
         """
-        return self.fetch(query, (collection_id, file_path, file_name, status))[0]["id"]
+        columns = ", ".join(_METRIC_COLUMNS)
+        query = f"""
+            INSERT INTO exif_data (photo_id, tag_name, tag_value)
+                SELECT %(target)s, tag_name, tag_value
+                FROM exif_data WHERE photo_id=%(source)s ORDER BY id;
+            INSERT INTO photo_metrics (photo_id, {columns}, quality_score)
+                SELECT %(target)s, {columns}, quality_score
+                FROM photo_metrics WHERE photo_id=%(source)s
+            ON CONFLICT (photo_id) DO NOTHING;
+            INSERT INTO embeddings (photo_id, embedding)
+                SELECT %(target)s, embedding
+                FROM embeddings WHERE photo_id=%(source)s
+                ORDER BY id DESC LIMIT 1;
+            INSERT INTO photo_hashes (photo_id, algorithm, version, hash)
+                SELECT %(target)s, algorithm, version, hash
+                FROM photo_hashes WHERE photo_id=%(source)s
+            ON CONFLICT (photo_id, algorithm) DO NOTHING;
+        """
+        self.execute(query, {"source": source_id, "target": target_id})
 
     def delete_photo(self, photo_id: int):
         """Delete a photo; ON DELETE CASCADE in schema removes related rows."""
@@ -150,11 +360,39 @@ class Database:
         """
         self.execute(query, (photo_id, tag_name, str(tag_value)))
 
+    def add_exif_bulk(self, rows):
+        """
+        Insert many EXIF tags in one statement.
+
+        :param rows: iterable of (photo_id, tag_name, tag_value); may span photos
+        """
+        query = "INSERT INTO exif_data (photo_id, tag_name, tag_value) VALUES %s"
+        self.execute_values(
+            query, ((pid, tag, str(value)) for pid, tag, value in rows)
+        )
+
     def get_exif(self, photo_id):
         query = "SELECT tag_name, tag_value FROM exif_data WHERE photo_id=%s"
         results = self.fetch(query, (photo_id,))
         return {row["tag_name"]: row["tag_value"] for row in results} if results else {}
 
+    def get_exif_tags(self, photo_ids, tag_names):
+        """
+        Selected EXIF tags for many photos in one query.
+
+        :return: {photo_id: {tag_name: tag_value}} for photos with any of the tags
+        """
+        if not photo_ids:
+            return {}
+        query = """
+            SELECT photo_id, tag_name, tag_value FROM exif_data
+            WHERE photo_id = ANY(%s) AND tag_name = ANY(%s)
+        """
+        tags = {}
+        for row in self.fetch(query, (list(photo_ids), list(tag_names))):
+            tags.setdefault(row["photo_id"], {})[row["tag_name"]] = row["tag_value"]
+        return tags
+
     # ----------------- Embeddings -----------------
     def add_embedding(self, photo_id, embedding):
         """Store a CLIP embedding vector for a photo."""
@@ -166,29 +404,145 @@ class Database:
             "SELECT embedding FROM embeddings WHERE photo_id=%s", (photo_id,)
         )
 
+    def get_embeddings(self, photo_ids=None, collection_id=None):
+        """
+        Latest embedding of many photos in one query, by id list or collection.
+
+        :return: {photo_id: list of floats}
+        """
+        query = """
+            SELECT DISTINCT ON (e.photo_id) e.photo_id, e.embedding
+            FROM embeddings e
+            JOIN photos p ON p.id = e.photo_id
+            WHERE TRUE
+        """
+        params = []
+        if photo_ids is not None:
+            query += " AND e.photo_id = ANY(%s)"
+            params.append(list(photo_ids))
+        if collection_id:
+            query += " AND p.collection_id=%s"
+            params.append(collection_id)
+        query += " ORDER BY e.photo_id, e.id DESC"
+        return {row["photo_id"]: row["embedding"] for row in self.fetch(query, params)}
+
     # ----------------- Scores -----------------
+    def set_photo_metrics(self, photo_id, scores, scaled_scores, quality_score=None):
+        """
+        Store all metrics of a photo (and its overall quality score) as one
+        photo_metrics row, replacing any earlier one.
+
+        :param scores: {metric: raw value}; metrics not given are stored as NULL
+        :param scaled_scores: {metric: value scaled to 0-1}
+        """
+        self.set_photo_metrics_bulk([(photo_id, scores, scaled_scores, quality_score)])
+
+    def set_photo_metrics_bulk(self, rows):
+        """
+        Upsert many photo_metrics rows, one statement per page.
+
+        :param rows: iterable of (photo_id, scores, scaled_scores, quality_score)
+        """
+        columns = ("photo_id",) + _METRIC_COLUMNS + ("quality_score",)
+        query = f"""
+            INSERT INTO photo_metrics ({", ".join(columns)}) VALUES %s
+            ON CONFLICT (photo_id) DO UPDATE SET
+                {", ".join(f"{c} = EXCLUDED.{c}" for c in columns[1:])},
+                scored_at = NOW()
+        """
+        self.execute_values(
+            query,
+            (
+                (photo_id,)
+                + tuple(scores.get(name) for name in PHOTO_METRICS)
+                + tuple(scaled_scores.get(name) for name in PHOTO_METRICS)
+                + (quality_score,)
+                for photo_id, scores, scaled_scores, quality_score in rows
+            ),
+        )
+
     def add_score(self, photo_id, score_type, value, scaled_value):
-        query = "INSERT INTO scores (photo_id, type, value, scaled_value) VALUES (%s,%s,%s,%s)"
-        self.execute(query, (photo_id, score_type, value, scaled_value))
+        """Set a single metric of a photo (prefer set_photo_metrics for all of them)."""
+        if score_type not in PHOTO_METRICS:
+            raise ValueError(f"Unknown metric: {score_type}")
+        query = sql.SQL(
+            """
+            INSERT INTO photo_metrics (photo_id, {raw}, {scaled}) VALUES (%s,%s,%s)
+            ON CONFLICT (photo_id) DO UPDATE
+            SET {raw} = EXCLUDED.{raw}, {scaled} = EXCLUDED.{scaled}
+            """
+        ).format(
+            raw=sql.Identifier(score_type),
+            scaled=sql.Identifier(f"{score_type}_scaled"),
+        )
+        self.execute(query, (photo_id, value, scaled_value))
 
     def get_scores(self, photo_id):
+        """Metrics of a photo as (type, value, scaled_value) rows (compatibility view)."""
         return self.fetch("SELECT * FROM scores WHERE photo_id=%s", (photo_id,))
 
     def get_scaled_scores(self, photo_id):
         return self.fetch("SELECT * FROM scores WHERE photo_id=%s", (photo_id,))
 
+    def get_photo_metrics(self, photo_id):
+        """The photo_metrics row of a photo as a dict, or None if it was never scored."""
+        rows = self.fetch("SELECT * FROM photo_metrics WHERE photo_id=%s", (photo_id,))
+        return rows[0] if rows else None
+
     def add_quality_score(self, photo_id, quality_score):
-        query = "INSERT INTO photo_quality (photo_id, quality_score) VALUES (%s,%s)"
+        query = """
+            INSERT INTO photo_metrics (photo_id, quality_score) VALUES (%s,%s)
+            ON CONFLICT (photo_id) DO UPDATE SET quality_score = EXCLUDED.quality_score
+        """
         self.execute(query, (photo_id, quality_score))
 
     def get_quality_score(self, photo_id):
         row = self.fetch(
-            "SELECT quality_score FROM photo_quality WHERE photo_id=%s", (photo_id,)
+            "SELECT quality_score FROM photo_metrics WHERE photo_id=%s", (photo_id,)
         )
         if row:
             return row[0]["quality_score"]
         return None
 
+    def get_quality_scores(self, photo_ids):
+        """Quality score per photo for many photos in one query.
+
+        :return: {photo_id: quality_score} for the photos that have a score
+        """
+        if not photo_ids:
+            return {}
+        query = """
+            SELECT photo_id, quality_score
+            FROM photo_metrics
+            WHERE photo_id = ANY(%s) AND quality_score IS NOT NULL
+        """
+        rows = self.fetch(query, (list(photo_ids),))
+        return {row["photo_id"]: row["quality_score"] for row in rows}
+
+    def get_ranked_photos(self, collection_id=None):
+        """Photos with their quality score, rank and suggestion in one query.
+
+        Each row is a photos row plus `quality_score` and `quality_rank`
+        (1 = best, NULL when the photo has no score), ordered best first with
+        unscored photos last.
+        """
+        query = """
+            SELECT p.*, q.quality_score,
+                CASE WHEN q.quality_score IS NOT NULL THEN
+                    ROW_NUMBER() OVER (
+                        ORDER BY q.quality_score DESC NULLS LAST, p.id
+                    )
+                END AS quality_rank
+            FROM photos p
+            LEFT JOIN photo_metrics q ON q.photo_id = p.id
+        """
+        params = None
+        if collection_id:
+            query += " WHERE p.collection_id=%s"
+            params = (collection_id,)
+        query += " ORDER BY q.quality_score DESC NULLS LAST, p.id"
+        return self.fetch(query, params)
+
     # ----------------- Styles -----------------
     def add_style(self, name, description=None):
         query = "INSERT INTO styles (name, description) VALUES (%s,%s) ON CONFLICT (name) DO NOTHING RETURNING id"
@@ -209,6 +563,75 @@ class Database:
             (photo_id,),
         )
 
+    # ----------------- Perceptual Hashes -----------------
+    def add_photo_hashes(self, rows):
+        """
+        Store (or replace) perceptual hashes.
+
+        :param rows: iterable of (photo_id, algorithm, version, hash) with the
+            hash as an unsigned 64-bit int
+        """
+        query = """
+            INSERT INTO photo_hashes (photo_id, algorithm, version, hash) VALUES %s
+            ON CONFLICT (photo_id, algorithm)
+            DO UPDATE SET version = EXCLUDED.version, hash = EXCLUDED.hash
+        """
+        self.execute_values(
+            query,
+            (
+                (pid, algorithm, version, _to_signed64(value))
+                for pid, algorithm, version, value in rows
+            ),
+        )
+
+    def get_photo_hashes(self, photo_ids, algorithms, version):
+        """
+        Stored hashes of the given algorithms (at `version`) for many photos.
+
+        :return: {photo_id: {algorithm: unsigned 64-bit hash}}; photos without
+            any current hash are absent
+        """
+        if not photo_ids:
+            return {}
+        query = """
+            SELECT photo_id, algorithm, hash FROM photo_hashes
+            WHERE photo_id = ANY(%s) AND algorithm = ANY(%s) AND version=%s
+        """
+        hashes = {}
+        for row in self.fetch(query, (list(photo_ids), list(algorithms), version)):
+            hashes.setdefault(row["photo_id"], {})[row["algorithm"]] = _to_unsigned64(
+                row["hash"]
+            )
+        return hashes
+
+    def get_grouped_photo_hashes(self, algorithms, version, method):
+        """
+        Hashes of photos that already belong to a near-duplicate group of
+        the given method, with that group, in one query. Only photos that
+        have every one of `algorithms` at `version` are returned.
+
+        :return: list of dicts with photo_id, group_id and hashes
+            ({algorithm: unsigned hash})
+        """
+        query = """
+            SELECT ndp.photo_id, MIN(ndp.group_id) AS group_id,
+                json_object_agg(h.algorithm, h.hash) AS hashes
+            FROM near_duplicate_photos ndp
+            JOIN near_duplicate_groups g ON g.id = ndp.group_id
+            JOIN photo_hashes h ON h.photo_id = ndp.photo_id
+            WHERE g.method=%s AND h.algorithm = ANY(%s) AND h.version=%s
+            GROUP BY ndp.photo_id
+            HAVING COUNT(DISTINCT h.algorithm) = %s
+        """
+        algorithms = list(algorithms)
+        rows = self.fetch(query, (method, algorithms, version, len(algorithms)))
+        for row in rows:
+            row["hashes"] = {
+                algorithm: _to_unsigned64(value)
+                for algorithm, value in row["hashes"].items()
+            }
+        return rows
+
     # ----------------- Near Duplicates -----------------
     def add_near_duplicate_group(self, method=None):
         """
@@ -216,10 +639,8 @@ class Database:
         :param method: method used to detect duplicates (e.g., 'phash')
         """
         query = "INSERT INTO near_duplicate_groups (method) VALUES (%s) RETURNING id"
-        cursor = self.conn.cursor()
         try:
-            cursor.execute(query, (method,))
-            group_id = cursor.fetchone()[0]
+            group_id = self.fetch(query, (method,))[0]["id"]
             print(
                 f"[DEBUG] Created near-duplicate group_id={group_id}, method={method}"
             )
@@ -229,8 +650,6 @@ class Database:
                 f"[ERROR] Failed to create near-duplicate group (method={method}): {e}"
             )
             return None
-        finally:
-            cursor.close()
 
     def assign_photo_to_near_duplicate_group(self, group_id, photo_id):
         """
@@ -243,35 +662,100 @@ class Database:
             VALUES (%s, %s)
             ON CONFLICT DO NOTHING
         """
-        cursor = self.conn.cursor()
         try:
-            cursor.execute(query, (group_id, photo_id))
+            self.execute(query, (group_id, photo_id))
             print(f"[DEBUG] Assigned photo_id={photo_id} to group_id={group_id}")
         except Exception as e:
             print(
                 f"[ERROR] Failed to assign photo_id={photo_id} to group_id={group_id}: {e}"
             )
-        finally:
-            cursor.close()
 
-    def get_near_duplicate_groups(self):
+    def get_near_duplicate_groups(
+        self, collection_id=None, method=None, photo_id=None, limit=None, after_id=None
+    ):
         """
-        Retrieve all near-duplicate groups with their associated photos.
-        :return: List of groups with photo IDs
+        Near-duplicate groups with their member photos, in one query.
+
+        Each group row carries `photos`: a list of photo dicts (photos columns
+        plus `quality_score`, or None if unscored), best first. Members
+        come back through JSON, so timestamps are ISO strings. Groups without
+        photos (their members were deleted) are left out before the page is
+        cut, so a short page means there are no more groups.
+
+        :param collection_id: only groups with a photo in this collection
+        :param method: only groups created by this method (e.g. 'phash')
+        :param photo_id: only groups containing this photo
+        :param limit: page size (None = all groups)
+        :param after_id: keyset paging, only groups with a larger id
+        :return: list of group dicts ordered by id
         """
-        query = "SELECT * FROM near_duplicate_groups"
-        groups = self.fetch(query)
-        for group in groups:
-            photos = self.fetch(
-                """
-                SELECT p.* FROM photos p
-                JOIN near_duplicate_photos ndp ON p.id = ndp.photo_id
-                WHERE ndp.group_id=%s
-            """,
-                (group["id"],),
+        conditions = [
+            "EXISTS (SELECT 1 FROM near_duplicate_photos x WHERE x.group_id = g.id)"
+        ]
+        params = []
+        if collection_id is not None:
+            conditions.append(
+                """EXISTS (
+                    SELECT 1 FROM near_duplicate_photos x
+                    JOIN photos xp ON xp.id = x.photo_id
+                    WHERE x.group_id = g.id AND xp.collection_id = %s
+                )"""
             )
-            group["photos"] = photos
-        return groups
+            params.append(collection_id)
+        if method is not None:
+            conditions.append("g.method = %s")
+            params.append(method)
+        if photo_id is not None:
+            conditions.append(
+                """EXISTS (
+                    SELECT 1 FROM near_duplicate_photos x
+                    WHERE x.group_id = g.id AND x.photo_id = %s
+                )"""
+            )
+            params.append(photo_id)
+        if after_id is not None:
+            conditions.append("g.id > %s")
+            params.append(after_id)
+        params.append(limit)
+        query = f"""
+            WITH page AS (
+                SELECT g.* FROM near_duplicate_groups g
+                WHERE {" AND ".join(conditions)}
+                ORDER BY g.id
+                LIMIT %s
+            )
+            SELECT page.*,
+                json_agg(
+                    to_jsonb(p) || jsonb_build_object('quality_score', q.quality_score)
+                    ORDER BY q.quality_score DESC NULLS LAST, p.id
+                ) AS photos
+            FROM page
+            JOIN near_duplicate_photos ndp ON ndp.group_id = page.id
+            JOIN photos p ON p.id = ndp.photo_id
+            LEFT JOIN photo_metrics q ON q.photo_id = p.id
+            GROUP BY page.id, page.method, page.created_at
+            ORDER BY page.id
+        """
+        return self.fetch(query, params)
+
+    def iter_near_duplicate_groups(self, collection_id=None, method=None, page_size=500):
+        """
+        All near-duplicate groups with their photos (see get_near_duplicate_groups),
+        fetched a page at a time in group-id order.
+
+        :param collection_id: only groups with a photo in this collection
+        :param method: only groups created by this method (e.g. 'phash')
+        :param page_size: groups per query
+        """
+        last_id = None
+        while True:
+            groups = self.get_near_duplicate_groups(
+                collection_id, method, limit=page_size, after_id=last_id
+            )
+            if not groups:
+                return
+            yield from groups
+            last_id = groups[-1]["id"]
 
     def get_photos_in_near_duplicate_group(self, group_id):
         """
@@ -307,6 +791,83 @@ class Database:
         query = "SELECT group_id FROM near_duplicate_photos WHERE photo_id=%s"
         return self.fetch(query, (photo_id,))
 
+    def get_groups_for_photos(self, photo_ids, method=None):
+        """
+        Group memberships of many photos in one query.
+
+        :param method: only groups created by this method (e.g. 'phash')
+        :return: {photo_id: [group_id, ...]} for photos that are in a group
+        """
+        if not photo_ids:
+            return {}
+        query = """
+            SELECT ndp.photo_id, ndp.group_id
+            FROM near_duplicate_photos ndp
+            JOIN near_duplicate_groups g ON g.id = ndp.group_id
+            WHERE ndp.photo_id = ANY(%s)
+        """
+        params = [list(photo_ids)]
+        if method is not None:
+            query += " AND g.method=%s"
+            params.append(method)
+        groups = {}
+        for row in self.fetch(query + " ORDER BY ndp.group_id", params):
+            groups.setdefault(row["photo_id"], []).append(row["group_id"])
+        return groups
+
+    def add_near_duplicate_groups(self, count, method=None):
+        """Create `count` near-duplicate groups in one statement; returns their IDs."""
+        if count <= 0:
+            return []
+        query = """
+            INSERT INTO near_duplicate_groups (method)
+            SELECT %s FROM generate_series(1, %s)
+            RETURNING id
+        """
+        return [row["id"] for row in self.fetch(query, (method, count))]
+
+    def assign_photos_to_near_duplicate_groups(self, rows):
+        """
+        Add many memberships in one statement.
+
+        :param rows: iterable of (group_id, photo_id); existing pairs are skipped
+        """
+        query = """
+            INSERT INTO near_duplicate_photos (group_id, photo_id) VALUES %s
+            ON CONFLICT DO NOTHING
+        """
+        self.execute_values(query, rows)
+
+    def delete_near_duplicate_groups(self, method, photo_ids):
+        """Delete the groups of one method that contain any of the given photos."""
+        query = """
+            DELETE FROM near_duplicate_groups g
+            USING near_duplicate_photos ndp
+            WHERE ndp.group_id = g.id AND g.method=%s AND ndp.photo_id = ANY(%s)
+        """
+        self.execute(query, (method, list(photo_ids)))
+
+    def merge_near_duplicate_groups(self, merges):
+        """
+        Fold groups into other groups.
+
+        :param merges: {source_group_id: target_group_id}; every member of a
+            source group is added to its target and the source group is deleted
+        """
+        if not merges:
+            return
+        query = """
+            INSERT INTO near_duplicate_photos (group_id, photo_id)
+            SELECT m.target, ndp.photo_id
+            FROM near_duplicate_photos ndp
+            JOIN (VALUES %s) AS m(source, target) ON ndp.group_id = m.source
+            ON CONFLICT DO NOTHING
+        """
+        self.execute_values(query, merges.items())
+        self.execute(
+            "DELETE FROM near_duplicate_groups WHERE id = ANY(%s)", (list(merges),)
+        )
+
     def get_photos_in_group(self, group_id):
         """
         Get all photos (id, file_name) in a near-duplicate group.
@@ -325,18 +886,33 @@ class Database:
         self.execute("DELETE FROM near_duplicate_groups")
         print("Cleared all near-duplicate groups and assignments.")
 
-    def get_photos_without_duplicate_group(self):
+    def get_near_duplicate_state(self):
         """
-        Return all photos that are not part of any near-duplicate group.
+        Cheap fingerprint of group membership: (row count, highest group id).
+        It changes whenever memberships are added, cleared or cascade-deleted.
+        """
+        row = self.fetch(
+            "SELECT COUNT(*) AS n, COALESCE(MAX(group_id), 0) AS max_group"
+            " FROM near_duplicate_photos"
+        )[0]
+        return (row["n"], row["max_group"])
+
+    def get_photos_without_duplicate_group(self, method=None):
+        """
+        Return all photos that are not part of any near-duplicate group
+        (of the given method, if one is given).
         """
         query = """
             SELECT p.* 
             From photos p
-            LEFT JOIN near_duplicate_photos g ON p.id = g.photo_id
-            WHERE g.photo_id IS NULL
+            WHERE NOT EXISTS (
+                SELECT 1 FROM near_duplicate_photos ndp
+                JOIN near_duplicate_groups g ON g.id = ndp.group_id
+                WHERE ndp.photo_id = p.id AND (%s IS NULL OR g.method = %s)
+            )
                 AND (p.suggestion IS NULL OR p.suggestion != %s)
         """
-        return self.fetch(query, ('deleted',))
+        return self.fetch(query, (method, method, 'deleted'))
 
     # ----------------- Queries -----------------
     def get_first_photo_for_collection(self, collection_id):
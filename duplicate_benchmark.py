@@ -0,0 +1,417 @@
+# duplicate_benchmark.py
+"""
+Speed and accuracy benchmark for near-duplicate detection.
+
+Generates a synthetic labelled corpus (bursts of near-duplicates made with
+crops, exposure shifts, JPEG re-encodes and small rotations, plus unrelated
+singletons), runs duplicate detection on it and reports wall time, peak
+memory, database round trips and pair precision/recall:
+
+    python duplicate_benchmark.py --scale 10k
+    python duplicate_benchmark.py --scale 1k --db --burst-window 5
+
+Both modes run NearDuplicateDetector.find_duplicates_batch. Without --db it
+runs against MemoryDatabase, an in-memory stand-in that counts the
+statements Postgres would have received. With --db the corpus is added as a
+temporary collection in Postgres, which is deleted afterwards. The corpus folder uses the hash_tuning.py
+layout (one sub-folder per duplicate set), so it can also be used for tuning.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import piexif
+from PIL import Image, ImageDraw, ImageEnhance
+
+from duplicates import NearDuplicateDetector, close_hash_pool
+from hash_tuning import _parse_cascade, load_labelled, pair_scores
+
+try:
+    import resource  # Unix only; gives peak RSS including native buffers
+except ImportError:
+    resource = None
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+MANIFEST = "manifest.json"
+
+# Share of photos that belong to a duplicate set, and set sizes
+DUPLICATE_SHARE = 0.6
+SET_SIZES = (2, 6)
+# Share of photos written without EXIF capture time
+UNDATED_SHARE = 0.1
+
+
+# ----------------- Corpus generation -----------------
+def _base_image(rng, size):
+    """A random 'scene': gradient background with overlapping shapes."""
+    width, height = size
+    top = tuple(rng.randrange(256) for _ in range(3))
+    bottom = tuple(rng.randrange(256) for _ in range(3))
+    img = Image.linear_gradient("L").resize(size)
+    img = Image.merge(
+        "RGB",
+        [
+            img.point(lambda v, a=a, b=b: a + (b - a) * v // 255)
+            for a, b in zip(top, bottom)
+        ],
+    )
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(6, 14)):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1 = x0 + rng.randint(width // 10, width // 2)
+        y1 = y0 + rng.randint(height // 10, height // 2)
+        fill = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.ellipse((x0, y0, x1, y1), fill=fill)
+        else:
+            draw.rectangle((x0, y0, x1, y1), fill=fill)
+    return img
+
+
+def _variant(img, rng):
+    """A near-duplicate of img: one or two of crop, exposure, rotation, re-encode."""
+    edits = rng.sample(["crop", "exposure", "rotate", "jpeg"], rng.randint(1, 2))
+    quality = 90
+    if "crop" in edits:
+        w, h = img.size
+        keep = rng.uniform(0.9, 0.97)
+        cw, ch = int(w * keep), int(h * keep)
+        x, y = rng.randint(0, w - cw), rng.randint(0, h - ch)
+        img = img.crop((x, y, x + cw, y + ch)).resize((w, h))
+    if "exposure" in edits:
+        img = ImageEnhance.Brightness(img).enhance(rng.uniform(0.8, 1.2))
+    if "rotate" in edits:
+        img = img.rotate(rng.uniform(-3, 3), resample=Image.BILINEAR, expand=False)
+    if "jpeg" in edits:
+        quality = rng.randint(40, 70)
+    return img, quality
+
+
+def _exif_bytes(taken):
+    if taken is None:
+        return b""
+    stamp = taken.strftime("%Y:%m:%d %H:%M:%S").encode()
+    subsec = f"{taken.microsecond // 10000:02d}".encode()
+    return piexif.dump(
+        {
+            "0th": {piexif.ImageIFD.Model: b"Benchmark Cam"},
+            "Exif": {
+                piexif.ExifIFD.DateTimeOriginal: stamp,
+                piexif.ExifIFD.SubSecTimeOriginal: subsec,
+            },
+        }
+    )
+
+
+def _write_set(task):
+    """Write one duplicate set (or singleton); runs in a worker process."""
+    folder, names, seed, size, times = task
+    rng = random.Random(seed)
+    base = _base_image(rng, size)
+    folder.mkdir(parents=True, exist_ok=True)
+    for i, (name, taken) in enumerate(zip(names, times)):
+        img, quality = (base, 90) if i == 0 else _variant(base, rng)
+        taken = datetime.fromisoformat(taken) if taken else None
+        img.save(folder / name, "JPEG", quality=quality, exif=_exif_bytes(taken))
+
+
+def generate_corpus(folder, count, seed=0, size=(640, 480), workers=None):
+    """
+    Write about `count` synthetic photos into folder (skipped if a corpus of
+    that size and seed is already there).
+
+    :return: manifest dict {"count", "seed", "photos": {path: capture time or None}}
+    """
+    folder = Path(folder)
+    manifest_path = folder / MANIFEST
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        if manifest["count"] == count and manifest["seed"] == seed:
+            return manifest
+
+    rng = random.Random(seed)
+    clock = datetime(2024, 5, 1, 9, 0, 0)
+    tasks, photos = [], {}
+    written = set_no = 0
+    while written < count:
+        if rng.random() < DUPLICATE_SHARE:
+            n = min(rng.randint(*SET_SIZES), count - written)
+            target = folder / f"set_{set_no:06d}"
+            set_no += 1
+        else:
+            n = 1
+            target = folder
+        names, times = [], []
+        for i in range(n):
+            names.append(f"img_{written + i:07d}.jpg")
+            # Burst shots are a fraction of a second apart, scenes minutes apart
+            clock += timedelta(seconds=rng.uniform(0.1, 0.5))
+            dated = rng.random() >= UNDATED_SHARE
+            times.append(clock.isoformat() if dated else None)
+            photos[str(target / names[-1])] = times[-1]
+        clock += timedelta(seconds=rng.uniform(30, 600))
+        tasks.append((target, names, rng.getrandbits(32), size, times))
+        written += n
+
+    folder.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_write_set, tasks, chunksize=32))
+    manifest = {"count": count, "seed": seed, "photos": photos}
+    manifest_path.write_text(json.dumps(manifest))
+    return manifest
+
+
+# ----------------- Runs -----------------
+def _peak_rss_mb(who):
+    """Peak resident set size in MB (who is resource.RUSAGE_SELF/CHILDREN)."""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 if os.uname().sysname != "Darwin" else peak / 2**20
+
+
+def _capture_tags(taken):
+    """exif_data rows (tag, value) for an ISO capture time, as the importer stores them."""
+    taken = datetime.fromisoformat(taken)
+    return [
+        ("DateTimeOriginal", taken.strftime("%Y:%m:%d %H:%M:%S")),
+        ("SubSecTimeOriginal", f"{taken.microsecond // 10000:02d}"),
+        ("Model", "Benchmark Cam"),
+    ]
+
+
+class MemoryDatabase:
+    """
+    In-memory stand-in for the Database calls NearDuplicateDetector makes.
+    It counts the statements Postgres would receive for each call, with
+    multi-row inserts paged as in Database.execute_values.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, exif=None):
+        """
+        :param exif: {photo_id: {tag_name: tag_value}}
+        """
+        self.exif = exif or {}
+        self.hashes = {}  # photo id -> {algorithm: hash}
+        self.members = {}  # photo id -> set of group ids
+        self.next_group_id = 1
+        self.queries = 0
+
+    def _count_rows(self, rows):
+        rows = list(rows)
+        self.queries += -(-len(rows) // self.PAGE_SIZE)
+        return rows
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def pool_stats(self):
+        return {"queries": self.queries}
+
+    def get_photo_hashes(self, photo_ids, algorithms, version):
+        self.queries += 1
+        stored = {}
+        for pid in photo_ids:
+            values = self.hashes.get(pid, {})
+            stored[pid] = {name: values[name] for name in algorithms if name in values}
+        return {pid: values for pid, values in stored.items() if values}
+
+    def add_photo_hashes(self, rows):
+        for photo_id, algorithm, _, value in self._count_rows(rows):
+            self.hashes.setdefault(photo_id, {})[algorithm] = value
+
+    def get_exif_tags(self, photo_ids, tag_names):
+        if not photo_ids:
+            return {}
+        self.queries += 1
+        tags = {}
+        for pid in photo_ids:
+            for tag, value in self.exif.get(pid, {}).items():
+                if tag in tag_names:
+                    tags.setdefault(pid, {})[tag] = value
+        return tags
+
+    def get_groups_for_photos(self, photo_ids, method=None):
+        # Only one detection method writes groups here
+        if not photo_ids:
+            return {}
+        self.queries += 1
+        return {
+            pid: sorted(self.members[pid]) for pid in photo_ids if self.members.get(pid)
+        }
+
+    def add_near_duplicate_groups(self, count, method=None):
+        if count <= 0:
+            return []
+        self.queries += 1
+        first, self.next_group_id = self.next_group_id, self.next_group_id + count
+        return list(range(first, self.next_group_id))
+
+    def assign_photos_to_near_duplicate_groups(self, rows):
+        for group_id, photo_id in self._count_rows(rows):
+            self.members.setdefault(photo_id, set()).add(group_id)
+
+    def merge_near_duplicate_groups(self, merges):
+        if not merges:
+            return
+        self.queries += 2  # copy memberships, delete the source groups
+        for group_ids in self.members.values():
+            for source in group_ids & set(merges):
+                group_ids.discard(source)
+                group_ids.add(merges[source])
+
+
+def _detect(db, photos, cascade, burst_window, workers):
+    """
+    Run find_duplicates_batch and read back its groups.
+
+    :return: (groups of indices into photos, DB round trips during detection)
+    """
+    detector = NearDuplicateDetector(
+        db, burst_window=burst_window, hash_workers=workers, cascade=cascade
+    )
+    before = db.pool_stats()["queries"]
+    detector.find_duplicates_batch(photos)
+    round_trips = db.pool_stats()["queries"] - before
+
+    index = {photo["id"]: i for i, photo in enumerate(photos)}
+    members = {}
+    for pid, group_ids in db.get_groups_for_photos(list(index)).items():
+        members.setdefault(group_ids[0], []).append(index[pid])
+    return [g for g in members.values() if len(g) > 1], round_trips
+
+
+def run_offline(items, manifest, cascade, burst_window, workers):
+    """
+    Run find_duplicates_batch against a MemoryDatabase.
+
+    :return: (groups of indices into labels, labels, DB round trips the
+        detection would have made)
+    """
+    photos = [{"id": i + 1, "file_path": path} for i, (path, _) in enumerate(items)]
+    exif = {
+        photo["id"]: dict(_capture_tags(manifest["photos"][photo["file_path"]]))
+        for photo in photos
+        if manifest["photos"].get(photo["file_path"])
+    }
+    groups, round_trips = _detect(
+        MemoryDatabase(exif), photos, cascade, burst_window, workers
+    )
+    return groups, [label for _, label in items], round_trips
+
+
+def run_db(items, manifest, cascade, burst_window, workers):
+    """
+    Run find_duplicates_batch on a temporary collection.
+
+    :return: (groups of indices into labels, labels, DB round trips during
+        detection)
+    """
+    from db import Database
+
+    db = Database()
+    collection_id = db.add_collection(f"duplicate-benchmark-{int(time.time())}")
+    try:
+        photos, labels = [], []
+        with db.transaction():
+            for path, label in items:
+                pid = db.add_photo(collection_id, path, Path(path).name)
+                photos.append({"id": pid, "file_path": path})
+                labels.append(label)
+            db.add_exif_bulk(
+                (photo["id"], tag, value)
+                for photo in photos
+                if manifest["photos"].get(photo["file_path"])
+                for tag, value in _capture_tags(manifest["photos"][photo["file_path"]])
+            )
+
+        groups, round_trips = _detect(db, photos, cascade, burst_window, workers)
+        return groups, labels, round_trips
+    finally:
+        db.delete_collection(collection_id)
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--scale", default="1k", help="1k, 10k, 100k or a photo count")
+    parser.add_argument("--corpus", help="corpus folder (default: ./benchmark_corpus_<scale>)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--cascade",
+        type=_parse_cascade,
+        default=_parse_cascade("dhash:12,phash:5"),
+        help="hash cascade, cheapest first (default dhash:12,phash:5)",
+    )
+    parser.add_argument("--db", action="store_true", help="run against Postgres")
+    parser.add_argument(
+        "--burst-window",
+        type=float,
+        help="seconds; only compare photos this close in capture time",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="also report the Python heap peak (slows the run down)",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    count = SCALES.get(args.scale) or int(args.scale)
+    corpus = Path(args.corpus or f"benchmark_corpus_{args.scale}")
+    started = time.perf_counter()
+    manifest = generate_corpus(corpus, count, args.seed, workers=args.workers)
+    print(f"Corpus: {corpus} ({count} photos, ready in {time.perf_counter() - started:.1f}s)")
+    # The corpus workers count as children too; only a higher peak is the detector's
+    corpus_peak = _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource is not None else 0
+
+    items = load_labelled(corpus)
+    if args.tracemalloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    if args.db:
+        groups, labels, round_trips = run_db(
+            items, manifest, args.cascade, args.burst_window, args.workers
+        )
+    else:
+        groups, labels, round_trips = run_offline(
+            items, manifest, args.cascade, args.burst_window, args.workers
+        )
+    elapsed = time.perf_counter() - started
+    # Children only enter RUSAGE_CHILDREN once they have exited
+    close_hash_pool()
+
+    precision, recall, predicted, true_pairs = pair_scores(groups, labels)
+    print(f"Mode:            {'database' if args.db else 'in-memory'}")
+    print(f"Wall time:       {elapsed:.2f}s ({len(labels) / elapsed:.0f} photos/s)")
+    if args.tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Python heap:     {peak / 2**20:.1f} MB peak")
+    if resource is not None:
+        worker_peak = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+        if worker_peak > corpus_peak:
+            workers = f"{worker_peak:.0f} MB largest hash worker"
+        else:
+            workers = f"hash workers at most {corpus_peak:.0f} MB (corpus workers' peak)"
+        print(
+            f"Peak RSS:        {_peak_rss_mb(resource.RUSAGE_SELF):.0f} MB main process, "
+            f"{workers}"
+        )
+    print(f"DB round trips:  {round_trips}")
+    print(f"Precision:       {precision:.4f} ({predicted} predicted pairs)")
+    print(f"Recall:          {recall:.4f} ({true_pairs} labelled pairs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,16 +25,18 @@ class DuplicateViewer(BaseSidebarViewer):
         Args:
             tree: The treeview widget.
         """
-        tree["columns"] = ("group_id", "photo_id", "file_name")
+        tree["columns"] = ("group_id", "photo_id", "file_name", "quality")
 
         # Set column headings and properties
         tree.heading("group_id", text="Group ID")
         tree.heading("photo_id", text="Photo ID")
         tree.heading("file_name", text="File Name")
+        tree.heading("quality", text="Quality")
 
         tree.column("group_id", width=80, anchor="center")
         tree.column("photo_id", width=80, anchor="center")
         tree.column("file_name", width=250, anchor="w")
+        tree.column("quality", width=80, anchor="center")
 
     def update_content(self, photo_id):
         """
@@ -49,15 +51,21 @@ class DuplicateViewer(BaseSidebarViewer):
         if not photo_id:
             return  # Exit if no photo ID is provided
 
-        groups = self.db.get_groups_for_photo(photo_id)  # Get groups for the photo
-        if not groups:
-            return  # Exit if no groups are found
+        # One query for the photo's groups and their members (best first)
+        groups = self.db.get_near_duplicate_groups(photo_id=photo_id)
 
         # Iterate through each group and add photos to treeview
         for g in groups:
-            group_id = g["group_id"]
-            for p in self.db.get_photos_in_group(group_id):
+            for p in g["photos"]:
+                quality = p.get("quality_score")
                 # Insert photo details into the treeview
                 self.tree.insert(
-                    "", "end", values=(group_id, p["photo_id"], p["file_name"])
-                )
\ No newline at end of file
+                    "",
+                    "end",
+                    values=(
+                        g["id"],
+                        p["id"],
+                        p["file_name"],
+                        "" if quality is None else f"{quality:.2f}",
+                    ),
+                )
@@ -1,32 +1,262 @@
 # duplicates.py
 DEBUG = False  # Set False to suppress debug output
 
-from PIL import Image
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import imagehash
-import numpy as np
-from sklearn.cluster import DBSCAN
+from bursts import CAPTURE_TAGS, burst_pairs, camera_key, capture_time
 from db import Database
+from image_context import is_raw, open_image
+from hamming_index import BKTree, UnionFind, cluster_cascade, hash_to_int, within
+
+
+# Longest side images are reduced to before hashing. The hashes only look at
+# a 32x32 or smaller grayscale copy, so decoding 24-45 MP is wasted work.
+HASH_INPUT_SIZE = 256
+
+# Every hash stored per photo, cheapest first
+HASH_FUNCS = {
+    "ahash": imagehash.average_hash,
+    "dhash": imagehash.dhash,
+    "phash": imagehash.phash,
+    "whash": imagehash.whash,
+}
+
+
+def _hash_input(image):
+    """Grayscale copy of image with its longest side at most HASH_INPUT_SIZE."""
+    image = image.convert("L")
+    image.thumbnail((HASH_INPUT_SIZE, HASH_INPUT_SIZE))
+    return image
+
+
+def compute_hashes(image):
+    """Every HASH_FUNCS hash of a PIL image: {algorithm: hash_int}."""
+    small = _hash_input(image)
+    return {name: hash_to_int(func(small)) for name, func in HASH_FUNCS.items()}
+
+
+def hash_file(path):
+    """
+    All hashes of one file. This is the only way stored hashes are made
+    (import, on-demand detection, tuning), so a file always gets the same
+    hashes. JPEGs (including RAW embedded previews) are decoded at reduced
+    size via draft mode, which scales in the DCT instead of decoding every
+    pixel.
+
+    :return: {algorithm: hash_int}, or None if the file cannot be read
+    """
+    try:
+        with open_image(path, raw=is_raw(path)) as img:
+            img.draft("L", (HASH_INPUT_SIZE, HASH_INPUT_SIZE))
+            return compute_hashes(img)
+    except Exception as e:
+        if DEBUG:
+            print(f"[ERROR] Failed to hash {path}: {e}")
+        return None
+
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def hash_pool(workers):
+    """
+    Process pool for hash_file, started on first use and kept for the rest of
+    the session so later detections do not pay for starting processes again.
+    Hashing is CPU bound, so processes rather than threads; spawned, not
+    forked, because callers are threads of the Tk app. Spawned workers re-run
+    the main module, which is why app.py imports the GUI only under its main
+    guard.
+
+    :param workers: number of processes; a different number replaces the pool
+    :return: ProcessPoolExecutor
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_hash_pool(pool):
+    """Forget a pool whose worker died, so the next call starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def close_hash_pool():
+    """Stop the hash pool's workers; the next hash_pool() call starts new ones."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def group_suggestions(groups):
+    """
+    keep/delete suggestion per photo from near-duplicate groups of any method.
+
+    A photo can sit in several groups (a 'phash' and a 'clip' group, say).
+    The best-scored photo of each group is kept, and a photo kept by any of
+    its groups stays "keep" whatever the others say, so the result does not
+    depend on group order. Photos already marked "deleted" are left out.
+
+    :param groups: group dicts with `photos` (see Database.get_near_duplicate_groups)
+    :return: {photo_id: "keep" | "delete"}
+    """
+    suggestions = {}
+    for group in groups:
+        photos = group["photos"]
+        best = max(photos, key=lambda p: p.get("quality_score") or 0)
+        for p in photos:
+            if (p.get("suggestion") or "").lower() == "deleted":
+                continue
+            if p["id"] == best["id"]:
+                suggestions[p["id"]] = "keep"
+            else:
+                suggestions.setdefault(p["id"], "delete")
+    return suggestions
 
 
 class NearDuplicateDetector:
     """
-    Detects near-duplicate photos using perceptual hashing and DBSCAN clustering.
-    Works efficiently for large photo collections.
+    Detects near-duplicate photos using perceptual hashing.
+
+    Matching runs a cascade of (algorithm, max distance) stages: candidate
+    pairs come from a BK-tree search on the first hash, and each later stage
+    must confirm the pair. Photos are grouped when a chain of confirmed pairs
+    links them. Every HASH_FUNCS hash is stored per photo, so the cascade can
+    be retuned (see hash_tuning.py) without rehashing.
     """
 
-    # TODO: Find better threshold value
-    def __init__(self, db: Database, threshold=10):
+    # Stored in photo_hashes; bump HASH_VERSION when hash_file/compute_hashes change
+    HASH_VERSION = 3  # 3: import hashes through hash_file as well, not its preview
+    # Method name of hash-based groups in near_duplicate_groups
+    GROUP_METHOD = "phash"
+
+    # Below this many missing hashes, hash in-process instead of starting a pool
+    MIN_POOL_BATCH = 16
+
+    def __init__(
+        self,
+        db: Database,
+        threshold=10,
+        burst_window=None,
+        hash_workers=None,
+        cascade=None,
+    ):
         """
         :param db: Database instance
-        :param threshold: maximum Hamming distance to consider photos as duplicates
+        :param threshold: maximum pHash distance to consider photos as duplicates
+            (used when no cascade is given)
+        :param burst_window: if set, batch detection only compares photos from
+            the same camera taken within this many seconds of each other
+            (EXIF capture time); photos without a capture time are still
+            searched against every hash
+        :param hash_workers: processes used to hash photos (default: CPU count)
+        :param cascade: sequence of (algorithm, max_distance), cheapest first,
+            e.g. (("dhash", 10), ("phash", 5)); default pHash alone
         """
         self.db = db
         self.threshold = threshold
+        self.cascade = tuple(cascade or (("phash", threshold),))
+        unknown = [name for name, _ in self.cascade if name not in HASH_FUNCS]
+        if unknown:
+            raise ValueError(f"Unknown hash algorithms in cascade: {unknown}")
+        self.algorithms = tuple(name for name, _ in self.cascade)
+        self.thresholds = tuple(limit for _, limit in self.cascade)
+        self.burst_window = burst_window
+        self.hash_workers = hash_workers
+        # BK-tree of already grouped photos for incremental detection, with the
+        # group-membership fingerprint it was built from (see _hash_index)
+        self._index = None
+        self._index_state = None
 
     def _log(self, msg):
         if DEBUG:
             print(msg)
 
+    @staticmethod
+    def compute_hashes(image):
+        """Every stored hash of a PIL image: {algorithm: hash_int}."""
+        return compute_hashes(image)
+
+    @staticmethod
+    def hash_file(path):
+        """Every stored hash of a file, or None if it cannot be read."""
+        return hash_file(path)
+
+    def load_hashes(self, photo_list):
+        """
+        Cascade hashes for a list of photos. Stored hashes are read from the
+        database in one query; only photos missing one of them are opened and
+        hashed, and all their hashes are stored for next time.
+
+        :param photo_list: list of dicts, each with 'id' and 'file_path'
+        :return: {photo_id: tuple of hash_ints in cascade order} for every
+            photo that could be hashed
+        """
+        stored = self.db.get_photo_hashes(
+            [p["id"] for p in photo_list], self.algorithms, self.HASH_VERSION
+        )
+        hashes = {
+            pid: tuple(values[name] for name in self.algorithms)
+            for pid, values in stored.items()
+            if all(name in values for name in self.algorithms)
+        }
+        missing = [p for p in photo_list if p["id"] not in hashes]
+        new_rows = []
+        if missing:
+            started = time.perf_counter()
+            paths = [p["file_path"] for p in missing]
+            if len(missing) < self.MIN_POOL_BATCH:
+                results = map(hash_file, paths)
+            else:
+                workers = self.hash_workers or os.cpu_count() or 1
+                pool = hash_pool(workers)
+                chunk = max(1, len(paths) // (workers * 4))
+                try:
+                    results = list(pool.map(hash_file, paths, chunksize=chunk))
+                except BrokenProcessPool:
+                    _discard_hash_pool(pool)
+                    print("Hash pool died, hashing in this process instead")
+                    results = map(hash_file, paths)
+            hashed = 0
+            for photo, values in zip(missing, results):
+                if values is None:
+                    continue
+                hashed += 1
+                hashes[photo["id"]] = tuple(values[name] for name in self.algorithms)
+                new_rows.extend(
+                    (photo["id"], name, self.HASH_VERSION, value)
+                    for name, value in values.items()
+                )
+            elapsed = max(time.perf_counter() - started, 1e-6)
+            print(
+                f"Hashed {hashed} photos in {elapsed:.1f}s "
+                f"({hashed / elapsed:.1f} photos/s)"
+            )
+        if new_rows:
+            self.db.add_photo_hashes(new_rows)
+        self._log(f"[DEBUG] {len(hashes)} photos hashed, {len(missing)} computed now")
+        return hashes
+
     def find_duplicates_batch(self, photo_list):
         """
         Run near-duplicate detection on a batch of photos.
@@ -39,68 +269,197 @@ class NearDuplicateDetector:
         if not photo_list:
             return
 
-        hashes = []
-        photo_ids = []
-
-        for photo in photo_list:
-            photo_id = photo["id"]
-            path = photo["file_path"]
-            try:
-                img = Image.open(path)
-                phash = imagehash.phash(img)
-                hashes.append(phash.hash.flatten().astype(int))
-                photo_ids.append(photo_id)
-                self._log(f"[DEBUG] photo_id={photo_id}, hash={phash}")
-            except Exception as e:
-                self._log(f"[ERROR] Failed to hash {path}: {e}")
+        stored = self.load_hashes(photo_list)
+        photo_ids = [p["id"] for p in photo_list if p["id"] in stored]
+        hashes = [stored[pid] for pid in photo_ids]
 
         if not hashes:
             self._log("[DEBUG] No valid hashes to process.")
             return
 
-        hashes_np = np.array(hashes)
-
-        clustering = DBSCAN(eps=self.threshold / 64, min_samples=2, metric="hamming")
-        labels = clustering.fit_predict(hashes_np)
-        self._log(f"[DEBUG] Clustering labels: {labels}")
-
-        cluster_map = {}
-
-        for photo_id, label in zip(photo_ids, labels):
-            try:
-                if label == -1:
-                    # Noise: create single-photo group
-                    existing_groups = self.db.get_groups_for_photo(photo_id)
-                    if existing_groups:
-                        group_id = existing_groups[0]["group_id"]
-                    else:
-                        group_id = self.db.add_near_duplicate_group(method="phash")
-                    self.db.assign_photo_to_near_duplicate_group(group_id, photo_id)
-                    # self._log(f"[DEBUG] photo_id={photo_id} -> new group_id={group_id} (noise)")
-                else:
-                    # Clustered: reuse group_id per cluster
-                    if label not in cluster_map:
-                        # Check if any photo in this cluster already has a group
-                        cluster_photos = [
-                            pid for pid, lbl in zip(photo_ids, labels) if lbl == label
-                        ]
-                        existing_group_id = None
-                        for pid in cluster_photos:
-                            groups = self.db.get_groups_for_photo(pid)
-                            if groups:
-                                existing_group_id = groups[0]["group_id"]
-                                break
-
-                        if existing_group_id:
-                            group_id = existing_group_id
-                        else:
-                            group_id = self.db.add_near_duplicate_group(method="phash")
-
-                        cluster_map[label] = group_id
-                        # self._log(f"[DEBUG] Created cluster group_id={group_id} for label={label}")
-
-                    group_id = cluster_map[label]
-                    self.db.assign_photo_to_near_duplicate_group(group_id, photo_id)
-                    # self._log(f"[DEBUG] photo_id={photo_id} -> group_id={group_id}")
-            except Exception as e:
-                self._log(f"[ERROR] Failed to assign photo_id={photo_id} to group: {e}")
+        # Every clustered set is a group; photos with no neighbour (DBSCAN's
+        # noise) each get a group of their own
+        if self.burst_window is None:
+            clusters = cluster_cascade(list(zip(photo_ids, hashes)), self.thresholds)
+        else:
+            clusters = self._cluster_bursts(dict(zip(photo_ids, hashes)))
+        clustered = {pid for members in clusters for pid in members}
+        components = clusters + [[pid] for pid in photo_ids if pid not in clustered]
+        self._log(f"[DEBUG] {len(clusters)} clusters, {len(components)} groups")
+        self.assign_groups(components)
+
+    def _cluster_bursts(self, hashes):
+        """
+        Cluster using capture time to pick candidate pairs.
+
+        Dated photos are only compared with shots from the same camera inside
+        the burst window. Undated photos fall back to a BK-tree search over
+        all hashes, so they can still match any photo.
+
+        :param hashes: {photo_id: tuple of hash_ints in cascade order}
+        :return: list of photo-id groups with two or more members
+        """
+        tags = self.db.get_exif_tags(list(hashes), CAPTURE_TAGS)
+        shots, undated = [], []
+        for pid in hashes:
+            photo_tags = tags.get(pid, {})
+            taken = capture_time(photo_tags)
+            if taken is None:
+                undated.append(pid)
+            else:
+                shots.append((pid, taken, camera_key(photo_tags)))
+
+        sets = UnionFind(hashes)
+        compared = 0
+        for a, b in burst_pairs(shots, self.burst_window):
+            compared += 1
+            if within(hashes[a], hashes[b], self.thresholds):
+                sets.union(a, b)
+
+        if undated:
+            tree = BKTree((values[0], pid) for pid, values in hashes.items())
+            for pid in undated:
+                for other, _ in tree.search(hashes[pid][0], self.thresholds[0]):
+                    if within(hashes[pid][1:], hashes[other][1:], self.thresholds[1:]):
+                        sets.union(pid, other)
+
+        self._log(
+            f"[DEBUG] Burst candidates: {len(shots)} dated photos, {compared} "
+            f"comparisons; {len(undated)} undated photos via hash index"
+        )
+        return [group for group in sets.groups() if len(group) > 1]
+
+    def assign_groups(self, components, linked_groups=None):
+        """
+        Write group memberships for sets of photos in one transaction.
+
+        Memberships of all involved photos are read in one query. Each set of
+        photos is united with the existing groups its photos belong to (or
+        are linked to through `linked_groups`); sets that share a group end
+        up together. Each resulting set keeps its lowest existing group id,
+        any other existing groups are merged into it, and sets without a
+        group get a new one. New groups and memberships are each written
+        with a single multi-row insert.
+
+        :param components: list of lists of photo ids that belong together
+        :param linked_groups: optional {photo_id: iterable of group ids} the
+            photo should join although it is not a member yet
+        :return: {photo_id: group_id} for every photo in components
+        """
+        linked_groups = linked_groups or {}
+        photo_ids = [pid for members in components for pid in members]
+        with self.db.transaction():
+            existing = self.db.get_groups_for_photos(
+                photo_ids, method=self.GROUP_METHOD
+            )
+
+            sets = UnionFind()
+            for members in components:
+                first = ("photo", members[0])
+                for pid in members:
+                    sets.union(first, ("photo", pid))
+                    for group_id in existing.get(pid, []):
+                        sets.union(first, ("group", group_id))
+                    for group_id in linked_groups.get(pid, ()):
+                        sets.union(first, ("group", group_id))
+
+            merged_sets = []
+            for nodes in sets.groups():
+                pids = [key for kind, key in nodes if kind == "photo"]
+                gids = sorted(key for kind, key in nodes if kind == "group")
+                if pids:
+                    merged_sets.append((pids, gids))
+
+            new_ids = iter(
+                self.db.add_near_duplicate_groups(
+                    sum(1 for _, gids in merged_sets if not gids),
+                    method=self.GROUP_METHOD,
+                )
+            )
+            merges = {}
+            assignment = {}
+            for pids, gids in merged_sets:
+                target = gids[0] if gids else next(new_ids)
+                merges.update((gid, target) for gid in gids[1:])
+                assignment.update((pid, target) for pid in pids)
+
+            self.db.merge_near_duplicate_groups(merges)
+            self.db.assign_photos_to_near_duplicate_groups(
+                (gid, pid)
+                for pid, gid in assignment.items()
+                if gid not in existing.get(pid, [])
+            )
+        if merges:
+            self._index = None  # indexed group ids may have been merged away
+        self._log(
+            f"[DEBUG] Assigned {len(assignment)} photos, merged {len(merges)} groups"
+        )
+        return assignment
+
+    # ----------------- Incremental detection -----------------
+    def _hash_index(self):
+        """
+        BK-tree over the first cascade hash of photos that already have a
+        group, holding (photo_id, group_id, hashes) items. Kept between calls
+        and rebuilt only when group membership changed behind our back
+        (batch run, clear, delete).
+        """
+        state = self.db.get_near_duplicate_state()
+        if self._index is None or state != self._index_state:
+            rows = self.db.get_grouped_photo_hashes(
+                self.algorithms, self.HASH_VERSION, method=self.GROUP_METHOD
+            )
+            index = BKTree()
+            for row in rows:
+                values = tuple(row["hashes"][name] for name in self.algorithms)
+                index.add(values[0], (row["photo_id"], row["group_id"], values))
+            self._index = index
+            self._index_state = state
+            self._log(f"[DEBUG] Built hash index over {len(rows)} grouped photos")
+        return self._index
+
+    def find_duplicates_incremental(self, new_photos):
+        """
+        Group newly added photos without re-clustering the library.
+
+        Each new photo is looked up in the index of already grouped photos
+        and compared with the other new photos. A set of new photos linked by
+        distance <= threshold joins the existing groups its photos matched
+        (merging them if there are several), or gets a new group if none did;
+        a lone photo gets its own group, as in find_duplicates_batch. Cost
+        grows with len(new_photos), not with the library size.
+
+        :param new_photos: list of dicts with 'id' and 'file_path', not yet grouped
+        :return: number of photos assigned to a group
+        """
+        if not new_photos:
+            return 0
+        index = self._hash_index()
+        hashes = self.load_hashes(new_photos)
+        new_ids = [p["id"] for p in new_photos if p["id"] in hashes]
+
+        sets = UnionFind(new_ids)
+        matched = {}  # new photo id -> existing group ids it is close to
+        batch = BKTree()
+        first, rest = self.thresholds[0], self.thresholds[1:]
+        for pid in new_ids:
+            values = hashes[pid]
+            matched[pid] = {
+                group_id
+                for (_, group_id, other), _ in index.search(values[0], first)
+                if within(values[1:], other[1:], rest)
+            }
+            for other, _ in batch.search(values[0], first):
+                if within(values[1:], hashes[other][1:], rest):
+                    sets.union(pid, other)
+            batch.add(values[0], pid)
+
+        assignment = self.assign_groups(sets.groups(), linked_groups=matched)
+        if self._index is not None:
+            for pid, group_id in assignment.items():
+                self._index.add(hashes[pid][0], (pid, group_id, hashes[pid]))
+        assigned = len(assignment)
+
+        self._index_state = self.db.get_near_duplicate_state()
+        self._log(f"[DEBUG] Incrementally grouped {assigned} new photos")
+        return assigned
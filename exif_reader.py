@@ -3,9 +3,8 @@
 from pathlib import Path
 from PIL import Image
 import piexif
-import os
-import rawpy
 import exifread
+from image_context import ImageContext, is_raw
 
 class ExifReader:
     """
@@ -14,48 +13,39 @@ class ExifReader:
     """
 
     @staticmethod
-    def read_exif(file_path: Path) -> dict:
+    def read_exif(file_path: Path, context: ImageContext = None) -> dict:
         """Read EXIF data from an image file.
 
         Args:
             file_path (Path): The path to the image file
+            context (ImageContext, optional): Already loaded file; when given,
+                the file is not read from disk again
 
         Returns:
             dict: A dictionary containing EXIF data
         """
         exif_data = {}
 
-        # Define extensions for RAW files
-        raw_extensions = {
-            ".cr2",
-            ".nef",
-            ".arw",
-            ".dng",
-            ".rw2",
-            ".orf",
-            ".raf",
-            ".srw",
-            ".pef",
-        }
-
-        # Get file extension in lowercase
-        ext = os.path.splitext(str(file_path))[1].lower()
-
         try:
-            if ext in raw_extensions:
+            if is_raw(file_path):
                 # Use exifread for RAW files
                 try:
-                    with open(str(file_path), "rb") as f:
-                        tags = exifread.process_file(f, details=False)
+                    if context is not None:
+                        tags = exifread.process_file(context.file_obj(), details=False)
+                    else:
+                        with open(str(file_path), "rb") as f:
+                            tags = exifread.process_file(f, details=False)
                     for k, v in tags.items():
                         exif_data[str(k)] = str(v)
                 except Exception as re:
                     print(f"Failed to read RAW EXIF from {file_path}: {re}")
             else:
                 # Use PIL/Pillow and piexif for other image formats
-                img = Image.open(file_path)
-
-                raw_exif = img.info.get("exif")
+                if context is not None:
+                    context.image()  # make sure the EXIF block has been parsed
+                    raw_exif = context.exif_bytes
+                else:
+                    raw_exif = Image.open(file_path).info.get("exif")
                 if not raw_exif:
                     return exif_data
 
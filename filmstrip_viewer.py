@@ -2,6 +2,7 @@
 
 import ttkbootstrap as ttk
 from base_viewer import BaseThumbnailViewer
+from thumbnail_loader import ThumbnailLoader
 
 HIGHLIGHT_BORDER = 3
 
@@ -11,6 +12,9 @@ class FilmstripViewer(BaseThumbnailViewer):
     Works with the new MainViewer-based PhotoViewer.
     """
 
+    # Thumbnails loaded beyond each edge of the view, so short scrolls show no placeholders
+    OVERSCAN_THUMBS = 10
+
     def __init__(
         self,
         parent,
@@ -33,6 +37,8 @@ class FilmstripViewer(BaseThumbnailViewer):
         """
         super().__init__(parent, thumb_size=80, padding=5, **kwargs)
         self.photo_viewer = photo_viewer
+        self.thumb_loader = ThumbnailLoader(self, workers=2)
+        self._render_pending = None
         self.exif_viewer = exif_viewer
         self.score_viewer = score_viewer
         self.duplicates_viewer = duplicates_viewer
@@ -44,57 +50,146 @@ class FilmstripViewer(BaseThumbnailViewer):
         self.scrollbar = ttk.Scrollbar(
             self, orient="horizontal", command=self.canvas.xview
         )
-        self.canvas.configure(xscrollcommand=self.scrollbar.set)
+        self.canvas.configure(xscrollcommand=self._on_xscroll)
+        self.canvas.bind("<Configure>", lambda e: self._schedule_render())
 
         self.scrollbar.pack(side="bottom", fill="x")
         self.canvas.pack(side="top", fill="x", expand=True)
 
-        self.inner_frame = ttk.Frame(self.canvas)
-        self.window_id = self.canvas.create_window(
-            (0, 0), window=self.inner_frame, anchor="nw"
-        )
-        self.inner_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")),
-        )
-
+        # Thumbnails are a pool of labels placed as canvas window items, as in
+        # the photo grid: only the ones near the view exist, and they are
+        # re-bound to other photos as the strip scrolls
+        self._index_by_id = {}
         self.refresh_thumbs()
 
     def refresh_thumbs(self):
         """
-        Rebuild filmstrip from current photo viewer thumbnails.
-        Clears existing thumbnails and loads new ones from the photo viewer.
+        Rebuild filmstrip from the photo viewer's current (ranked) photo list.
+        The scrollregion spans every photo, but labels are only bound to the
+        ones in view (see _render_visible).
         """
-        self.clear_thumbnails()
-        for lbl in getattr(self.photo_viewer, "labels", []):
-            img_path = getattr(lbl, "photo_path", None)
-            photo_id = getattr(lbl, "photo_id", None)
-            if not img_path or not photo_id:
-                continue
-
-            tk_img = self.load_thumbnail(img_path)
-            if not tk_img:
-                continue
-
-            self.thumbs.append(tk_img)
-
-            thumb_lbl = ttk.Label(
-                self.inner_frame,
-                image=tk_img,
-                cursor="hand2",
-                bootstyle="dark",
-                relief="solid",
-            )
-            thumb_lbl.image = tk_img
-            thumb_lbl.photo_id = photo_id  # keep id on widget
-            thumb_lbl.photo_path = img_path  # keep path too
-            thumb_lbl.bind(
-                "<Button-1>", lambda e, pid=photo_id: self.on_thumb_click(pid)
-            )
-            thumb_lbl.pack(side="left", padx=self.padding, pady=self.padding)
-            self.labels.append(thumb_lbl)
-
+        self.photos = [
+            photo
+            for photo in getattr(self.photo_viewer, "photos", [])
+            if photo.get("file_path") and photo.get("id")
+        ]
+        self._index_by_id = {p["id"]: i for i, p in enumerate(self.photos)}
+        # The photo list changed, so every label has to be bound again
+        for lbl in self.labels:
+            self._release_thumb(lbl)
+        self.canvas.configure(
+            scrollregion=(0, 0, self._strip_width(), self.thumb_size + 2 * self.padding)
+        )
         self.update_highlight()
+        self._schedule_render()
+
+    def _cell_width(self):
+        return self.thumb_size + 2 * (self.padding + HIGHLIGHT_BORDER)
+
+    def _strip_width(self):
+        return len(self.photos) * self._cell_width() + 2 * self.padding
+
+    def _on_xscroll(self, first, last):
+        """Canvas xscrollcommand: update the scrollbar and the bound thumbnails."""
+        self.scrollbar.set(first, last)
+        self._schedule_render()
+
+    def _schedule_render(self):
+        if self._render_pending is None:
+            self._render_pending = self.after_idle(self._render_visible)
+
+    def _create_thumb(self):
+        """Create one reusable thumbnail label; its photo is set by _bind_thumb."""
+        lbl = ttk.Label(self.canvas, cursor="hand2", bootstyle="dark", relief="flat")
+        lbl.item = self.canvas.create_window(
+            0, self.padding, window=lbl, anchor="nw", state="hidden"
+        )
+        lbl.index = None
+        lbl.photo_id = None
+        lbl.bind("<Button-1>", lambda e, lbl=lbl: self.on_thumb_click(lbl.photo_id))
+        self.labels.append(lbl)
+        return lbl
+
+    def _bind_thumb(self, lbl, idx, priority):
+        """Point a label at self.photos[idx] and request its thumbnail."""
+        photo = self.photos[idx]
+        lbl.index = idx
+        lbl.photo_id = photo["id"]
+        placeholder = self.placeholder_image()
+        lbl.configure(
+            image=placeholder,
+            relief="solid" if photo["id"] == self.selected_id else "flat",
+        )
+        lbl.image = placeholder
+        self.thumb_loader.request(
+            lbl,
+            lambda path=photo["file_path"], key=photo.get("content_hash"): (
+                self.create_uniform_thumbnail_pil(
+                    path, content_hash=key, size=self.thumb_size
+                )
+            ),
+            lambda tk_img, pid=photo["id"]: self._set_thumb(lbl, pid, tk_img),
+            priority,
+        )
+
+    def _render_visible(self):
+        """
+        Bind and place labels for the photos in view (plus OVERSCAN_THUMBS
+        each side); release the rest.
+        """
+        self._render_pending = None
+        if not self.canvas.winfo_exists():
+            return
+        cell_w = self._cell_width()
+        left = self.canvas.canvasx(0)
+        view_w = max(1, self.canvas.winfo_width())
+        visible = range(int(left // cell_w), int((left + view_w) // cell_w) + 1)
+        wanted = range(
+            max(0, visible.start - self.OVERSCAN_THUMBS),
+            min(len(self.photos), visible.stop + self.OVERSCAN_THUMBS),
+        )
+
+        bound = {
+            lbl.index: lbl
+            for lbl in self.labels
+            if lbl.index is not None and lbl.index in wanted
+        }
+        free = [lbl for lbl in self.labels if lbl.index is None or lbl.index not in wanted]
+
+        for idx in wanted:
+            # on-screen thumbnails load before the overscan ones
+            priority = 0 if idx in visible else 1
+            lbl = bound.get(idx)
+            if lbl is None:
+                lbl = free.pop() if free else self._create_thumb()
+                self._bind_thumb(lbl, idx, priority)
+            else:
+                pending = self.thumb_loader.priority_of(lbl)
+                if pending is not None and pending > priority:
+                    self._bind_thumb(lbl, idx, priority)  # scrolled into view
+            self.canvas.coords(lbl.item, self.padding + idx * cell_w, self.padding)
+            self.canvas.itemconfigure(lbl.item, state="normal")
+
+        for lbl in free:
+            self._release_thumb(lbl)
+
+    def _release_thumb(self, lbl):
+        """Hide a label, cancel its pending load and drop its image so it can be reused."""
+        self.thumb_loader.cancel(lbl)
+        self.canvas.itemconfigure(lbl.item, state="hidden")
+        lbl.index = None
+        lbl.photo_id = None
+        lbl.image = None
+        lbl.configure(image="")
+
+    def _set_thumb(self, lbl, photo_id, tk_img):
+        """Loader callback: replace a placeholder with the finished thumbnail."""
+        if not lbl.winfo_exists() or lbl.photo_id != photo_id:
+            return  # label was recycled for another photo meanwhile
+        if tk_img is None:
+            return
+        lbl.configure(image=tk_img)
+        lbl.image = tk_img
 
     def update_highlight(self, selected_photo_id=None):
         """
@@ -107,11 +202,11 @@ class FilmstripViewer(BaseThumbnailViewer):
         if selected_photo_id:
             self.selected_id = selected_photo_id
         for lbl in self.labels:
-            if lbl.photo_id == getattr(self, "selected_id", None):
-                lbl.config(relief="solid")
-                self._scroll_to_label(lbl)
-            else:
-                lbl.config(relief="flat")
+            if lbl.index is not None:
+                lbl.config(relief="solid" if lbl.photo_id == self.selected_id else "flat")
+        idx = self._index_by_id.get(self.selected_id)
+        if idx is not None:
+            self._scroll_to_index(idx)
 
     def on_thumb_click(self, photo_id):
         """
@@ -130,24 +225,23 @@ class FilmstripViewer(BaseThumbnailViewer):
 
         # Show single photo (pass both path and id)
         if hasattr(self.photo_viewer, "_show_single_photo"):
-            photo_lbl = next(
-                (lbl for lbl in self.photo_viewer.labels if lbl.photo_id == photo_id),
+            photo = next(
+                (p for p in self.photo_viewer.photos if p["id"] == photo_id),
                 None,
             )
-            if photo_lbl:
+            if photo:
                 self.photo_viewer._show_single_photo(
-                    photo_lbl.photo_path, photo_lbl.photo_id
+                    photo["file_path"], photo["id"], photo.get("content_hash")
                 )
 
-    def _scroll_to_label(self, lbl):
+    def _scroll_to_index(self, idx):
         """
-        Scroll canvas to make the given thumbnail centered.
+        Scroll canvas to make the thumbnail of self.photos[idx] centered.
 
         Args:
-            lbl: The label of the thumbnail to center.
+            idx: Index of the photo to center.
         """
-        canvas_width = self.canvas.winfo_width()
-        lbl_x = lbl.winfo_x() + lbl.winfo_width() // 2
-        scroll_x = max(0, lbl_x - canvas_width // 2)
-        total_width = self.canvas.bbox("all")[2] if self.canvas.bbox("all") else 1
-        self.canvas.xview_moveto(scroll_x / max(1, total_width))
+        cell_w = self._cell_width()
+        center = self.padding + idx * cell_w + cell_w // 2
+        scroll_x = max(0, center - self.canvas.winfo_width() // 2)
+        self.canvas.xview_moveto(scroll_x / self._strip_width())
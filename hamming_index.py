@@ -0,0 +1,157 @@
+# hamming_index.py
+"""Hamming-space search over 64-bit perceptual hashes."""
+
+
+def hash_to_int(image_hash) -> int:
+    """Pack an imagehash.ImageHash (or its hex string) into a Python int."""
+    return int(str(image_hash), 16)
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two packed hashes."""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over packed hashes with Hamming distance.
+
+    Every child edge is labelled with its distance to the parent; the triangle
+    inequality means a radius-k search only descends into edges labelled
+    d-k..d+k, so a lookup touches a small part of the tree instead of every
+    hash. Several items may share one hash value.
+    """
+
+    def __init__(self, items=()):
+        """
+        :param items: optional iterable of (hash_int, item) to add
+        """
+        self._root = None  # node = [hash, [items], {distance: child}]
+        self._size = 0
+        for value, item in items:
+            self.add(value, item)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value: int, item):
+        """Insert item under the packed hash value."""
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, k: int):
+        """
+        All items whose hash is within Hamming distance k of value.
+
+        :return: list of (item, distance)
+        """
+        found = []
+        if self._root is None:
+            return found
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= k:
+                found.extend((item, d) for item in node[1])
+            for edge, child in node[2].items():
+                if d - k <= edge <= d + k:
+                    stack.append(child)
+        return found
+
+
+class UnionFind:
+    """Disjoint sets over hashable keys, with path halving and union by size."""
+
+    def __init__(self, keys=()):
+        self._parent = {}
+        self._size = {}
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        if key not in self._parent:
+            self._parent[key] = key
+            self._size[key] = 1
+
+    def find(self, key):
+        self.add(key)
+        parent = self._parent
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def union(self, a, b):
+        """Merge the sets holding a and b; returns the new root."""
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if self._size[ra] < self._size[rb]:
+            ra, rb = rb, ra
+        self._parent[rb] = ra
+        self._size[ra] += self._size[rb]
+        return ra
+
+    def groups(self):
+        """All sets as lists, in first-added order of their members."""
+        out = {}
+        for key in self._parent:
+            out.setdefault(self.find(key), []).append(key)
+        return list(out.values())
+
+
+def within(a, b, thresholds) -> bool:
+    """True if every hash pair in a and b is within its threshold."""
+    return all(hamming(x, y) <= k for x, y, k in zip(a, b, thresholds))
+
+
+def cluster_cascade(hashes, thresholds):
+    """
+    Group items through a cascade of hashes.
+
+    Candidates come from a BK-tree search on the first (cheapest) hash; a
+    candidate pair is only linked when every later hash confirms it. Groups
+    are the connected components of the confirmed pairs.
+
+    :param hashes: list of (item, tuple of hash_ints); items hashable and unique
+    :param thresholds: maximum distance per position of the hash tuples
+    :return: list of groups (lists of items) with two or more members
+    """
+    tree = BKTree()
+    sets = UnionFind(item for item, _ in hashes)
+    for item, values in hashes:
+        # Only earlier items are in the tree, so each pair is looked at once
+        for (other, other_values), _ in tree.search(values[0], thresholds[0]):
+            if within(values[1:], other_values[1:], thresholds[1:]):
+                sets.union(item, other)
+        tree.add(values[0], (item, values))
+    return [group for group in sets.groups() if len(group) > 1]
+
+
+def cluster_hashes(hashes, threshold: int):
+    """
+    Group items whose hashes are linked by chains of distance <= threshold.
+
+    This is the same partition DBSCAN(eps=threshold/64, min_samples=2,
+    metric="hamming") gives: with min_samples=2 every point with a neighbour
+    is a core point, so clusters are exactly the connected components of the
+    distance graph and isolated points are noise.
+
+    :param hashes: list of (item, hash_int); items must be hashable and unique
+    :return: list of groups (lists of items) with two or more members
+    """
+    return cluster_cascade([(item, (value,)) for item, value in hashes], (threshold,))
@@ -0,0 +1,132 @@
+# hash_tuning.py
+"""
+Tune near-duplicate hash thresholds against a labelled folder of photos.
+
+Layout of the labelled folder: every sub-folder holds one set of photos that
+are duplicates of each other; photos directly in the top folder are not
+duplicates of anything. For each hash algorithm and distance the tool
+reports pair precision and recall of the groups NearDuplicateDetector would
+build, and optionally scores a full cascade:
+
+    python hash_tuning.py path/to/labelled --cascade dhash:12,phash:5
+"""
+
+import argparse
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from duplicates import HASH_FUNCS, hash_file
+from hamming_index import cluster_cascade
+from image_context import RAW_EXTENSIONS
+
+# Same file types the importer accepts (without pulling in CLIP/torch)
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".tif", ".tiff"} | RAW_EXTENSIONS
+
+
+def load_labelled(folder):
+    """
+    :return: list of (path, label); label is the sub-folder name, or None
+        for photos in the top folder
+    """
+    folder = Path(folder)
+    items = []
+    for path in sorted(folder.rglob("*")):
+        if path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        label = path.parent.relative_to(folder).as_posix()
+        items.append((str(path), None if label == "." else label))
+    return items
+
+
+def hash_labelled(items, workers=None):
+    """Hash every labelled photo; photos that cannot be read are dropped."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(hash_file, [path for path, _ in items], chunksize=8)
+        return [
+            (label, hashes)
+            for (_, label), hashes in zip(items, results)
+            if hashes is not None
+        ]
+
+
+def _pairs(n):
+    return n * (n - 1) // 2
+
+
+def pair_scores(groups, labels):
+    """
+    Pair precision and recall of predicted groups.
+
+    :param groups: list of lists of indices into labels
+    :param labels: label per item; None means the item has no duplicates
+    :return: (precision, recall, predicted_pairs, true_pairs)
+    """
+    true_pairs = sum(_pairs(c) for label, c in Counter(labels).items() if label)
+    predicted = hit = 0
+    for group in groups:
+        predicted += _pairs(len(group))
+        counts = Counter(labels[i] for i in group)
+        hit += sum(_pairs(c) for label, c in counts.items() if label)
+    precision = hit / predicted if predicted else 1.0
+    recall = hit / true_pairs if true_pairs else 1.0
+    return precision, recall, predicted, true_pairs
+
+
+def score_cascade(hashed, cascade):
+    """Precision/recall of cascade, a list of (algorithm, max_distance)."""
+    labels = [label for label, _ in hashed]
+    entries = [
+        (i, tuple(hashes[name] for name, _ in cascade))
+        for i, (_, hashes) in enumerate(hashed)
+    ]
+    groups = cluster_cascade(entries, tuple(limit for _, limit in cascade))
+    return pair_scores(groups, labels)
+
+
+def _parse_cascade(text):
+    cascade = []
+    for part in text.split(","):
+        name, limit = part.split(":")
+        if name not in HASH_FUNCS:
+            raise argparse.ArgumentTypeError(f"unknown hash algorithm {name!r}")
+        cascade.append((name, int(limit)))
+    return cascade
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "folder", help="labelled folder (one sub-folder per duplicate set)"
+    )
+    parser.add_argument("--max-distance", type=int, default=20)
+    parser.add_argument(
+        "--cascade", type=_parse_cascade, help="e.g. dhash:12,phash:5 (cheapest first)"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    items = load_labelled(args.folder)
+    hashed = hash_labelled(items, args.workers)
+    sets = {label for label, _ in hashed if label}
+    print(f"{len(hashed)} photos, {len(sets)} duplicate sets")
+
+    for name in HASH_FUNCS:
+        print(f"\n{name:>6}  dist  precision  recall     F1")
+        for limit in range(args.max_distance + 1):
+            precision, recall, _, _ = score_cascade(hashed, [(name, limit)])
+            f1 = 2 * precision * recall / (precision + recall or 1)
+            print(f"{'':>6}  {limit:>4}  {precision:>9.3f}  {recall:>6.3f}  {f1:.3f}")
+
+    if args.cascade:
+        precision, recall, predicted, true_pairs = score_cascade(hashed, args.cascade)
+        stages = ",".join(f"{name}:{limit}" for name, limit in args.cascade)
+        print(
+            f"\ncascade {stages}: precision {precision:.3f}, recall {recall:.3f} "
+            f"({predicted} predicted pairs, {true_pairs} labelled pairs)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# image_context.py
+
+import hashlib
+import os
+from io import BytesIO
+
+import cv2
+import numpy as np
+import rawpy
+from PIL import Image
+
+# Extensions decoded through rawpy's embedded preview instead of PIL
+RAW_EXTENSIONS = {
+    ".cr2",
+    ".nef",
+    ".arw",
+    ".dng",
+    ".rw2",
+    ".orf",
+    ".raf",
+    ".srw",
+    ".pef",
+}
+
+# EXIF orientation tag value -> transpose that makes the image upright
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Bytes hashed from each end of a file by content_hash()
+HASH_SAMPLE_BYTES = 1 << 20
+
+# cv2.imread flags per reduction factor; JPEGs are scaled in the DCT
+_CV2_REDUCED_COLOR = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def _sampled_hash(size, head, tail) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode())
+    digest.update(head)
+    digest.update(tail)
+    return digest.hexdigest()
+
+
+def content_hash(file_path) -> str:
+    """
+    Fast content key for a photo file: file size plus the first and last
+    HASH_SAMPLE_BYTES, so large RAW files do not have to be read in full.
+    Identical files always give the same key regardless of path or mtime.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        head = f.read(HASH_SAMPLE_BYTES)
+        f.seek(max(HASH_SAMPLE_BYTES, size - HASH_SAMPLE_BYTES))
+        tail = f.read()
+    return _sampled_hash(size, head, tail)
+
+
+def is_raw(file_path) -> bool:
+    """Return True if the path has a RAW camera file extension."""
+    return os.path.splitext(str(file_path))[1].lower() in RAW_EXTENSIONS
+
+
+def reduction_factor(size, max_dim) -> int:
+    """
+    Largest decoder reduction (1, 2, 4 or 8) that keeps the longest side of
+    an image of the given (width, height) at or above max_dim.
+    """
+    factor = 1
+    while factor < 8 and max(size) // (factor * 2) >= max_dim:
+        factor *= 2
+    return factor
+
+
+def _draft(img, max_dim):
+    """Ask a JPEG decoder for the smallest DCT scale with longest side >= max_dim."""
+    factor = reduction_factor(img.size, max_dim)
+    if factor > 1:
+        width, height = img.size
+        img.draft(img.mode, (width // factor, height // factor))
+    return img
+
+
+def open_image(source, raw=False, max_dim=None):
+    """
+    Open an image and return a PIL Image without forcing a full decode.
+
+    Args:
+        source: File path or binary file object.
+        raw (bool): Treat the source as a RAW file and use its embedded preview.
+        max_dim (int, optional): Longest side the caller needs. JPEGs and JPEG
+            previews are then decoded at a reduced DCT scale (1/2, 1/4 or 1/8)
+            that still covers it; other formats decode at full size.
+
+    Returns:
+        PIL.Image.Image: The opened image.
+    """
+    if raw:
+        with rawpy.imread(source) as raw_img:
+            try:
+                thumb = raw_img.extract_thumb()
+            except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+                # No usable preview: demosaic at half size, 4x fewer pixels
+                return Image.fromarray(
+                    raw_img.postprocess(half_size=True, use_camera_wb=True)
+                )
+            # Avoid direct enum reference to silence E1101 on some rawpy versions
+            is_jpeg = getattr(getattr(thumb, "format", None), "name", None) == "JPEG"
+            if is_jpeg:
+                img = Image.open(BytesIO(thumb.data))
+                return _draft(img, max_dim) if max_dim else img
+            return Image.fromarray(thumb.data)
+    img = Image.open(source)
+    return _draft(img, max_dim) if max_dim else img
+
+
+def read_bgr(file_path, max_dim):
+    """
+    Decode a photo as an OpenCV BGR array at reduced resolution.
+
+    The reduction is picked from the header dimensions so the longest side
+    stays at or above max_dim; JPEGs use cv2's IMREAD_REDUCED_COLOR_* (DCT
+    scaling), RAW files their embedded preview. EXIF orientation is applied
+    to non-RAW files, as with cv2.imread.
+
+    Returns:
+        numpy.ndarray or None: The image, or None if it cannot be read.
+    """
+    file_path = str(file_path)
+    if is_raw(file_path):
+        img = open_image(file_path, raw=True, max_dim=max_dim).convert("RGB")
+        return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
+    try:
+        with Image.open(file_path) as header:
+            factor = reduction_factor(header.size, max_dim)
+    except OSError:
+        factor = 1
+    return cv2.imread(file_path, _CV2_REDUCED_COLOR[factor])
+
+
+class ImageContext:
+    """
+    A photo file that is read from disk once and decoded once.
+
+    The import pipeline creates one context per file and hands it to every
+    consumer (EXIF reader, scorer, CLIP analyzer), so a RAW file is parsed a
+    single time instead of once per consumer. Derived images are cached on the
+    context; drop the context when the file is done to free the memory.
+    Once the image is decoded and the EXIF read, release_data() drops the
+    file bytes, which for RAW files are far larger than the decoded preview.
+    """
+
+    def __init__(self, file_path, max_dim=None):
+        """
+        Args:
+            file_path: Path of the photo file; its bytes are read immediately.
+            max_dim (int, optional): Longest side any consumer needs; the image
+                is decoded at the smallest reduced scale that still covers it
+                (see open_image). None decodes at full size.
+        """
+        self.file_path = str(file_path)
+        self.max_dim = max_dim
+        self.is_raw = is_raw(self.file_path)
+        with open(self.file_path, "rb") as f:
+            self.data = f.read()
+        self.exif_bytes = None
+        self._orientation = 1
+        self._image = None
+        self._bgr = None
+        self._content_hash = None
+
+    @property
+    def content_hash(self) -> str:
+        """Same key as content_hash(file_path), computed from the loaded bytes."""
+        if self._content_hash is None and self.data is None:
+            self._content_hash = content_hash(self.file_path)
+        elif self._content_hash is None:
+            size = len(self.data)
+            self._content_hash = _sampled_hash(
+                size,
+                self.data[:HASH_SAMPLE_BYTES],
+                self.data[max(HASH_SAMPLE_BYTES, size - HASH_SAMPLE_BYTES):],
+            )
+        return self._content_hash
+
+    def file_obj(self):
+        """Return a fresh binary file object over the file's bytes."""
+        if self.data is None:
+            raise ValueError(f"File bytes of {self.file_path} were already released")
+        return BytesIO(self.data)
+
+    def release_data(self):
+        """
+        Decode the image (if not done yet) and drop the file bytes. The
+        decoded image, EXIF block and BGR copy stay available; file_obj()
+        does not.
+        """
+        self.image()
+        self.data = None
+
+    def image(self):
+        """
+        Return the decoded RGB PIL image (RAW files use the embedded preview),
+        reduced towards max_dim if one was given. Decoded on first call and cached.
+        """
+        if self._image is None:
+            img = open_image(self.file_obj(), raw=self.is_raw, max_dim=self.max_dim)
+            # Decode now: PIL opens lazily and keeps the buffer until it loads
+            img.load()
+            self.exif_bytes = img.info.get("exif")
+            self._orientation = img.getexif().get(0x0112, 1)
+            self._image = img if img.mode == "RGB" else img.convert("RGB")
+        return self._image
+
+    def bgr(self):
+        """
+        Return the image as an OpenCV BGR uint8 array.
+        EXIF orientation is applied, matching what cv2.imread returns.
+        """
+        if self._bgr is None:
+            img = self.image()
+            transpose = _ORIENTATION_TRANSPOSE.get(self._orientation)
+            if transpose is not None:
+                img = img.transpose(transpose)
+            self._bgr = cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
+        return self._bgr
+
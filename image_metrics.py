@@ -0,0 +1,232 @@
+# image_metrics.py
+"""
+Single-pass quality metrics for a decoded BGR image.
+
+The frame is shrunk first (INTER_AREA, longest side MAX_DIM) and every metric
+is computed on the small copy, in uint8/int16/float32 with float64
+accumulation left to OpenCV. Intermediates are shared: one grayscale
+histogram gives brightness mean/median, contrast std/range and entropy, and
+one int16 gradient pass gives the Sobel energy. compute_metrics_batch gives
+the same values for a stack of equally sized frames.
+
+Differences from the metrics PhotoScorer computed before this module
+(checked in tests/test_image_metrics.py):
+
+- gray and HSV are derived from the shrunk BGR frame instead of being shrunk
+  separately, so images larger than MAX_DIM differ by rounding (a grey level
+  at most per pixel); smaller images are unaffected.
+- noise is mean |gray - blur(gray)|. The old code subtracted uint8 arrays,
+  which wraps negative differences to 256 - d and inflated the value; the
+  new value is the intended absolute difference.
+- colorfulness is accumulated from float32 channels instead of float64
+  (relative difference around 1e-6).
+"""
+
+import cv2
+import numpy as np
+
+from image_context import read_bgr
+
+# Longest side, in pixels, that metrics are computed at
+MAX_DIM = 800
+
+# Bump when a metric definition or the decode scale changes, so cached
+# analyses (see PhotoImporter.ANALYSIS_VERSION) are recomputed
+SCORER_VERSION = 2  # 2: fused kernel, noise without uint8 wrap, reduced decode
+
+# Every metric compute_metrics returns, and the record type of a batch result
+METRICS = (
+    "laplacian_var",
+    "sobel_energy",
+    "noise",
+    "brightness_mean",
+    "brightness_median",
+    "saturation_mean",
+    "saturation_std",
+    "contrast_std",
+    "contrast_range",
+    "colorfulness",
+    "entropy",
+    "width",
+    "height",
+    "aspect_ratio",
+)
+METRIC_DTYPE = np.dtype([(name, np.float64) for name in METRICS])
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+
+def shrink(img, max_dim=MAX_DIM):
+    """Resize img so its longest side is at most max_dim (aspect preserved)."""
+    height, width = img.shape[:2]
+    if max(height, width) <= max_dim:
+        return img
+    scale = max_dim / max(height, width)
+    new_size = (int(width * scale), int(height * scale))
+    return cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
+
+
+def load_frame(file_path, max_dim=MAX_DIM):
+    """
+    Decode (at reduced scale) and shrink one photo for batch scoring.
+    Module-level so process pools can run it.
+
+    :return: BGR uint8 array with longest side <= max_dim, or None if unreadable
+    """
+    try:
+        img = read_bgr(file_path, max_dim)
+    except Exception as e:
+        print(f"Failed to read {file_path} for scoring: {e}")
+        return None
+    return None if img is None else shrink(img, max_dim)
+
+
+def _moments(hist, levels):
+    """Mean and standard deviation per row of (n, bins) histograms over levels."""
+    total = hist.sum(axis=1)
+    mean = hist @ levels / total
+    variance = np.einsum("ij,ij->i", hist, np.square(levels - mean[:, None])) / total
+    return mean, np.sqrt(variance)
+
+
+def _histogram_stats(hist):
+    """
+    Mean, median, std, range and entropy from grey-level histograms.
+
+    :param hist: (n, 256) float64 array, one histogram per image
+    :return: dict of metric name -> (n,) array
+    """
+    total = hist.sum(axis=1)
+    mean, std = _moments(hist, _LEVELS)
+
+    # Median as np.median gives it: average of the two middle values. The
+    # value at sorted position k is the number of cumulative counts <= k.
+    cumulative = np.cumsum(hist, axis=1)
+    low = (cumulative <= ((total - 1) // 2)[:, None]).sum(axis=1)
+    high = (cumulative <= (total // 2)[:, None]).sum(axis=1)
+
+    present = hist > 0
+    first = present.argmax(axis=1)
+    last = 255 - present[:, ::-1].argmax(axis=1)
+    p = hist / total[:, None]
+    logs = np.log2(p, out=np.zeros_like(p), where=present)
+    return {
+        "brightness_mean": mean,
+        "brightness_median": (low + high) / 2.0,
+        "contrast_std": std,
+        "contrast_range": (last - first).astype(np.float64),
+        "entropy": -np.einsum("ij,ij->i", p, logs),
+    }
+
+
+def _spatial_metrics(gray):
+    """Laplacian variance, Sobel energy and noise of one uint8 grey frame."""
+    # Both Sobel derivatives in one int16 pass, squared sums in float64
+    dx, dy = cv2.spatialGradient(gray)
+    sobel_energy = cv2.norm(dx, cv2.NORM_L2SQR) + cv2.norm(dy, cv2.NORM_L2SQR)
+    _, laplacian_std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+    noise = cv2.mean(cv2.absdiff(gray, cv2.GaussianBlur(gray, (3, 3), 0)))[0]
+    return float(laplacian_std[0, 0] ** 2), float(sobel_energy), float(noise)
+
+
+def _colorfulness(img):
+    """Hasler & Süsstrunk colorfulness of a BGR uint8 image."""
+    b, g, r = cv2.split(img.astype(np.float32))
+    rg = cv2.absdiff(r, g)
+    yb = cv2.absdiff(cv2.addWeighted(r, 0.5, g, 0.5, 0), b)
+    rg_mean, rg_std = cv2.meanStdDev(rg)
+    yb_mean, yb_std = cv2.meanStdDev(yb)
+    return float(
+        np.hypot(rg_mean[0, 0], yb_mean[0, 0]) + 0.3 * (rg_std[0, 0] + yb_std[0, 0])
+    )
+
+
+def compute_metrics(img, max_dim=MAX_DIM):
+    """
+    All quality metrics PhotoScorer stores, for one BGR uint8 image.
+
+    :param img: decoded BGR image (any size)
+    :param max_dim: longest side the metrics are computed at
+    :return: dict of metric_name -> value; width/height are of the shrunk image
+    """
+    small = shrink(img, max_dim)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    saturation = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)[:, :, 1]
+
+    laplacian_var, sobel_energy, noise = _spatial_metrics(gray)
+    saturation_mean, saturation_std = cv2.meanStdDev(saturation)
+
+    scores = {
+        "laplacian_var": laplacian_var,
+        "sobel_energy": sobel_energy,
+        "noise": noise,
+        "saturation_mean": float(saturation_mean[0, 0]),
+        "saturation_std": float(saturation_std[0, 0]),
+        "colorfulness": _colorfulness(small),
+        "width": small.shape[1],
+        "height": small.shape[0],
+        "aspect_ratio": small.shape[1] / small.shape[0],
+    }
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).reshape(1, 256)
+    for name, values in _histogram_stats(hist.astype(np.float64)).items():
+        scores[name] = float(values[0])
+    return scores
+
+
+def _histograms(tall, n, bins):
+    """
+    One histogram per frame of a stack stored as a tall image.
+    :return: (n, bins) float64 array
+    """
+    frames = tall.reshape(n, -1, tall.shape[1])
+    return np.stack(
+        [cv2.calcHist([frame], [0], None, [bins], [0, bins]).ravel() for frame in frames]
+    ).astype(np.float64)
+
+
+def compute_metrics_batch(frames):
+    """
+    compute_metrics for a stack of equally sized, already shrunk frames.
+
+    The stack is treated as one tall image, so every per-pixel operation
+    (colour conversion, channel differences) is a single OpenCV call for the
+    whole batch. Per frame only histograms are taken; means, deviations,
+    medians and entropies then come from NumPy reductions over the (n, bins)
+    histogram matrices. The spatial filters (Laplacian, Sobel, blur) still
+    run frame by frame so that neighbouring frames do not bleed into each
+    other at the borders. Values match compute_metrics on each frame.
+
+    :param frames: (n, height, width, 3) BGR uint8 array, longest side <= MAX_DIM
+    :return: structured array of n records with METRIC_DTYPE
+    """
+    n, height, width = frames.shape[:3]
+    out = np.empty(n, dtype=METRIC_DTYPE)
+    tall = np.ascontiguousarray(frames).reshape(n * height, width, 3)
+    gray = cv2.cvtColor(tall, cv2.COLOR_BGR2GRAY)
+    saturation = cv2.cvtColor(tall, cv2.COLOR_BGR2HSV)[:, :, 1]
+
+    for i, frame in enumerate(gray.reshape(n, height, width)):
+        (
+            out["laplacian_var"][i],
+            out["sobel_energy"][i],
+            out["noise"][i],
+        ) = _spatial_metrics(frame)
+
+    for name, values in _histogram_stats(_histograms(gray, n, 256)).items():
+        out[name] = values
+    out["saturation_mean"], out["saturation_std"] = _moments(
+        _histograms(saturation, n, 256), _LEVELS
+    )
+
+    # Colorfulness terms are exact integers: |R - G| and 2 * |(R + G) / 2 - B|
+    b, g, r = cv2.split(tall)
+    rg = cv2.absdiff(r, g)
+    yb2 = cv2.absdiff(cv2.add(r, g, dtype=cv2.CV_16U), cv2.add(b, b, dtype=cv2.CV_16U))
+    rg_mean, rg_std = _moments(_histograms(rg, n, 256), _LEVELS)
+    yb_mean, yb_std = _moments(_histograms(yb2, n, 511), np.arange(511) / 2.0)
+    out["colorfulness"] = np.hypot(rg_mean, yb_mean) + 0.3 * (rg_std + yb_std)
+
+    out["width"] = width
+    out["height"] = height
+    out["aspect_ratio"] = width / height
+    return out
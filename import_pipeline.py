@@ -0,0 +1,171 @@
+# import_pipeline.py
+
+import queue
+import threading
+
+# Marker pushed through the queues to tell workers a stage has no more input
+_DONE = object()
+
+
+class ImportJob:
+    """
+    State for a single file as it moves through the import pipeline.
+    Each stage fills in its own fields; the DB stage writes everything at the end.
+    """
+
+    def __init__(self, file, collection_id: int, default_styles=None):
+        self.file = file
+        self.collection_id = collection_id
+        self.default_styles = default_styles
+        self.context = None  # ImageContext shared by the analysis stages
+        self.content_hash = None
+        self.cached_from = None  # photo id whose analysis is copied instead of redone
+        self.exif = {}
+        self.scores = None
+        self.scaled_scores = None
+        self.embedding = None
+        self.hashes = {}  # perceptual hash algorithm -> 64-bit int
+        self.photo_id = None
+        self.error = None
+
+
+class ImportPipeline:
+    """
+    Runs jobs through a fixed sequence of stages.
+
+    Every stage has its own pool of worker threads and a bounded queue in
+    front of it, so a slow stage (e.g. CLIP embedding) applies back-pressure
+    instead of letting decoded images pile up in memory. A job whose `error`
+    is set skips all remaining stages and is returned as failed.
+
+    A batching stage waits until it has a full batch or its input is closed,
+    so its batches stay full however slow the stages in front of it are;
+    only the last batch of a run can be short.
+    """
+
+    def __init__(self, stages, queue_size=16):
+        """
+        Args:
+            stages (list[tuple]): (name, func, workers) or
+                (name, func, workers, batch_size) per stage, in order.
+                `func` takes an ImportJob and fills in its fields; when a
+                batch_size is given it takes a list of up to that many jobs.
+            queue_size (int): Maximum number of jobs waiting in front of each stage.
+        """
+        if not stages:
+            raise ValueError("ImportPipeline needs at least one stage")
+        self.stages = []
+        for stage in stages:
+            name, func, workers = stage[:3]
+            batch_size = stage[3] if len(stage) > 3 else None
+            self.stages.append((name, func, max(1, int(workers)), batch_size))
+        self.queue_size = queue_size
+
+    def run(self, jobs):
+        """
+        Push all jobs through every stage and wait for them to finish.
+
+        Args:
+            jobs (iterable[ImportJob]): Jobs to process.
+
+        Returns:
+            list[ImportJob]: Finished jobs, in completion order.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results = queue.Queue()
+        threads = []
+
+        for idx, (name, func, workers, batch_size) in enumerate(self.stages):
+            out_q = queues[idx + 1] if idx + 1 < len(queues) else results
+            next_workers = self.stages[idx + 1][2] if idx + 1 < len(self.stages) else 1
+            remaining = [workers]  # live workers in this stage, shared between them
+            lock = threading.Lock()
+            target = self._batch_worker if batch_size else self._worker
+            for n in range(workers):
+                t = threading.Thread(
+                    target=target,
+                    args=(func, queues[idx], out_q, remaining, lock, next_workers)
+                    + ((batch_size,) if batch_size else ()),
+                    name=f"import-{name}-{n}",
+                    daemon=True,
+                )
+                t.start()
+                threads.append(t)
+
+        # Feed from a separate thread so the bounded queues cannot deadlock with
+        # the result collection below.
+        feeder = threading.Thread(
+            target=self._feed, args=(jobs, queues[0], self.stages[0][2]), daemon=True
+        )
+        feeder.start()
+
+        finished = []
+        while True:
+            job = results.get()
+            if job is _DONE:
+                break
+            finished.append(job)
+
+        feeder.join()
+        for t in threads:
+            t.join()
+        return finished
+
+    @staticmethod
+    def _feed(jobs, in_q, workers):
+        for job in jobs:
+            in_q.put(job)
+        for _ in range(workers):
+            in_q.put(_DONE)
+
+    @classmethod
+    def _worker(cls, func, in_q, out_q, remaining, lock, next_workers):
+        while True:
+            job = in_q.get()
+            if job is _DONE:
+                break
+            if job.error is None:
+                try:
+                    func(job)
+                except Exception as e:
+                    job.error = e
+                    job.context = None  # free the decoded image early
+            out_q.put(job)
+
+        cls._close_stage(out_q, remaining, lock, next_workers)
+
+    @classmethod
+    def _batch_worker(cls, func, in_q, out_q, remaining, lock, next_workers, batch_size):
+        done = False
+        while not done:
+            batch = []
+            while len(batch) < batch_size:
+                job = in_q.get()
+                if job is _DONE:
+                    done = True
+                    break
+                batch.append(job)
+
+            todo = [j for j in batch if j.error is None]
+            if todo:
+                try:
+                    func(todo)
+                except Exception as e:
+                    for j in todo:
+                        j.error = e
+            for j in batch:
+                if j.error is not None:
+                    j.context = None
+                out_q.put(j)
+
+        cls._close_stage(out_q, remaining, lock, next_workers)
+
+    @staticmethod
+    def _close_stage(out_q, remaining, lock, next_workers):
+        # The last worker out of a stage closes the next one
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(next_workers):
+                out_q.put(_DONE)
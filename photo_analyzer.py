@@ -1,10 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import torch
-import clip
 from PIL import Image
 import numpy as np
 from tqdm import tqdm
 
 from db import Database
+from image_context import ImageContext
+from clip_service import get_clip_service
 
 
 class PhotoAnalyzer:
@@ -21,17 +24,47 @@ class PhotoAnalyzer:
     NOTE: Quality scoring is handled by PhotoScorer and importer
     """
 
-    def __init__(self, db: Database = None, device: str = None):
+    def __init__(
+        self,
+        db: Database = None,
+        device: str = None,
+        batch_size: int = 32,
+        prefetch_workers: int = 4,
+        torch_threads: int = None,
+    ):
+        """
+        :param db: Database instance
+        :param device: torch device; defaults to cuda when available
+        :param batch_size: images per CLIP forward pass in extract_embeddings
+        :param prefetch_workers: threads decoding/preprocessing the next batch
+        :param torch_threads: if set, number of threads torch may use for CLIP
+            inference, set on the shared CLIP service
+        """
         self.db = db
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        # CLIP is shared process-wide and only loaded when first needed
+        self.clip = get_clip_service(device, torch_threads)
+        self.device = self.clip.device
+        self.batch_size = batch_size
+        self.prefetch_workers = prefetch_workers
 
-        # Load CLIP model
-        self.model, self.process = clip.load("ViT-B/32", device=self.device)
+    @property
+    def model(self):
+        return self.clip.model
+
+    @property
+    def process(self):
+        return self.clip.preprocess
 
     # --------------------- Embeddings -------------------------
-    def extract_embedding(self, file_path):
-        """Extracts a semantic embedding vector using CLIP."""
-        img = Image.open(file_path).convert("RGB")
+    def extract_embedding(self, file_path, context: ImageContext = None):
+        """
+        Extracts a semantic embedding vector using CLIP.
+        Uses the decoded image from `context` when one is given.
+        """
+        if context is not None:
+            img = context.image()
+        else:
+            img = Image.open(file_path).convert("RGB")
         img_preprocessed = self.process(img).unsqueeze(0).to(self.device)
 
         with torch.no_grad():
@@ -40,7 +73,74 @@ class PhotoAnalyzer:
 
         return features.cpu().numpy().flatten()
 
-    def analyze_photo(self, photo_id, file_path):
+    def _preprocess(self, source):
+        """Decode (if needed) and preprocess one image into a CLIP input tensor."""
+        if isinstance(source, ImageContext):
+            img = source.image()
+        else:
+            img = Image.open(source).convert("RGB")
+        return self.process(img)
+
+    def extract_embeddings(self, sources, batch_size=None, show_progress=False):
+        """
+        Extract CLIP embeddings for many images, batch_size images per forward pass.
+        While one batch runs through the model, the next one is decoded and
+        preprocessed on background threads.
+
+        :param sources: file paths and/or ImageContext objects
+        :param batch_size: overrides self.batch_size
+        :param show_progress: show a tqdm progress bar
+        :return: list aligned with sources; None where an image failed
+        """
+        sources = list(sources)
+        batch_size = max(1, batch_size or self.batch_size)
+        batches = [
+            range(start, min(start + batch_size, len(sources)))
+            for start in range(0, len(sources), batch_size)
+        ]
+        results = [None] * len(sources)
+        if not batches:
+            return results
+
+        model = self.model
+        progress = tqdm(
+            total=len(sources), desc="Embedding photos", disable=not show_progress
+        )
+        with ThreadPoolExecutor(max_workers=self.prefetch_workers) as pool:
+
+            def submit(batch):
+                return [pool.submit(self._preprocess, sources[i]) for i in batch]
+
+            pending = submit(batches[0])
+            for n, batch in enumerate(batches):
+                futures = pending
+                # Queue the next batch so it is prepared while this one runs
+                pending = submit(batches[n + 1]) if n + 1 < len(batches) else None
+
+                tensors, indices = [], []
+                for i, future in zip(batch, futures):
+                    try:
+                        tensors.append(future.result())
+                        indices.append(i)
+                    except Exception as e:
+                        print(f"Failed to embed {self._source_name(sources[i])}: {e}")
+
+                if tensors:
+                    batch_tensor = torch.stack(tensors).to(self.device)
+                    with torch.no_grad():
+                        features = model.encode_image(batch_tensor)
+                        features /= features.norm(dim=-1, keepdim=True)  # nomarlize
+                    for i, feature in zip(indices, features.cpu().numpy()):
+                        results[i] = feature
+                progress.update(len(batch))
+        progress.close()
+        return results
+
+    @staticmethod
+    def _source_name(source):
+        return source.file_path if isinstance(source, ImageContext) else source
+
+    def analyze_photo(self, photo_id, file_path, context: ImageContext = None):
         """
         Analyze a single photo:
         - Extract CLIP embedding and store in DB
@@ -49,7 +149,7 @@ class PhotoAnalyzer:
         if self.db is None:
             raise ValueError("Database instance not provided.")
 
-        embedding = self.extract_embedding(file_path)
+        embedding = self.extract_embedding(file_path, context)
         self.db.add_embedding(photo_id, embedding.tolist())
 
         return {"embedding": embedding}
@@ -62,13 +162,18 @@ class PhotoAnalyzer:
         returns dict: photo_id -> embedding
         """
 
+        if self.db is None:
+            raise ValueError("Database instance not provided.")
+
+        embeddings = self.extract_embeddings(
+            [photo["file_path"] for photo in photo_list], show_progress=True
+        )
         results = {}
-        for photo in tqdm(photo_list, desc="Analyzing photos"):
-            photo_id, path = photo["id"], photo["file_path"]
-            try:
-                results[photo_id] = self.analyze_photo(photo_id, path)
-            except Exception as e:
-                print(f"Failed to analyze {path}: {e}")
+        for photo, embedding in zip(photo_list, embeddings):
+            if embedding is None:
+                continue
+            self.db.add_embedding(photo["id"], embedding.tolist())
+            results[photo["id"]] = {"embedding": embedding}
 
         return results
 
@@ -81,18 +186,13 @@ class PhotoAnalyzer:
 
         from sklearn.cluster import DBSCAN
 
-        embeddings = []
-        id_map = []
-        for pid in photo_ids:
-            emb = self.db.get_embedding(pid)
-            if emb is not None:
-                embeddings.append(emb)
-                id_map.append(pid)
+        stored = self.db.get_embeddings(photo_ids)
+        id_map = [pid for pid in photo_ids if pid in stored]
 
-        if not embeddings:
+        if not id_map:
             return {}
 
-        embeddings_np = np.array(embeddings)
+        embeddings_np = np.array([stored[pid] for pid in id_map], dtype=np.float32)
         clustering = DBSCAN(eps=eps, min_samples=min_samples, metric="cosine").fit(
             embeddings_np
         )
@@ -113,11 +213,8 @@ class PhotoAnalyzer:
         Returns list of (photo_id, score) sorted by score descending.
         """
 
-        scores = []
-        for pid in photo_ids:
-            q = self.db.get_quality_score(pid)
-            if q is not None:
-                scores.append((pid, q))
+        quality = self.db.get_quality_scores(photo_ids)
+        scores = [(pid, quality[pid]) for pid in photo_ids if pid in quality]
 
         scores.sort(key=lambda x: x[1], reverse=True)
         return scores
@@ -1,11 +1,19 @@
 # photo_importer.py
 
+import filecmp
+import os
 from pathlib import Path
 from db import Database
 from duplicates import NearDuplicateDetector
+from semantic_duplicates import SemanticDuplicateDetector
 from photo_scorer import PhotoScorer
 from exif_reader import ExifReader
 from photo_analyzer import PhotoAnalyzer
+from import_pipeline import ImportJob, ImportPipeline
+from image_context import ImageContext, content_hash
+from image_metrics import SCORER_VERSION
+from clip_service import ClipModelService
+from thumbnail_cache import ThumbnailCache, get_thumbnail_cache
 
 class PhotoImporter:
     """
@@ -29,26 +37,114 @@ class PhotoImporter:
         ".pef",
     )
 
-    def __init__(self, db: Database, near_dup_threshold=5):
+    # Loose dHash distance for the duplicate pre-filter; pHash makes the final call.
+    # Tune both with hash_tuning.py against a labelled folder.
+    DHASH_PREFILTER = 12
+
+    # Keys the analysis cache together with the file's content hash: a file
+    # already analysed with the same scorer, CLIP model and hash version gets
+    # its rows copied instead of being decoded and analysed again
+    ANALYSIS_VERSION = (
+        f"scorer{SCORER_VERSION}"
+        f"-clip:{ClipModelService.MODEL_NAME}"
+        f"-hash{NearDuplicateDetector.HASH_VERSION}"
+    )
+
+    # Default number of worker threads for each import stage
+    DEFAULT_STAGE_WORKERS = {
+        "decode": 2,
+        "score": 2,
+        "thumbs": 1,
+        "hash": 1,
+        "embed": 1,
+        "db": 2,
+    }
+
+    def __init__(
+        self,
+        db: Database,
+        near_dup_threshold=5,
+        burst_window=5.0,
+        hash_cascade=None,
+        stage_workers=None,
+        queue_size=16,
+        embed_batch_size=32,
+        torch_threads=None,
+    ):
         """
         Initialize the PhotoImporter with a database connection and other components.
 
         Args:
             db (Database): The database instance to interact with.
             near_dup_threshold (int): Threshold for near-duplicate detection.
+            burst_window (float, optional): Seconds between shots from one camera
+                for them to be compared as duplicate candidates; None compares
+                every photo by hash alone.
+            hash_cascade (tuple, optional): (algorithm, max distance) stages for
+                duplicate matching; default is a dHash pre-filter confirmed by
+                pHash at near_dup_threshold.
+            stage_workers (dict, optional): Worker count per import stage
+                ("decode", "score", "thumbs", "hash", "embed", "db"); missing
+                stages use DEFAULT_STAGE_WORKERS.
+            queue_size (int): Maximum number of files waiting in front of each stage.
+            embed_batch_size (int): Number of photos per CLIP forward pass.
+            torch_threads (int, optional): Number of threads torch may use for
+                CLIP inference (set on the shared CLIP service).
         """
         self.db = db
         # Initialize NearDuplicateDetector with the provided threshold
-        self.duplicates = NearDuplicateDetector(db, threshold=near_dup_threshold)
+        self.duplicates = NearDuplicateDetector(
+            db,
+            threshold=near_dup_threshold,
+            burst_window=burst_window,
+            cascade=hash_cascade
+            or (("dhash", self.DHASH_PREFILTER), ("phash", near_dup_threshold)),
+        )
+        # CLIP-embedding duplicates, for edits that change the perceptual hash
+        self.semantic_duplicates = SemanticDuplicateDetector(db)
         # Initialize PhotoScorer to score photos
         self.scorer = PhotoScorer(db)
         # Initialize PhotoAnalyzer for analyzing photos
-        self.photo_analyzer = PhotoAnalyzer(db)
+        self.photo_analyzer = PhotoAnalyzer(
+            db, batch_size=embed_batch_size, torch_threads=torch_threads
+        )
+
+        # Thumbnails are rendered at import so the viewers never decode originals
+        self.thumbnails = get_thumbnail_cache()
+
+        self.stage_workers = dict(self.DEFAULT_STAGE_WORKERS)
+        self.stage_workers.update(stage_workers or {})
+        self.queue_size = queue_size
+
+    def _build_pipeline(self):
+        """Create the multi-stage import pipeline using the configured worker counts."""
+        stages = [
+            ("decode", self._decode_stage),
+            ("score", self._score_stage),
+            ("thumbs", self._thumbs_stage),
+            ("hash", self._hash_stage),
+            ("embed", self._embed_stage),
+            ("db", self._db_stage),
+        ]
+        # The embed stage receives lists of jobs so CLIP can run them as one batch
+        batch_sizes = {"embed": self.photo_analyzer.batch_size}
+        return ImportPipeline(
+            [
+                (name, func, self.stage_workers[name], batch_sizes.get(name))
+                for name, func in stages
+            ],
+            queue_size=self.queue_size,
+        )
 
     def import_files(self, file_paths: list[str], collection_id: int, default_styles=None):
         """
         Import a list of photo files into the database.
 
+        Files are processed concurrently by the import pipeline; see
+        `stage_workers` for how many workers each stage gets. Once all files
+        are in, the new photos are matched against the existing near-duplicate
+        groups from the hashes the pipeline stored.
+
         Args:
             file_paths (list[str]): List of file paths to import.
             collection_id (int): The ID of the collection to which photos will be added.
@@ -57,16 +153,23 @@ class PhotoImporter:
         Returns:
             int: Number of successfully imported photos.
         """
-        imported_count = 0
-        for file_path in file_paths:
-            try:
-                # Import each file and count successful imports
-                self._import_file(Path(file_path), collection_id, default_styles)
-                imported_count += 1
-            except Exception as e:
-                print(f"Skipping {file_path}: {e}")
-        print(f"Imported {imported_count} photos")
-        return imported_count
+        jobs = (
+            ImportJob(Path(file_path), collection_id, default_styles)
+            for file_path in file_paths
+        )
+        imported = []
+        for job in self._build_pipeline().run(jobs):
+            if job.error is not None:
+                print(f"Skipping {job.file}: {job.error}")
+            else:
+                imported.append({"id": job.photo_id, "file_path": str(job.file)})
+        print(f"Imported {len(imported)} photos")
+        try:
+            self.duplicates.find_duplicates_incremental(imported)
+        except Exception as e:
+            # The photos are in; show_suggestions groups them later instead
+            print(f"Failed to group imported photos: {e}")
+        return len(imported)
 
     def import_folder(self, folder_path: str, collection_id: int, default_styles=None):
         """
@@ -108,38 +211,150 @@ class PhotoImporter:
         Returns:
             int: The ID of the imported photo in the database.
         """
+        (job,) = self._build_pipeline().run([ImportJob(file, collection_id, default_styles)])
+        if job.error is not None:
+            raise job.error
+        return job.photo_id
+
+    # ----------------- Pipeline stages -----------------
+    def _decode_stage(self, job: ImportJob):
+        """
+        Read and decode the file once and extract its EXIF; later stages share
+        the decoded image. The file bytes are dropped here, so the contexts
+        queued between stages only hold the reduced preview.
+        Files already analysed (same content, same ANALYSIS_VERSION) are not
+        decoded: the analysis stages skip them and the db stage copies rows.
+        """
         # Check if the file has a supported extension
-        if file.suffix.lower() not in self.SUPPORTED_EXTENSIONS:
-            raise ValueError(f"Unsupported file type: {file.suffix}")
+        if job.file.suffix.lower() not in self.SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {job.file.suffix}")
+        # Sampled hash: reads only the head and tail of the file
+        job.content_hash = content_hash(job.file)
+        source = self.db.find_analysed_photo(job.content_hash, self.ANALYSIS_VERSION)
+        if source is not None and self._same_content(source["file_path"], job.file):
+            job.cached_from = source["id"]
+            return
+        # The thumbnail preview is the largest image any later stage needs
+        job.context = ImageContext(job.file, max_dim=ThumbnailCache.PREVIEW_SIZE)
+        job.context.image()
+        # RAW EXIF is parsed from the file bytes, so read it before they go
+        job.exif = ExifReader.read_exif(job.file, job.context)
+        job.context.release_data()
 
-        # --- Extract EXIF using the dedicated reader ---
-        exif = ExifReader.read_exif(file)
+    @staticmethod
+    def _same_content(source_path, file: Path):
+        """
+        Confirm an analysis cache hit. The content hash only samples the
+        head and tail of a file, so while the source photo's file is still
+        there it is compared byte for byte; a moved or deleted source is
+        trusted on the hash alone.
+        """
+        if not os.path.exists(source_path) or os.path.samefile(source_path, file):
+            return True
+        return filecmp.cmp(source_path, file, shallow=False)
+
+    def _score_stage(self, job: ImportJob):
+        """Compute quality metrics; a scoring failure does not abort the import."""
+        if job.cached_from is not None:
+            return
+        try:
+            job.scores = self.scorer.score_photo(str(job.file), job.context)
+            job.scaled_scores = self.scorer.scale_scores(job.scores)
+        except Exception as e:
+            print(f"Failed to score {job.file.name}: {e}")
 
+    def _thumbs_stage(self, job: ImportJob):
+        """Pre-render grid thumbnails and the preview into the thumbnail cache."""
+        if job.cached_from is not None:
+            return
+        try:
+            self.thumbnails.store_all(job.content_hash, job.context.image())
+        except OSError as e:
+            print(f"Failed to cache thumbnails for {job.file.name}: {e}")
+
+    def _hash_stage(self, job: ImportJob):
+        """
+        Perceptual hashes for duplicate detection (computed later if this fails).
+        Hashed from the file, not the decoded preview, so they match the ones
+        duplicate detection computes for photos hashed on demand.
+        """
+        if job.cached_from is not None:
+            return
+        job.hashes = self.duplicates.hash_file(job.file) or {}
+        if not job.hashes:
+            print(f"Failed to hash {job.file.name}")
+
+    def _embed_stage(self, jobs: list[ImportJob]):
+        """Extract CLIP embeddings for a batch of photos in one forward pass."""
+        jobs = [job for job in jobs if job.cached_from is None]
+        if not jobs:
+            return
+        embeddings = self.photo_analyzer.extract_embeddings(
+            [job.context for job in jobs]
+        )
+        for job, embedding in zip(jobs, embeddings):
+            if embedding is None:
+                job.error = ValueError("Failed to extract CLIP embedding")
+            job.embedding = embedding
+
+    def _db_stage(self, job: ImportJob):
+        """
+        Write the photo and everything computed for it to the database,
+        in one transaction so a failure leaves no partial photo behind.
+        """
+        # The decoded image is no longer needed once we get here
+        job.context = None
+        with self.db.transaction():
+            self._write_job(job)
+
+    def _write_job(self, job: ImportJob):
+        file = job.file
+        # Only a complete analysis may serve as a cache source later
+        complete = job.cached_from is not None or (
+            job.scores is not None and bool(job.hashes)
+        )
         # Add photo to database and get its ID
-        photo_id = self.db.add_photo(
-            collection_id=collection_id, file_path=str(file), file_name=file.name
+        job.photo_id = self.db.add_photo(
+            collection_id=job.collection_id,
+            file_path=str(file),
+            file_name=file.name,
+            content_hash=job.content_hash,
+            analysis_version=self.ANALYSIS_VERSION if complete else None,
         )
 
-        # Automatically analyze new photo
-        self.photo_analyzer.analyze_photo(photo_id, file_path=str(file))
+        if job.cached_from is not None:
+            self.db.copy_analysis(job.cached_from, job.photo_id)
+            self._assign_styles(job)
+            print(f"Imported {file} (analysis copied from photo {job.cached_from})")
+            return
+
+        self.db.add_embedding(job.photo_id, job.embedding.tolist())
 
         # Store EXIF data in the database
-        for key, value in exif.items():
-            self.db.add_exif(photo_id, key, str(value))
+        self.db.add_exif_bulk(
+            (job.photo_id, key, value) for key, value in job.exif.items()
+        )
 
-        # Assign default styles to the imported photo
-        if default_styles:
-            for style_name in default_styles:
-                style_id = self.db.add_style(style_name)
-                if style_id:
-                    self.db.assign_style(photo_id, style_id)
+        # Missing hashes are computed by duplicate detection later
+        if job.hashes:
+            self.db.add_photo_hashes(
+                (job.photo_id, algorithm, self.duplicates.HASH_VERSION, value)
+                for algorithm, value in job.hashes.items()
+            )
 
-        # Score the image and store scores in the database
-        try:
-            scores = self.scorer.score_and_store(photo_id, str(file))
-            print(f"Scores for {file.name}: {scores}")
-        except Exception as e:
-            print(f"Failed to score {file.name}: {e}")
+        self._assign_styles(job)
+
+        # Store scores computed by the score stage
+        if job.scores is not None:
+            self.scorer.store_scores(job.photo_id, job.scores, job.scaled_scores)
+            print(f"Scores for {file.name}: {job.scores}")
 
         print(f"Imported {file}")
-        return photo_id
+
+    def _assign_styles(self, job: ImportJob):
+        """Assign default styles to the imported photo."""
+        if job.default_styles:
+            for style_name in job.default_styles:
+                style_id = self.db.add_style(style_name)
+                if style_id:
+                    self.db.assign_style(job.photo_id, style_id)
@@ -1,99 +1,53 @@
 # photo_scorer.py
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import cv2
 import numpy as np
-from skimage import filters
 from db import Database
-import rawpy
-from io import BytesIO
+from image_context import ImageContext, read_bgr
+from image_metrics import (
+    MAX_DIM,
+    METRIC_DTYPE,
+    METRICS,
+    compute_metrics,
+    compute_metrics_batch,
+    load_frame,
+)
+
+# Record type returned by PhotoScorer.score_batch
+SCORE_DTYPE = np.dtype([("valid", np.bool_)] + METRIC_DTYPE.descr)
 
 
 class PhotoScorer:
     """
-    Comprehensive image scoring using OpenCV and skimage.
+    Comprehensive image scoring using OpenCV.
     Stores all computed metrics in the database if a DB instance is provided.
     """
 
     def __init__(self, db: Database = None):
         self.db = db
 
-    def score_photo(self, file_path):
+    def score_photo(self, file_path, context: ImageContext = None):
         """
         Compute a variety of metrics for the image.
         Returns a dictionary of metric_name -> value.
-        If RAW, extract JPEG thumbnail and score that.
+        The file is decoded at a reduced scale close to the 800px the metrics
+        use; RAW files are scored from their embedded preview.
+        If an ImageContext is given, its already decoded image is scored instead.
         """
-        import os
-
-        raw_extensions = {
-            ".cr2",
-            ".nef",
-            ".arw",
-            ".dng",
-            ".rw2",
-            ".orf",
-            ".raf",
-            ".srw",
-            ".pef",
-        }
-        ext = os.path.splitext(file_path)[1].lower()
-        img = None
-        if ext in raw_extensions:
-            try:
-                with rawpy.imread(file_path) as raw:
-                    thumb = raw.extract_thumb()
-                    if thumb.format == rawpy.ThumbFormat.JPEG:
-                        img_array = np.frombuffer(thumb.data, dtype=np.uint8)
-                        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-                    else:
-                        img = thumb.data
-            except Exception as re:
-                print(f"Failed to extract RAW thumbnail for scoring: {file_path}: {re}")
-        if img is None:
-            img = cv2.imread(file_path)
+        if context is not None:
+            img = context.bgr()
+        else:
+            # Let the codec decode at 1/2, 1/4 or 1/8 scale instead of full size
+            img = read_bgr(file_path, MAX_DIM)
         if img is None:
             raise ValueError(f"Cannot read image: {file_path}")
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-
-        ## Resize to max dimension of 800 for faster processing | maintain aspect ratio
-        max_dim = 800
-        height, width = gray.shape
-        if max(height, width) > max_dim:
-            scale = max_dim / max(height, width)
-            new_size = (int(width * scale), int(height * scale))
-            gray = cv2.resize(gray, new_size, interpolation=cv2.INTER_AREA)
-            hsv = cv2.resize(hsv, new_size, interpolation=cv2.INTER_AREA)
-            img = cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
-
-        scores = {
-            # ---------------- Sharpness / focus ----------------
-            "laplacian_var": float(cv2.Laplacian(gray, cv2.CV_64F).var()),
-            "sobel_energy": float(
-                np.sum(np.square(cv2.Sobel(gray, cv2.CV_64F, 1, 0)))
-                + np.sum(np.square(cv2.Sobel(gray, cv2.CV_64F, 0, 1)))
-            ),
-            # ---------------- Noise ----------------
-            "noise": float(np.mean(np.abs(gray - cv2.GaussianBlur(gray, (3, 3), 0)))),
-            # ---------------- Exposure / brightness ----------------
-            "brightness_mean": float(np.mean(gray)),
-            "brightness_median": float(np.median(gray)),
-            "saturation_mean": float(np.mean(hsv[:, :, 1])),
-            "saturation_std": float(np.std(hsv[:, :, 1])),
-            # ---------------- Contrast ----------------
-            "contrast_std": float(np.std(gray)),
-            "contrast_range": float(gray.max() - gray.min()),
-            # ---------------- Colorfulness ----------------
-            "colorfulness": self._colorfulness(img),
-            # ---------------- Entropy / texture ----------------
-            "entropy": float(self._entropy(gray)),
-            # ---------------- Size / aspect ----------------
-            "width": img.shape[1],
-            "height": img.shape[0],
-            "aspect_ratio": img.shape[1] / img.shape[0],
-        }
-
-        return scores
+        # Shrinks to 800px first, then computes every metric in one pass
+        return compute_metrics(img)
 
     def scale_scores(self, scores):
         """
@@ -159,38 +113,53 @@ class PhotoScorer:
 
         return scaled_scores
 
-    def score_and_store(self, photo_id, file_path):
+    def score_and_store(self, photo_id, file_path, context: ImageContext = None):
         """
         Compute all metrics and store them in the DB for the given photo_id.
         """
         if self.db is None:
             raise ValueError("Database instance not provided.")
-        scores = self.score_photo(file_path)
+        scores = self.score_photo(file_path, context)
         scaled_scores = self.scale_scores(scores)
         # face_bboxes = self.detect_faces(file_path)
 
-        # Save all unscaled metrics
-        for metric_name, value in scores.items():
-            self.db.add_score(
-                photo_id, metric_name, float(value), scaled_scores[metric_name]
-            )
+        self.store_scores(photo_id, scores, scaled_scores)
+        return scores, scaled_scores
+
+    def store_scores(self, photo_id, scores, scaled_scores):
+        """
+        Store already computed metrics and the overall quality score for photo_id.
+        """
+        if self.db is None:
+            raise ValueError("Database instance not provided.")
 
         # Store detected face bounding boxes
         # for bbox in face_bboxes:
         #     self.db.create_face(photo_id, bbox)
 
-        # Compute and store overall quality score
-        overall_quality = self.average_quality_score(photo_id, scaled_scores)
-        return scores, scaled_scores
+        # Raw and scaled metrics plus the overall quality score: one row, one statement
+        overall_score = self.overall_score(scaled_scores)
+        self.db.set_photo_metrics(photo_id, scores, scaled_scores, overall_score)
+        return overall_score
 
     def average_quality_score(self, photo_id, scaled_scores):
         """
         Compute an overall quality score as the average of selected scaled metrics.
-        Store this overall quality score in a separate table.
+        Store it as the photo's quality_score.
         """
         if self.db is None:
             raise ValueError("Database instance not provided.")
 
+        overall_score = self.overall_score(scaled_scores)
+
+        # Store overall quality score
+        self.db.add_quality_score(photo_id, overall_score)
+        return overall_score
+
+    def overall_score(self, scaled_scores):
+        """
+        Overall quality score: the average of selected scaled metrics.
+        """
         # Select metrics to include in overall quality score
         relevant_metrics = [
             "laplacian_var",
@@ -211,31 +180,97 @@ class PhotoScorer:
             overall_score = float(
                 np.mean(valid_scores)
             )  # FOR NOW A SIMPLE AVERAGE OF THE SCALED SCORES. LATER WEIGHT THEM
-
-        # Store overall quality score
-        self.db.add_quality_score(photo_id, overall_score)
         return overall_score
 
-    # ---------------- Metric helpers ----------------
-    def _colorfulness(self, img):
+    # ---------------- Batch scoring ----------------
+    def score_batch(self, file_paths, workers=None, batch_size=16):
         """
-        Measures colorfulness using the Hasler & Süsstrunk method.
+        Score many photos at once, for bulk re-scoring of a library.
+
+        Files are decoded (at reduced scale) and shrunk on a process pool;
+        frames of the same size are stacked and scored together with
+        compute_metrics_batch. Values match score_photo.
+
+        :param file_paths: list of photo paths
+        :param workers: decode processes (default: CPU count)
+        :param batch_size: frames stacked per batch; scoring needs roughly
+            12 MB per 800 x 600 frame
+        :return: structured array with SCORE_DTYPE, one record per path in
+            input order; `valid` is False (and metrics NaN) for unreadable files
         """
-        (B, G, R) = cv2.split(img.astype("float"))
-        rg = np.abs(R - G)
-        yb = np.abs(0.5 * (R + G) - B)
-        return float(
-            np.sqrt(rg.mean() ** 2 + yb.mean() ** 2) + 0.3 * (rg.std() + yb.std())
-        )
+        results = np.zeros(len(file_paths), dtype=SCORE_DTYPE)
+        for name in METRICS:
+            results[name] = np.nan
+
+        def flush(bucket):
+            indices = [i for i, _ in bucket]
+            scores = compute_metrics_batch(np.stack([frame for _, frame in bucket]))
+            for name in METRICS:
+                results[name][indices] = scores[name]
+            results["valid"][indices] = True
+            bucket.clear()
+
+        buckets = {}  # frame shape -> [(index, frame)]
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            frames = pool.map(load_frame, [str(p) for p in file_paths], chunksize=4)
+            for i, frame in enumerate(frames):
+                if frame is None:
+                    continue
+                bucket = buckets.setdefault(frame.shape, [])
+                bucket.append((i, frame))
+                if len(bucket) >= batch_size:
+                    flush(bucket)
+        for bucket in buckets.values():
+            if bucket:
+                flush(bucket)
+        return results
+
+    def store_batch(self, photo_ids, results):
+        """
+        Write score_batch results: one photo_metrics row per photo with all
+        metrics and the overall quality score, upserted in bulk.
 
-    def _entropy(self, gray):
+        :param photo_ids: photo id per record of results
+        :param results: structured array from score_batch
+        :return: number of photos stored
         """
-        Computes Shannon entropy of a grayscale image.
+        if self.db is None:
+            raise ValueError("Database instance not provided.")
+
+        rows = []
+        for photo_id, record in zip(photo_ids, results):
+            if not record["valid"]:
+                continue
+            scores = {name: float(record[name]) for name in METRICS}
+            scaled_scores = self.scale_scores(scores)
+            rows.append(
+                (photo_id, scores, scaled_scores, self.overall_score(scaled_scores))
+            )
+        self.db.set_photo_metrics_bulk(rows)
+        return len(rows)
+
+    def rescore(self, collection_id=None, workers=None, chunk=1000):
         """
-        hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
-        hist_norm = hist.ravel() / hist.sum()
-        hist_norm = hist_norm[hist_norm > 0]
-        return float(-np.sum(hist_norm * np.log2(hist_norm)))
+        Re-score every photo of a collection (or the whole library),
+        replacing the stored metrics.
+
+        :param chunk: photos scored and written per round
+        :return: number of photos re-scored
+        """
+        photos = self.db.get_photos(collection_id)
+        stored = 0
+        started = time.perf_counter()
+        for start in range(0, len(photos), chunk):
+            part = photos[start:start + chunk]
+            results = self.score_batch([p["file_path"] for p in part], workers)
+            stored += self.store_batch([p["id"] for p in part], results)
+        elapsed = time.perf_counter() - started
+        print(
+            f"Re-scored {stored}/{len(photos)} photos in {elapsed:.1f}s "
+            f"({len(photos) / max(elapsed, 1e-6):.0f} photos/s)"
+        )
+        return stored
 
     # ------ FACE DETECTION ------
     def detect_faces(self, file_path):
@@ -272,3 +307,12 @@ class PhotoScorer:
         """
         x, y, w, h = bbox
         return (int(x), int(y), int(x + w), int(y + h))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score photos in bulk.")
+    parser.add_argument("--collection", type=int, help="only this collection id")
+    parser.add_argument("--workers", type=int, help="decode processes")
+    args = parser.parse_args()
+
+    PhotoScorer(Database()).rescore(args.collection, args.workers)
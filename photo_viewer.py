@@ -5,16 +5,24 @@ from tkinter.scrolledtext import ScrolledText
 from tkinter import messagebox
 from main_viewer import MainViewer
 from base_viewer import BaseThumbnailViewer
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from PIL import ImageDraw, ImageFont
 from photo_analyzer import PhotoAnalyzer
 from llm_feedback import make_paragraph
 from progress_dialog import ProgressDialog
+from thumbnail_loader import ThumbnailLoader
 import threading
 
 
+# Tile border style for each suggestion
+SUGGESTION_STYLES = {"keep": "success", "delete": "danger"}
+
+
 class PhotoViewer(BaseThumbnailViewer, MainViewer):
     """Scrollable grid of photo thumbnails with single-photo preview support."""
 
+    # Extra rows of tiles kept alive above and below the visible area
+    OVERSCAN_ROWS = 2
+
     def __init__(self, parent, db, open_single_callback=None, **kwargs):
         kwargs.pop("db", None)
         super().__init__(parent, **kwargs)
@@ -25,14 +33,22 @@ class PhotoViewer(BaseThumbnailViewer, MainViewer):
         self.thumb_size = 120
         self.padding = 10
         self.columns = 1
-        self.labels = []            # list of FRAMES; each frame holds an image label
+        self.labels = []            # pool of tile FRAMES; each frame holds an image label
         self.thumbs = []
         self.single_item_active = False
-        self.selected_idx = None
+        self.selected_idx = None       # index into self.photos
         self.db = db
         self.photo_analyzer = PhotoAnalyzer(db)
-
-        # remember last number of columns so we can clear them on change
+        # thumbnails are decoded off the Tk thread and filled in as they finish
+        self.thumb_loader = ThumbnailLoader(self, workers=4)
+
+        # virtual grid state
+        self._rank_map = {}
+        self._score_map = {}
+        self._index_by_id = {}
+        self._show_suggestions = False
+        self._render_pending = None
+        # number of columns from the last reflow
         self._last_cols = 0
 
         # context menu state
@@ -56,11 +72,12 @@ class PhotoViewer(BaseThumbnailViewer, MainViewer):
         self.size_combo.pack(side="left")
         self.size_combo.bind("<<ComboboxSelected>>", lambda e: self._on_size_change())
 
-        # grid area
-        self.grid_area = ttk.Frame(self.inner_frame)
-        self.grid_area.pack(fill="both", expand=True)
-        self.grid_area.bind("<Configure>", lambda e: self._reflow_grid())
-        self.canvas.bind("<Configure>", lambda e: self._reflow_grid())
+        # Tiles are canvas window items below the toolbar, at canvas
+        # coordinates. The scrollregion spans the whole collection, but the
+        # canvas only maps the pooled tiles near the view, so no widget ever
+        # gets taller than the window (X11 caps window coordinates at ~32k px).
+        self.canvas.bind("<Configure>", self._on_resize)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
 
         # Floating LLM feedback card
         self.feedback_card = ttk.Labelframe(
@@ -114,150 +131,234 @@ class PhotoViewer(BaseThumbnailViewer, MainViewer):
         return image
 
     def refresh_photos(self, collection_id=None):
+        """
+        Reload the collection and redraw the grid.
+
+        The grid is virtualized: only the rows in view (plus OVERSCAN_ROWS above
+        and below) have tile widgets, and tiles are re-bound to other photos as
+        the user scrolls, so cost depends on window size, not collection size.
+        """
+        collection_changed = collection_id != self.current_collection_id
         self.current_collection_id = collection_id
-        for w in self.labels:
-            try:
-                w.destroy()
-            except Exception:
-                pass
-        self.labels = []
-        self.thumbs = []
         self.single_item_active = False
 
-        if not self.grid_area.winfo_ismapped():
-            self.grid_area.pack(fill="both", expand=True)
+        # One query: photos with quality score, rank and suggestion, best first
+        self.photos = self.db.get_ranked_photos(collection_id)
+        self._rank_map = {
+            p["id"]: p["quality_rank"] for p in self.photos if p["quality_rank"]
+        }
+        self._score_map = {
+            p["id"]: p["quality_score"]
+            for p in self.photos
+            if p["quality_score"] is not None
+        }
+        self._index_by_id = {p["id"]: i for i, p in enumerate(self.photos)}
+        self._show_suggestions = getattr(
+            getattr(self.master, "sidebar_buttons", None), "suggestions_visible", False
+        )
+
+        # The photo list changed, so every tile has to be bound again
+        for tile in self.labels:
+            self._release_tile(tile)
+        self.selected_idx = None
+        if collection_changed:
+            self.canvas.yview_moveto(0)
 
-        self.photos = self.db.get_photos(collection_id)
+        self._reflow_grid()
 
-        ranked = self.photo_analyzer.rank_by_quality([p["id"] for p in self.photos])
-        rank_map = {pid: idx + 1 for idx, (pid, _) in enumerate(ranked)}
-        ranked_photos = sorted(
-            self.photos, key=lambda p: rank_map.get(p["id"], float("inf"))
+        if self.photos:
+            self._select_idx(0)
+            self.select_photo(self.photos[0]["id"])
+
+    # ---------------- virtual grid ----------------
+
+    def _cell_width(self):
+        return self.thumb_size + self.padding * 2 + 10  # slack for borders/shadows
+
+    def _row_height(self):
+        height = self.thumb_size + self.padding * 2 + 10
+        if self._show_suggestions:
+            height += 32  # keep/delete dropdown under the thumbnail
+        return height
+
+    def _on_yscroll(self, first, last):
+        """Canvas yscrollcommand: update the scrollbar and the visible tiles."""
+        self.scrollbar_y.set(first, last)
+        if self._render_pending is None:
+            self._render_pending = self.after_idle(self._render_visible)
+
+    def _create_tile(self):
+        """Create one reusable grid tile; its photo is set by _bind_tile."""
+        tile = ttk.Frame(self.canvas, padding=5, bootstyle="secondary")
+        tile.item = self.canvas.create_window(
+            0, 0, window=tile, anchor="nw", state="hidden"
+        )
+        tile.index = None
+        tile.photo_id = None
+        tile.photo_path = None
+        tile.content_hash = None
+        tile.image = None
+
+        lbl = ttk.Label(tile, cursor="hand2", bootstyle="dark", relief="flat")
+        lbl.grid(row=0, column=0)
+        lbl.bind("<Button-1>", lambda e, t=tile: self._on_photo_click(t.photo_id))
+        lbl.bind(
+            "<Double-1>",
+            lambda e, t=tile: self._show_single_photo(
+                t.photo_path, t.photo_id, t.content_hash
+            ),
         )
+        self._bind_thumb_context(lbl, photo_id=None)
+        tile._image_label = lbl
+
+        # Dropdown for keep/delete/undecided, only gridded while suggestions show
+        tile._choice_var = tk.StringVar()
+        tile._choice = ttk.Combobox(
+            tile,
+            textvariable=tile._choice_var,
+            values=["keep", "delete", "undecided"],
+            state="readonly",
+            width=10,
+        )
+        tile._choice.bind("<<ComboboxSelected>>", lambda e, t=tile: self._on_choice(t))
 
-        for photo in ranked_photos:
-            # if photo["suggestion"] == "deleted":
-            #     continue # Skip deleted photos
-            photo_id = photo["id"]
-            # Start from a uniform, letterboxed PIL thumbnail
-            pil_thumb = self.create_uniform_thumbnail_pil(photo["file_path"]) or None
-            if pil_thumb is None:
-                tk_img = None
-            else:
-                score = self.db.get_quality_score(photo["id"])
-                rank = rank_map.get(photo["id"], "-")
-                if score is not None:
-                    pil_thumb = self.add_score_overlay(pil_thumb, rank, score)
-                tk_img = ImageTk.PhotoImage(pil_thumb)
-            if not tk_img:
-                continue
-            score = self.db.get_quality_score(photo_id)
-            rank = rank_map.get(photo_id, "-")
-            if score is not None:
-                pil_thumb = self.add_score_overlay(pil_thumb, rank, score)
-            tk_img = ImageTk.PhotoImage(pil_thumb)
-            self.thumbs.append(tk_img)
-
-            frame = ttk.Frame(self.grid_area, padding=5)
-            frame.photo_id = photo["id"]
-
-            lbl = ttk.Label(
-                frame,
-                image=tk_img,
-                cursor="hand2",
-                bootstyle="dark",
-                relief="flat"
-            )
-            lbl.image = tk_img
-            lbl.photo_id = photo["id"]
-            lbl.photo_path = photo["file_path"]
-
-            # Only show suggestion if available
-            show_suggestions = getattr(self.master.sidebar_buttons, "suggestions_visible", False)
-            if show_suggestions:
-                # Get suggestion from DB (default undecided if not set)
-                suggestion = self.db.get_photo_suggestion(photo_id) or "undecided"
-                if suggestion == "keep":
-                    frame.config(bootstyle="success") # Green if keep
-                elif suggestion == "delete":
-                    frame.config(bootstyle="danger") # Red if delete
-                else:
-                    frame.config(bootstyle="secondary") # Grey if undecided
-            else:
-                frame.config(bootstyle="secondary") # Grey if suggestions not shown
+        self.labels.append(tile)
+        return tile
 
-            # lbl.pack()
-            lbl.grid(row=0, column=0)
+    def _render_tile_image(self, photo, size):
+        """Thumbnail with rank/score overlay for one photo, or None. Runs on a worker."""
+        pil_thumb = self.create_uniform_thumbnail_pil(
+            photo["file_path"], content_hash=photo.get("content_hash"), size=size
+        )
+        if pil_thumb is None:
+            return None
+        score = self._score_map.get(photo["id"])
+        if score is not None:
+            rank = self._rank_map.get(photo["id"], "-")
+            pil_thumb = self.add_score_overlay(pil_thumb, rank, score)
+        return pil_thumb
+
+    def _bind_tile(self, tile, idx, priority=0):
+        """
+        Point a tile at self.photos[idx] and refresh everything it shows.
+        The thumbnail starts as a placeholder and is requested from the loader.
+        """
+        photo = self.photos[idx]
+        tile.index = idx
+        tile.photo_id = photo["id"]
+        tile.photo_path = photo["file_path"]
+        tile.content_hash = photo.get("content_hash")
+
+        lbl = tile._image_label
+        lbl._photo_id = photo["id"]  # used by the context menu
+        tile.image = None
+        lbl.configure(image=self.placeholder_image(), text="")
+        lbl.config(relief="solid" if idx == self.selected_idx else "flat")
+        size = self.thumb_size
+        self.thumb_loader.request(
+            tile,
+            lambda photo=photo, size=size: self._render_tile_image(photo, size),
+            lambda tk_img, pid=photo["id"]: self._on_tile_loaded(tile, pid, tk_img),
+            priority,
+        )
 
-            lbl.bind("<Button-1>", lambda e, pid=photo["id"]: self._on_photo_click(pid))
-            lbl.bind(
-                "<Double-1>",
-                lambda e, path=photo["file_path"], pid=photo["id"]: self._show_single_photo(path, pid)
-            )
+        if self._show_suggestions:
+            suggestion = photo.get("suggestion") or "undecided"
+            tile._choice_var.set(suggestion)
+            tile._choice.grid(pady=2, row=1, column=0)
+            tile.config(bootstyle=SUGGESTION_STYLES.get(suggestion, "secondary"))
+        else:
+            tile._choice.grid_remove()
+            tile.config(bootstyle="secondary")  # Grey if suggestions not shown
+
+    def _on_tile_loaded(self, tile, photo_id, tk_img):
+        """Loader callback: swap the placeholder for the finished thumbnail."""
+        if tile.photo_id != photo_id:
+            return  # tile was recycled for another photo meanwhile
+        tile.image = tk_img
+        if tk_img is not None:
+            tile._image_label.configure(image=tk_img, text="")
+        else:
+            tile._image_label.configure(image="", text="No preview")
+
+    def _release_tile(self, tile):
+        """Hide a tile, cancel its pending load and drop its image so it can be reused."""
+        self.thumb_loader.cancel(tile)
+        self.canvas.itemconfigure(tile.item, state="hidden")
+        tile.index = None
+        tile.image = None
+        try:
+            tile._image_label.configure(image="")
+        except tk.TclError:
+            pass
 
-            if show_suggestions:
-                # Dropdown for keep/delete/undecided
-                choice_var = tk.StringVar(value=suggestion)
-                choice = ttk.Combobox(
-                    frame,
-                    textvariable=choice_var,
-                    values=["keep", "delete", "undecided"],
-                    state="readonly",
-                    width=10
-                )
-                # choice.pack(pady=2)
-                choice.grid(pady=2, row=1, column=0)
- 
-                def on_choice(event, pid=photo_id, var=choice_var, fr=frame):
-                    new_val = var.get()
-                    self.db.update_photo_suggestion(pid, new_val)
-                    # Update border instantly
-                    if new_val == "keep":
-                        fr.config(bootstyle="success")
-                    elif new_val == "delete":
-                        fr.config(bootstyle="danger")
-                    else:
-                        fr.config(bootstyle="secondary")
- 
-                choice.bind("<<ComboboxSelected>>", on_choice)
-
-            # ---- NEW: right-click context menu bindings for delete ----
-            self._bind_thumb_context(lbl, photo_id=photo["id"])
-            # -----------------------------------------------------------
-
-            self.labels.append(frame)
+    def _on_choice(self, tile):
+        new_val = tile._choice_var.get()
+        self.db.update_photo_suggestion(tile.photo_id, new_val)
+        if tile.index is not None:
+            self.photos[tile.index]["suggestion"] = new_val
+        # Update border instantly
+        tile.config(bootstyle=SUGGESTION_STYLES.get(new_val, "secondary"))
+
+    def _render_visible(self):
+        """Bind and place tiles for the rows in view; release the rest."""
+        self._render_pending = None
+        if self.single_item_active or not self.canvas.winfo_exists():
+            return
+        if not self.photos:
+            for tile in self.labels:
+                self._release_tile(tile)
+            return
 
-        self._reflow_grid()
+        gp = self.padding
+        cols = max(1, self._last_cols)
+        cell_w = self._cell_width()
+        row_h = self._row_height()
+
+        grid_top = self._grid_top()
+        top = self.canvas.canvasy(0) - grid_top
+        view_h = max(1, self.canvas.winfo_height())
+        visible_rows = range(int(top // row_h), int((top + view_h) // row_h) + 1)
+        first_row = max(0, visible_rows.start - self.OVERSCAN_ROWS)
+        last_row = visible_rows.stop - 1 + self.OVERSCAN_ROWS
+        wanted = range(first_row * cols, min(len(self.photos), (last_row + 1) * cols))
+
+        bound = {t.index: t for t in self.labels if t.index is not None and t.index in wanted}
+        free = [t for t in self.labels if t.index is None or t.index not in wanted]
+
+        for idx in wanted:
+            row, col = divmod(idx, cols)
+            # on-screen tiles load before the overscan rows
+            priority = 0 if row in visible_rows else 1
+            tile = bound.get(idx)
+            if tile is None:
+                tile = free.pop() if free else self._create_tile()
+                self._bind_tile(tile, idx, priority)
+            else:
+                pending = self.thumb_loader.priority_of(tile)
+                if pending is not None and pending > priority:
+                    self._bind_tile(tile, idx, priority)  # scrolled into view
+            x, y = gp + col * cell_w, grid_top + gp + row * row_h
+            self.canvas.coords(tile.item, x, y)
+            self.canvas.itemconfigure(tile.item, state="normal")
 
-        if self.labels:
-            self._select_idx(0)
-            self.select_photo(self.labels[0].photo_id)
+        for tile in free:
+            self._release_tile(tile)
 
     def _on_photo_click(self, photo_id):
-        idx = next(
-            (
-                i
-                for i, fr in enumerate(self.labels)
-                if getattr(fr, "photo_id", None) == photo_id
-            ),
-            None,
-        )
+        idx = self._index_by_id.get(photo_id)
         if idx is not None:
             self._select_idx(idx)
         self.select_photo(photo_id)
 
     def _select_idx(self, idx):
-        # remove previous highlight (on the image label)
-        if self.selected_idx is not None and 0 <= self.selected_idx < len(self.labels):
-            prev = self.labels[self.selected_idx]
-            if hasattr(prev, "_image_label") and prev._image_label.winfo_exists():
-                prev._image_label.config(relief="flat")
-
-        # highlight current (on the image label)
+        # highlight on the image label of whichever tile shows the photo
         self.selected_idx = idx
-        current = self.labels[idx]
-        if hasattr(current, "_image_label") and current._image_label.winfo_exists():
-            current._image_label.config(relief="solid")
+        for tile in self.labels:
+            if tile.index is not None:
+                tile._image_label.config(
+                    relief="solid" if tile.index == idx else "flat"
+                )
 
     # SIZE CHANGE: rebuild and reflow
     def _on_size_change(self):
@@ -266,64 +367,53 @@ class PhotoViewer(BaseThumbnailViewer, MainViewer):
         if new_size != self.thumb_size:
             self.thumb_size = new_size
             self.refresh_photos(getattr(self, "current_collection_id", None))
-            self.after_idle(self._reflow_grid)
 
-    # REFLOW: compute columns fresh, clear previous columnconfigure,
-    # and grid items left-to-right, wrapping as needed.
-    def _reflow_grid(self):
-        if not self.labels or self.single_item_active:
+    def _grid_top(self):
+        """Canvas y where the first tile row starts (below the toolbar)."""
+        return self.inner_frame.winfo_reqheight()
+
+    def _on_inner_configure(self, event=None):
+        # The scrollregion comes from the photo count, not from bbox("all")
+        self._update_scrollregion()
+
+    def _update_scrollregion(self):
+        if self.single_item_active:
             return
+        cols = max(1, self._last_cols)
+        rows = -(-len(getattr(self, "photos", [])) // cols)  # ceil
+        height = self._grid_top() + rows * self._row_height() + self.padding
+        self.canvas.configure(
+            scrollregion=(0, 0, self.canvas.winfo_width(), max(1, height))
+        )
 
-        # sync sizes to get an accurate width
-        self.update_idletasks()
-        self.grid_area.update_idletasks()
-        self.canvas.update_idletasks()
+    # REFLOW: compute columns for the current width, set the scrollregion to
+    # the full collection so the scrollbar is right, then render the visible rows.
+    def _reflow_grid(self):
+        if self.single_item_active:
+            return
 
-        container_w = max(self.grid_area.winfo_width(), self.canvas.winfo_width())
+        container_w = self.canvas.winfo_width()
         if container_w <= 1:
             self.after(50, self._reflow_grid)
             return
 
         gp = self.padding
-        cell_w = self.thumb_size + gp * 2 + 10  # slack for borders/shadows
+        cell_w = self._cell_width()
 
         cols = max(1, container_w // cell_w)
         while cols > 1 and (cols * cell_w + gp) > container_w:
             cols -= 1
 
-        # clear previous column configs
-        if self._last_cols:
-            for c in range(self._last_cols):
-                try:
-                    self.grid_area.columnconfigure(c, weight=0, minsize=0)
-                except Exception:
-                    pass
-
-        # remove old placements
-        for fr in self.labels:
-            if fr.winfo_exists():
-                fr.grid_forget()
-
-        # place items row-by-row
-        for i, fr in enumerate(self.labels):
-            if fr.winfo_exists():
-                r, c = divmod(i, cols)
-                fr.grid(row=r, column=c, padx=gp, pady=gp, sticky="n")
-
-        # set current columns; do NOT stretch to avoid overshoot
-        for c in range(cols):
-            self.grid_area.columnconfigure(
-                c, weight=0, minsize=self.thumb_size + gp * 2
-            )
-
         self._last_cols = cols
+        self._update_scrollregion()
+        self._render_visible()
         self.feedback_card.lift()
 
     # ---------------- single-photo ----------------
 
-    def _show_single_photo(self, photo_path, photo_id):
+    def _show_single_photo(self, photo_path, photo_id, content_hash=None):
         if callable(self.open_single_callback):
-            self.open_single_callback(photo_path, photo_id)
+            self.open_single_callback(photo_path, photo_id, content_hash)
 
     # ---------------- context menu ----------------
 
@@ -21,6 +21,16 @@ CREATE TABLE IF NOT EXISTS photos (
     suggestion TEXT DEFAULT 'undecided'
 );
 
+-- Content hash of the file (see image_context.content_hash); keys the thumbnail cache
+ALTER TABLE photos ADD COLUMN IF NOT EXISTS content_hash TEXT;
+CREATE INDEX IF NOT EXISTS photos_content_hash_idx ON photos(content_hash);
+
+-- Scorer/model/hash versions the photo was analysed with (see
+-- PhotoImporter.ANALYSIS_VERSION); with content_hash it keys the analysis
+-- cache. NULL when the analysis was incomplete.
+ALTER TABLE photos ADD COLUMN IF NOT EXISTS analysis_version TEXT;
+CREATE INDEX IF NOT EXISTS photos_analysis_cache_idx ON photos(content_hash, analysis_version);
+
 -- ----------------- EXIF Data -----------------
 CREATE TABLE IF NOT EXISTS exif_data (
     id SERIAL PRIMARY KEY,
@@ -28,22 +38,143 @@ CREATE TABLE IF NOT EXISTS exif_data (
     tag_name TEXT NOT NULL,
     tag_value TEXT
 );
+CREATE INDEX IF NOT EXISTS exif_data_photo_tag_idx ON exif_data(photo_id, tag_name);
 
 
 -- ----------------- Scores -----------------
-CREATE TABLE IF NOT EXISTS scores (
-    id SERIAL PRIMARY KEY,
-    photo_id INT REFERENCES photos(id) ON DELETE CASCADE,
-    type TEXT,
-    value REAL,
-    scaled_value REAL CHECK (scaled_value >= 0 AND scaled_value <= 1)
+-- One wide row per photo: every raw metric, its scaled (0-1) value and the
+-- overall quality score. Written with one upsert per photo.
+CREATE TABLE IF NOT EXISTS photo_metrics (
+    photo_id INT PRIMARY KEY REFERENCES photos(id) ON DELETE CASCADE,
+    laplacian_var REAL,
+    sobel_energy REAL,
+    noise REAL,
+    brightness_mean REAL,
+    brightness_median REAL,
+    saturation_mean REAL,
+    saturation_std REAL,
+    contrast_std REAL,
+    contrast_range REAL,
+    colorfulness REAL,
+    entropy REAL,
+    width REAL,
+    height REAL,
+    aspect_ratio REAL,
+    laplacian_var_scaled REAL,
+    sobel_energy_scaled REAL,
+    noise_scaled REAL,
+    brightness_mean_scaled REAL,
+    brightness_median_scaled REAL,
+    saturation_mean_scaled REAL,
+    saturation_std_scaled REAL,
+    contrast_std_scaled REAL,
+    contrast_range_scaled REAL,
+    colorfulness_scaled REAL,
+    entropy_scaled REAL,
+    width_scaled REAL,
+    height_scaled REAL,
+    aspect_ratio_scaled REAL,
+    quality_score REAL,
+    scored_at TIMESTAMP DEFAULT NOW()
 );
 
-CREATE TABLE IF NOT EXISTS photo_quality (
-    id SERIAL PRIMARY KEY,
-    photo_id INT REFERENCES photos(id) ON DELETE CASCADE,
-    quality_score REAL
-);
+-- Databases from before photo_metrics kept one `scores` row per metric and
+-- appended to `photo_quality`. Move those tables aside as *_legacy and copy
+-- the latest value of each metric into photo_metrics; views with the old
+-- names take their place below.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = current_schema()
+          AND table_name = 'scores' AND table_type = 'BASE TABLE'
+    ) THEN
+        ALTER TABLE scores RENAME TO scores_legacy;
+        INSERT INTO photo_metrics (
+            photo_id,
+            laplacian_var, sobel_energy, noise, brightness_mean, brightness_median, saturation_mean, saturation_std, contrast_std, contrast_range, colorfulness, entropy, width, height, aspect_ratio,
+            laplacian_var_scaled, sobel_energy_scaled, noise_scaled, brightness_mean_scaled, brightness_median_scaled, saturation_mean_scaled, saturation_std_scaled, contrast_std_scaled, contrast_range_scaled, colorfulness_scaled, entropy_scaled, width_scaled, height_scaled, aspect_ratio_scaled
+        )
+        SELECT photo_id,
+            max(value) FILTER (WHERE type = 'laplacian_var'),
+            max(value) FILTER (WHERE type = 'sobel_energy'),
+            max(value) FILTER (WHERE type = 'noise'),
+            max(value) FILTER (WHERE type = 'brightness_mean'),
+            max(value) FILTER (WHERE type = 'brightness_median'),
+            max(value) FILTER (WHERE type = 'saturation_mean'),
+            max(value) FILTER (WHERE type = 'saturation_std'),
+            max(value) FILTER (WHERE type = 'contrast_std'),
+            max(value) FILTER (WHERE type = 'contrast_range'),
+            max(value) FILTER (WHERE type = 'colorfulness'),
+            max(value) FILTER (WHERE type = 'entropy'),
+            max(value) FILTER (WHERE type = 'width'),
+            max(value) FILTER (WHERE type = 'height'),
+            max(value) FILTER (WHERE type = 'aspect_ratio'),
+            max(scaled_value) FILTER (WHERE type = 'laplacian_var'),
+            max(scaled_value) FILTER (WHERE type = 'sobel_energy'),
+            max(scaled_value) FILTER (WHERE type = 'noise'),
+            max(scaled_value) FILTER (WHERE type = 'brightness_mean'),
+            max(scaled_value) FILTER (WHERE type = 'brightness_median'),
+            max(scaled_value) FILTER (WHERE type = 'saturation_mean'),
+            max(scaled_value) FILTER (WHERE type = 'saturation_std'),
+            max(scaled_value) FILTER (WHERE type = 'contrast_std'),
+            max(scaled_value) FILTER (WHERE type = 'contrast_range'),
+            max(scaled_value) FILTER (WHERE type = 'colorfulness'),
+            max(scaled_value) FILTER (WHERE type = 'entropy'),
+            max(scaled_value) FILTER (WHERE type = 'width'),
+            max(scaled_value) FILTER (WHERE type = 'height'),
+            max(scaled_value) FILTER (WHERE type = 'aspect_ratio')
+        FROM (
+            SELECT DISTINCT ON (photo_id, type) photo_id, type, value, scaled_value
+            FROM scores_legacy
+            WHERE photo_id IS NOT NULL
+            ORDER BY photo_id, type, id DESC
+        ) latest
+        GROUP BY photo_id
+        ON CONFLICT (photo_id) DO NOTHING;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = current_schema()
+          AND table_name = 'photo_quality' AND table_type = 'BASE TABLE'
+    ) THEN
+        ALTER TABLE photo_quality RENAME TO photo_quality_legacy;
+        INSERT INTO photo_metrics (photo_id, quality_score)
+        SELECT DISTINCT ON (photo_id) photo_id, quality_score
+        FROM photo_quality_legacy
+        WHERE photo_id IS NOT NULL
+        ORDER BY photo_id, id DESC
+        ON CONFLICT (photo_id) DO UPDATE SET quality_score = EXCLUDED.quality_score;
+    END IF;
+END $$;
+
+-- Compatibility views for readers of the old per-metric layout
+CREATE OR REPLACE VIEW scores AS
+SELECT m.photo_id, v.type, v.value, v.scaled_value
+FROM photo_metrics m
+CROSS JOIN LATERAL (VALUES
+    ('laplacian_var', m.laplacian_var, m.laplacian_var_scaled),
+    ('sobel_energy', m.sobel_energy, m.sobel_energy_scaled),
+    ('noise', m.noise, m.noise_scaled),
+    ('brightness_mean', m.brightness_mean, m.brightness_mean_scaled),
+    ('brightness_median', m.brightness_median, m.brightness_median_scaled),
+    ('saturation_mean', m.saturation_mean, m.saturation_mean_scaled),
+    ('saturation_std', m.saturation_std, m.saturation_std_scaled),
+    ('contrast_std', m.contrast_std, m.contrast_std_scaled),
+    ('contrast_range', m.contrast_range, m.contrast_range_scaled),
+    ('colorfulness', m.colorfulness, m.colorfulness_scaled),
+    ('entropy', m.entropy, m.entropy_scaled),
+    ('width', m.width, m.width_scaled),
+    ('height', m.height, m.height_scaled),
+    ('aspect_ratio', m.aspect_ratio, m.aspect_ratio_scaled)
+) AS v(type, value, scaled_value)
+WHERE v.value IS NOT NULL;
+
+CREATE OR REPLACE VIEW photo_quality AS
+SELECT photo_id AS id, photo_id, quality_score
+FROM photo_metrics
+WHERE quality_score IS NOT NULL;
 
 CREATE TABLE IF NOT EXISTS faces (
     id SERIAL PRIMARY KEY,
@@ -76,6 +207,18 @@ CREATE TABLE IF NOT EXISTS photo_styles (
     PRIMARY KEY(photo_id, style_id)
 );
 
+-- ----------------- Perceptual Hashes -----------------
+-- One row per photo and hash algorithm. The 64-bit hash is stored as a signed
+-- BIGINT (see db._to_signed64); bump version when the hashing code changes.
+CREATE TABLE IF NOT EXISTS photo_hashes (
+    photo_id INT REFERENCES photos(id) ON DELETE CASCADE,
+    algorithm TEXT NOT NULL,
+    version INT NOT NULL DEFAULT 1,
+    hash BIGINT NOT NULL,
+    PRIMARY KEY(photo_id, algorithm)
+);
+CREATE INDEX IF NOT EXISTS photo_hashes_algorithm_hash_idx ON photo_hashes(algorithm, hash);
+
 -- ----------------- Near Duplicate Groups -----------------
 CREATE TABLE IF NOT EXISTS near_duplicate_groups (
     id SERIAL PRIMARY KEY,
@@ -89,3 +232,5 @@ CREATE TABLE IF NOT EXISTS near_duplicate_photos (
     photo_id INT REFERENCES photos(id) ON DELETE CASCADE,
     PRIMARY KEY(group_id, photo_id)
 );
+
+CREATE INDEX IF NOT EXISTS near_duplicate_photos_photo_idx ON near_duplicate_photos(photo_id);
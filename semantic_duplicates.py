@@ -0,0 +1,97 @@
+# semantic_duplicates.py
+
+import numpy as np
+
+from db import Database
+from hamming_index import UnionFind
+
+
+def similar_pairs(matrix, threshold, block_size=1024):
+    """
+    All index pairs (i, j), i < j, whose rows have dot product >= threshold.
+
+    Rows should be L2-normalized so the dot product is the cosine similarity.
+    The similarity matrix is computed block by block over the upper triangle,
+    so memory stays at block_size x block_size floats however many rows
+    there are.
+
+    :param matrix: (n, d) float32 array
+    :return: generator of (i, j)
+    """
+    n = len(matrix)
+    for start in range(0, n, block_size):
+        block = matrix[start:start + block_size]
+        for other in range(start, n, block_size):
+            sims = block @ matrix[other:other + block_size].T
+            rows, cols = np.nonzero(sims >= threshold)
+            rows += start
+            cols += other
+            upper = cols > rows  # skip self-pairs and pairs seen in the other order
+            yield from zip(rows[upper].tolist(), cols[upper].tolist())
+
+
+class SemanticDuplicateDetector:
+    """
+    Finds near-duplicates by CLIP embedding similarity.
+
+    Catches what perceptual hashes miss (crops, exposure or white-balance
+    changes). A collection's embeddings are loaded into one float32 matrix and
+    compared with blocked matrix multiplication; photos linked by cosine
+    similarity >= threshold are written as near-duplicate groups with
+    method='clip'.
+    """
+
+    METHOD = "clip"
+
+    def __init__(self, db: Database, threshold=0.95, block_size=1024):
+        """
+        :param db: Database instance
+        :param threshold: minimum cosine similarity for two photos to match
+        :param block_size: rows per block; memory is about block_size^2 * 4 bytes
+        """
+        self.db = db
+        self.threshold = threshold
+        self.block_size = block_size
+
+    def load_embeddings(self, collection_id=None):
+        """
+        :return: (photo_ids, matrix) with one L2-normalized float32 row per photo
+        """
+        embeddings = self.db.get_embeddings(collection_id=collection_id)
+        photo_ids = list(embeddings)
+        if not photo_ids:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        matrix = np.asarray([embeddings[pid] for pid in photo_ids], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+        return photo_ids, matrix
+
+    def find_groups(self, collection_id=None):
+        """
+        :return: list of photo-id groups (two or more photos each)
+        """
+        photo_ids, matrix = self.load_embeddings(collection_id)
+        sets = UnionFind(photo_ids)
+        for i, j in similar_pairs(matrix, self.threshold, self.block_size):
+            sets.union(photo_ids[i], photo_ids[j])
+        return [group for group in sets.groups() if len(group) > 1]
+
+    def find_duplicates(self, collection_id=None):
+        """
+        Recompute the 'clip' groups of a collection (or of the whole library).
+        Old 'clip' groups of those photos are replaced in one transaction.
+
+        :return: number of groups written
+        """
+        groups = self.find_groups(collection_id)
+        photo_ids = [p["id"] for p in self.db.get_photos(collection_id)]
+        with self.db.transaction():
+            self.db.delete_near_duplicate_groups(self.METHOD, photo_ids)
+            group_ids = self.db.add_near_duplicate_groups(len(groups), self.METHOD)
+            self.db.assign_photos_to_near_duplicate_groups(
+                (group_id, pid)
+                for group_id, members in zip(group_ids, groups)
+                for pid in members
+            )
+        print(f"Found {len(groups)} semantic duplicate groups")
+        return len(groups)
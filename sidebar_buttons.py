@@ -4,10 +4,14 @@ from ttkbootstrap.dialogs import Querybox, Messagebox
 from tkinter import filedialog
 import threading
 from progress_dialog import ProgressDialog 
+from duplicates import group_suggestions
 
 class SidebarButtons:
     """Holds logic for sidebar button actions."""
 
+    # Duplicate groups fetched per query when generating suggestions
+    GROUP_PAGE_SIZE = 500
+
     def __init__(self, master, db=None, photo_viewer=None, importer=None):
         """
         :param master: Main application instance (tk.Tk or ttk.Window) with show_centered_info()
@@ -161,6 +165,11 @@ class SidebarButtons:
                         self.db.get_all_photos()
                     )  # list of dicts with 'id' and 'file_path'
                     duplicates_detector.find_duplicates_batch(photo_list)
+                    semantic = getattr(self.importer, "semantic_duplicates", None)
+                    if semantic is not None:
+                        # Per collection, so each similarity search stays small
+                        for coll in self.db.get_collections() or []:
+                            semantic.find_duplicates(coll["id"])
 
                     self.master.after(
                         0,
@@ -241,7 +250,7 @@ class SidebarButtons:
                 try:
                     # photo_list = self.db.get_all_photos()  # list of dicts with 'id' and 'file_path'
                     photo_list = [
-                        p for p in self.db.get_all_photos()
+                        p for p in self.db.get_ranked_photos()
                         if (p.get("suggestion") or "").lower() != "deleted"
                     ]
 
@@ -253,35 +262,26 @@ class SidebarButtons:
                     #     ))
                     #     return
 
-                    existing_groups = self.db.get_near_duplicate_groups()
-                    ungrouped_photos = self.db.get_photos_without_duplicate_group()
+                    # Only pHash membership counts: 'clip' groups do not mean a photo was hashed
+                    ungrouped_photos = self.db.get_photos_without_duplicate_group(method="phash")
 
                     if ungrouped_photos:
-                        print("[INFO] Found {len(ungrouped_photos)} ungrouped photos, running partial duplicate detection.")
+                        print(f"[INFO] Found {len(ungrouped_photos)} ungrouped photos, running incremental duplicate detection.")
                         if hasattr(self.importer, "duplicates"):
-                            duplicates = self.importer.duplicates
-                            # Collect all photos already in groups to include in detection
-                            grouped_photos = [photo for group in existing_groups for photo in group["photos"]]
-                            duplicates.find_duplicates_batch(ungrouped_photos + grouped_photos)
-                            existing_groups = self.db.get_near_duplicate_groups()
+                            # Only the new photos are hashed and matched against existing groups
+                            self.importer.duplicates.find_duplicates_incremental(ungrouped_photos)
                     else:
-                        print(f"[INFO] Found {len(existing_groups)} duplicate groups - using existing results.")
-                    
-                    group_map = {g["id"]: g["photos"] for g in existing_groups}
-                    handled_ids = set()
+                        print("[INFO] No ungrouped photos - using existing duplicate groups.")
 
-                    for group_id, photos in group_map.items():
-                        if not photos:
-                            continue
-                        
-                        best = max(photos, key=lambda p: p.get("score", 0) or 0)
-                        for p in photos:
-                            if (p.get("suggestion") or "").lower() == "deleted":
-                                continue
-                            pid = p["id"]
-                            sugg = "keep" if pid == best["id"] else "delete"
-                            self.db.update_photo_suggestion(pid, sugg)
-                            handled_ids.add(pid)
+                    # Groups of every method (pHash and CLIP) come with their photos and
+                    # quality scores, a page per query. Suggestions are settled over all
+                    # of them first, so a photo kept in one group is not deleted by another.
+                    group_sugg = group_suggestions(
+                        self.db.iter_near_duplicate_groups(page_size=self.GROUP_PAGE_SIZE)
+                    )
+                    for pid, sugg in group_sugg.items():
+                        self.db.update_photo_suggestion(pid, sugg)
+                    handled_ids = set(group_sugg)
 
                     for photo in photo_list:
                         current_suggestion = (photo.get("suggestion") or "").lower()
@@ -299,8 +299,10 @@ class SidebarButtons:
                             continue
 
                         # Otherwise, suggest based on quality score
-                        score = photo.get("score", 0.0)
-                        if score < 0.4:
+                        score = photo.get("quality_score")
+                        if score is None:
+                            suggestion = "undecided"
+                        elif score < 0.4:
                             suggestion = "delete"
                         elif score > 0.7:
                             suggestion = "keep"
@@ -2,6 +2,7 @@
 import ttkbootstrap as ttk
 from PIL import Image, ImageTk
 from main_viewer import MainViewer
+from thumbnail_cache import get_thumbnail_cache
 from tkinter.scrolledtext import ScrolledText  # NEW
 from llm_feedback import make_paragraph
 from progress_dialog import ProgressDialog
@@ -14,7 +15,9 @@ class SinglePhotoViewer(MainViewer):
     with an LLM feedback box pinned at the bottom-left.
     """
 
-    def __init__(self, parent, db, photo_path=None, photo_id=None, **kwargs):
+    def __init__(
+        self, parent, db, photo_path=None, photo_id=None, content_hash=None, **kwargs
+    ):
         kwargs.pop("photo_path", None)
         super().__init__(parent, **kwargs)
 
@@ -93,13 +96,17 @@ class SinglePhotoViewer(MainViewer):
         self._set_feedback = _set_feedback
 
         if photo_path:
-            self.load_image(photo_path)
+            self.load_image(photo_path, content_hash)
 
-    def load_image(self, photo_path: str):
+    def load_image(self, photo_path: str, content_hash=None):
         """Load the image and render to fit canvas."""
         try:
             self.photo_path = photo_path
-            self._orig_img = Image.open(photo_path).convert("RGBA")
+            # The cached preview is much cheaper to load than the original; with
+            # the stored content hash the cache key needs no read of the file
+            self._orig_img = (
+                get_thumbnail_cache().preview(photo_path, key=content_hash).convert("RGBA")
+            )
             self._render_fit()
         except Exception as e:
             print(f"[SinglePhotoViewer] Failed to load {photo_path}: {e}")
@@ -0,0 +1,34 @@
+import unittest
+
+from bursts import burst_pairs, camera_key, capture_time
+
+
+class BurstsTest(unittest.TestCase):
+    def test_capture_time_reads_piexif_and_exifread_tags(self):
+        jpeg = {"DateTimeOriginal": "2024:03:01 10:00:05", "SubSecTimeOriginal": "25"}
+        raw = {"EXIF DateTimeOriginal": "2024:03:01 10:00:05"}
+        self.assertAlmostEqual(capture_time(jpeg) - capture_time(raw), 0.25)
+        self.assertIsNone(capture_time({"DateTimeOriginal": "0000:00:00 00:00:00"}))
+        self.assertIsNone(capture_time({}))
+
+    def test_camera_key_prefers_serial(self):
+        self.assertEqual(
+            camera_key({"BodySerialNumber": "123", "Model": "X100"}), "123"
+        )
+        self.assertEqual(camera_key({"Image Model": "X100"}), "X100")
+        self.assertIsNone(camera_key({}))
+
+    def test_pairs_stay_inside_window_and_camera(self):
+        shots = [
+            ("a", 0.0, "cam1"),
+            ("b", 1.5, "cam1"),
+            ("c", 3.0, "cam1"),
+            ("d", 60.0, "cam1"),
+            ("e", 0.5, "cam2"),
+        ]
+        pairs = {frozenset(p) for p in burst_pairs(shots, window=2.0)}
+        self.assertEqual(pairs, {frozenset("ab"), frozenset("bc")})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+try:
+    from clip_service import ClipModelService
+except ImportError:  # torch / CLIP not installed
+    ClipModelService = None
+
+
+@unittest.skipUnless(ClipModelService is not None, "torch or CLIP not installed")
+class ClipServiceConfigureTest(unittest.TestCase):
+    def test_later_callers_cannot_change_settings(self):
+        service = ClipModelService(device="cpu")
+        service.configure(device="cpu")
+        with self.assertRaises(ValueError):
+            service.configure(device="cuda")
+
+        # The first caller to ask for a thread count sets it; others must agree
+        service.configure(torch_threads=2)
+        self.assertEqual(service.torch_threads, 2)
+        service.configure(torch_threads=2)
+        service.configure()
+        with self.assertRaises(ValueError):
+            service.configure(torch_threads=4)
+        self.assertFalse(service.is_loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import shutil
+import tempfile
+import unittest
+
+try:
+    from duplicate_benchmark import generate_corpus, run_offline
+    from hash_tuning import load_labelled, pair_scores
+except ImportError:  # piexif / imagehash / database driver not installed
+    run_offline = None
+
+
+@unittest.skipUnless(run_offline is not None, "piexif, imagehash or psycopg2 not installed")
+class OfflineRunTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_detector_runs_against_memory_database(self):
+        manifest = generate_corpus(self.folder, 12, seed=1, size=(160, 120), workers=2)
+        items = load_labelled(self.folder)
+
+        for burst_window in (None, 5):
+            groups, labels, round_trips = run_offline(
+                items, manifest, (("phash", 12),), burst_window, workers=2
+            )
+            precision, recall, predicted, _ = pair_scores(groups, labels)
+            self.assertGreater(predicted, 0)
+            self.assertEqual(precision, 1.0)
+            # Hash lookup and store, group lookup, group and membership inserts
+            # (plus the EXIF lookup for the burst window)
+            self.assertEqual(round_trips, 5 if burst_window is None else 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
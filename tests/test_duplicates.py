@@ -0,0 +1,224 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import contextmanager
+
+try:
+    from PIL import Image
+
+    import duplicates
+    from duplicates import NearDuplicateDetector
+except ImportError:  # imagehash / database driver not installed
+    NearDuplicateDetector = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeDatabase:
+    """In-memory stand-in for the Database calls the detector makes."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.groups = {}  # group id -> method
+        self.members = set()  # (group_id, photo_id)
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def get_photo_hashes(self, photo_ids, algorithms, version):
+        return {pid: dict(self.hashes[pid]) for pid in photo_ids if pid in self.hashes}
+
+    def add_photo_hashes(self, rows):
+        for photo_id, name, _, value in rows:
+            self.hashes.setdefault(photo_id, {})[name] = value
+
+    def add_group(self, *photo_ids, method="phash"):
+        group_id = max(self.groups, default=0) + 1
+        self.groups[group_id] = method
+        self.members.update((group_id, pid) for pid in photo_ids)
+        return group_id
+
+    def group_of(self, photo_id):
+        return {gid for gid, pid in self.members if pid == photo_id}
+
+    def get_groups_for_photos(self, photo_ids, method=None):
+        groups = {}
+        for gid, pid in sorted(self.members):
+            if pid in photo_ids and method in (None, self.groups[gid]):
+                groups.setdefault(pid, []).append(gid)
+        return groups
+
+    def add_near_duplicate_groups(self, count, method=None):
+        return [self.add_group(method=method) for _ in range(count)]
+
+    def assign_photos_to_near_duplicate_groups(self, rows):
+        self.members.update(rows)
+
+    def merge_near_duplicate_groups(self, merges):
+        for gid, pid in list(self.members):
+            if gid in merges:
+                self.members.add((merges[gid], pid))
+        self.members = {(gid, pid) for gid, pid in self.members if gid not in merges}
+        for gid in merges:
+            del self.groups[gid]
+
+    def get_near_duplicate_state(self):
+        return (len(self.members), max((gid for gid, _ in self.members), default=0))
+
+    def get_grouped_photo_hashes(self, algorithms, version, method):
+        rows = {}
+        for gid, pid in sorted(self.members):
+            if self.groups[gid] == method and pid in self.hashes:
+                rows.setdefault(pid, {"photo_id": pid, "group_id": gid,
+                                      "hashes": self.hashes[pid]})
+        return list(rows.values())
+
+
+class AppEntryTest(unittest.TestCase):
+    def test_spawned_workers_do_not_import_the_gui(self):
+        # What a spawned worker does with the main module of the app
+        code = (
+            "import runpy, sys; runpy.run_path('app.py', run_name='__mp_main__'); "
+            "print([m for m in ('autocull_app', 'ttkbootstrap', 'torch', 'clip') "
+            "if m in sys.modules])"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+            check=True,
+        )
+        self.assertEqual(out.stdout.strip(), "[]")
+
+
+@unittest.skipUnless(NearDuplicateDetector is not None, "imagehash or psycopg2 not installed")
+class LoadHashesTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.photos = []
+        for i in range(NearDuplicateDetector.MIN_POOL_BATCH):
+            path = os.path.join(self.folder, f"{i}.jpg")
+            Image.effect_noise((64, 64), 20 + i).convert("RGB").save(path)
+            self.photos.append({"id": i + 1, "file_path": path})
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_pool_is_kept_between_calls(self):
+        db = FakeDatabase()
+        detector = NearDuplicateDetector(db, hash_workers=2)
+
+        first = detector.load_hashes(self.photos)
+        pool = duplicates._pool
+        db.hashes.clear()
+        second = detector.load_hashes(self.photos)
+
+        self.assertIsNotNone(pool)
+        self.assertIs(duplicates._pool, pool)
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), len(self.photos))
+        self.assertEqual(set(db.hashes[1]), set(duplicates.HASH_FUNCS))
+
+
+@unittest.skipUnless(NearDuplicateDetector is not None, "imagehash or psycopg2 not installed")
+class AssignGroupsTest(unittest.TestCase):
+    def test_set_spanning_two_groups_merges_them(self):
+        db = FakeDatabase()
+        first = db.add_group(10, 11)
+        second = db.add_group(20, 21)
+        detector = NearDuplicateDetector(db)
+        detector._index = object()  # stands in for a built hash index
+
+        assignment = detector.assign_groups([[11, 20, 30]])
+
+        self.assertEqual(assignment, {11: first, 20: first, 30: first})
+        # The absorbed group is gone and its other member follows the merge
+        self.assertNotIn(second, db.groups)
+        for pid in (10, 11, 20, 21, 30):
+            self.assertEqual(db.group_of(pid), {first})
+        self.assertIsNone(detector._index)
+
+    def test_linked_groups_and_new_groups(self):
+        db = FakeDatabase()
+        existing = db.add_group(10, 11)
+        other = db.add_group(50, 51, method="clip")
+        detector = NearDuplicateDetector(db)
+
+        assignment = detector.assign_groups(
+            [[30], [40, 41], [50]], linked_groups={30: [existing]}
+        )
+
+        self.assertEqual(assignment[30], existing)
+        self.assertEqual(assignment[40], assignment[41])
+        self.assertNotIn(assignment[40], (existing, other))
+        # Groups of another method are neither merged nor reused
+        self.assertNotIn(assignment[50], (existing, other, assignment[40]))
+        self.assertEqual(db.group_of(50), {other, assignment[50]})
+        self.assertEqual(set(db.groups), {existing, other, assignment[40], assignment[50]})
+
+
+# pHash values: A and B are 16 bits apart, BRIDGE is 8 bits from each,
+# C is far from all of them. The default cascade matches within 10 bits.
+A, B, BRIDGE, C = 0, (1 << 16) - 1, (1 << 8) - 1, ((1 << 16) - 1) << 40
+
+
+@unittest.skipUnless(NearDuplicateDetector is not None, "imagehash or psycopg2 not installed")
+class IncrementalDetectionTest(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDatabase()
+        self.group_a = self.db.add_group(10, 11)
+        self.group_b = self.db.add_group(20, 21)
+        for pid, value in ((10, A), (11, A ^ 1), (20, B), (21, B ^ 1)):
+            self._hash(pid, value)
+        self.detector = NearDuplicateDetector(self.db)
+
+    def _hash(self, photo_id, value):
+        self.db.hashes[photo_id] = {"phash": value}
+        return {"id": photo_id, "file_path": f"{photo_id}.jpg"}
+
+    def test_new_photo_joins_existing_group(self):
+        self.detector.find_duplicates_incremental([self._hash(30, A ^ 2)])
+        self.assertEqual(self.db.group_of(30), {self.group_a})
+
+    def test_new_photos_form_a_group(self):
+        self.detector.find_duplicates_incremental(
+            [self._hash(40, C), self._hash(41, C ^ 1), self._hash(42, C ^ 0xFFF)]
+        )
+        (group,) = self.db.group_of(40)
+        self.assertEqual(self.db.group_of(41), {group})
+        self.assertNotIn(group, (self.group_a, self.group_b))
+        # Too far from the others, so it is grouped on its own
+        self.assertNotIn(group, self.db.group_of(42))
+
+    def test_new_photo_bridges_two_groups(self):
+        self.detector.find_duplicates_incremental([self._hash(50, BRIDGE)])
+        self.assertNotIn(self.group_b, self.db.groups)
+        for pid in (10, 11, 20, 21, 50):
+            self.assertEqual(self.db.group_of(pid), {self.group_a})
+
+    def test_index_is_rebuilt_when_groups_change(self):
+        builds = []
+        get_rows = self.db.get_grouped_photo_hashes
+
+        def counting_get_rows(*args, **kwargs):
+            builds.append(1)
+            return get_rows(*args, **kwargs)
+
+        self.db.get_grouped_photo_hashes = counting_get_rows
+
+        self.detector.find_duplicates_incremental([self._hash(30, A ^ 2)])
+        self.detector.find_duplicates_incremental([self._hash(31, A ^ 4)])
+        self.assertEqual(len(builds), 1)  # the index followed its own writes
+
+        # A batch run (or another detector) groups photos behind its back
+        group_c = self.db.add_group(60)
+        self._hash(60, C)
+        self.detector.find_duplicates_incremental([self._hash(61, C ^ 1)])
+        self.assertEqual(len(builds), 2)
+        self.assertEqual(self.db.group_of(61), {group_c})
+
+
+if __name__ == "__main__":
+    unittest.main()
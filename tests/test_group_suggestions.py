@@ -0,0 +1,35 @@
+import unittest
+
+try:
+    from duplicates import group_suggestions
+except ImportError:  # imagehash / database driver not installed
+    group_suggestions = None
+
+
+def _group(group_id, method, *photos):
+    return {
+        "id": group_id,
+        "method": method,
+        "photos": [{"id": pid, "quality_score": score} for pid, score in photos],
+    }
+
+
+@unittest.skipUnless(group_suggestions is not None, "imagehash or psycopg2 not installed")
+class GroupSuggestionsTest(unittest.TestCase):
+    def test_keep_is_not_overridden_by_a_later_group(self):
+        phash = _group(1, "phash", (10, 0.9), (11, 0.5))
+        # Photo 10 loses the CLIP group, which comes later in id order
+        clip = _group(2, "clip", (10, 0.9), (12, 0.95))
+        for groups in ([phash, clip], [clip, phash]):
+            self.assertEqual(
+                group_suggestions(groups), {10: "keep", 11: "delete", 12: "keep"}
+            )
+
+    def test_deleted_photos_are_left_out(self):
+        group = _group(1, "phash", (10, 0.9), (11, 0.5))
+        group["photos"][1]["suggestion"] = "Deleted"
+        self.assertEqual(group_suggestions([group]), {10: "keep"})
+
+
+if __name__ == "__main__":
+    unittest.main()
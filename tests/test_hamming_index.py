@@ -0,0 +1,93 @@
+import random
+import unittest
+
+from hamming_index import BKTree, UnionFind, cluster_cascade, cluster_hashes, hamming
+
+try:
+    import numpy as np
+    from sklearn.cluster import DBSCAN
+except ImportError:
+    DBSCAN = None
+
+
+def _near(value, rng, flips):
+    for bit in rng.sample(range(64), flips):
+        value ^= 1 << bit
+    return value
+
+
+def _corpus(rng, bases=40, copies=4, max_flips=8):
+    hashes = []
+    for _ in range(bases):
+        base = rng.getrandbits(64)
+        hashes.append(base)
+        hashes.extend(_near(base, rng, rng.randint(0, max_flips)) for _ in range(copies))
+    rng.shuffle(hashes)
+    return list(enumerate(hashes))
+
+
+class HammingIndexTest(unittest.TestCase):
+    def test_search_matches_brute_force(self):
+        rng = random.Random(1)
+        items = _corpus(rng)
+        tree = BKTree((value, item) for item, value in items)
+        self.assertEqual(len(tree), len(items))
+
+        for k in (0, 3, 10):
+            for _, query in items[:25]:
+                expected = sorted(
+                    (item, hamming(query, value))
+                    for item, value in items
+                    if hamming(query, value) <= k
+                )
+                self.assertEqual(sorted(tree.search(query, k)), expected)
+
+    def test_clusters_follow_chains(self):
+        a = 0
+        b = a ^ 0b111  # distance 3 from a
+        c = b ^ 0b111000  # distance 3 from b, 6 from a
+        far = (1 << 64) - 1
+        groups = cluster_hashes([("a", a), ("b", b), ("c", c), ("x", far)], 3)
+        self.assertEqual([sorted(g) for g in groups], [["a", "b", "c"]])
+
+    def test_cascade_requires_every_stage(self):
+        # (cheap, strict): a-b agree on both, a-c only on the cheap hash
+        items = [("a", (0, 0)), ("b", (0b1, 0b1)), ("c", (0b11, 0xFFFF))]
+        self.assertEqual(
+            [sorted(g) for g in cluster_cascade(items, (2, 2))], [["a", "b"]]
+        )
+        self.assertEqual(
+            [sorted(g) for g in cluster_cascade(items, (2, 16))], [["a", "b", "c"]]
+        )
+
+    def test_union_find_groups(self):
+        sets = UnionFind(range(6))
+        sets.union(0, 1)
+        sets.union(4, 1)
+        sets.union(2, 3)
+        self.assertEqual(sorted(sorted(g) for g in sets.groups()), [[0, 1, 4], [2, 3], [5]])
+
+    @unittest.skipUnless(DBSCAN is not None, "scikit-learn not installed")
+    def test_same_groups_as_dbscan(self):
+        rng = random.Random(7)
+        items = _corpus(rng, bases=60, copies=3, max_flips=14)
+        bits = np.array(
+            [[(value >> (63 - i)) & 1 for i in range(64)] for _, value in items]
+        )
+        for threshold in (5, 10):
+            labels = DBSCAN(
+                eps=threshold / 64, min_samples=2, metric="hamming"
+            ).fit_predict(bits)
+            expected = {}
+            for (item, _), label in zip(items, labels):
+                if label != -1:
+                    expected.setdefault(label, set()).add(item)
+
+            groups = cluster_hashes(items, threshold)
+            self.assertEqual(
+                sorted(map(sorted, expected.values())), sorted(map(sorted, groups))
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+try:
+    from hash_tuning import pair_scores
+except ImportError:  # imagehash / database driver not installed
+    pair_scores = None
+
+
+@unittest.skipUnless(pair_scores is not None, "imagehash or psycopg2 not installed")
+class PairScoresTest(unittest.TestCase):
+    # Two labelled sets, "a" with three photos and "b" with two, and a singleton
+    LABELS = ["a", "a", "a", "b", "b", None]
+
+    def test_exact_groups(self):
+        self.assertEqual(
+            pair_scores([[0, 1, 2], [3, 4]], self.LABELS), (1.0, 1.0, 4, 4)
+        )
+
+    def test_merged_sets_cost_precision(self):
+        precision, recall, predicted, true_pairs = pair_scores(
+            [[0, 1, 2, 3, 4, 5]], self.LABELS
+        )
+        self.assertEqual((predicted, true_pairs), (15, 4))
+        self.assertAlmostEqual(precision, 4 / 15)
+        self.assertEqual(recall, 1.0)
+
+    def test_split_sets_cost_recall(self):
+        precision, recall, predicted, _ = pair_scores([[0, 1], [2, 5]], self.LABELS)
+        self.assertEqual(predicted, 2)
+        self.assertEqual(precision, 0.5)
+        self.assertEqual(recall, 0.25)
+
+    def test_no_groups(self):
+        self.assertEqual(pair_scores([], self.LABELS), (1.0, 0.0, 0, 4))
+        self.assertEqual(pair_scores([], [None, None]), (1.0, 1.0, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
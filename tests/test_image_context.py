@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+try:
+    from PIL import Image
+
+    from image_context import ImageContext, open_image, read_bgr, reduction_factor
+except ImportError:
+    Image = None
+
+
+@unittest.skipUnless(Image is not None, "Pillow/OpenCV/rawpy not installed")
+class ReducedDecodeTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".jpg")
+        os.close(fd)
+        Image.linear_gradient("L").resize((3000, 2000)).convert("RGB").save(self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_reduction_keeps_longest_side_covered(self):
+        self.assertEqual(reduction_factor((6000, 4000), 800), 4)
+        self.assertEqual(reduction_factor((6000, 4000), 1600), 2)
+        self.assertEqual(reduction_factor((12000, 8000), 800), 8)
+        self.assertEqual(reduction_factor((1000, 800), 800), 1)
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        with open_image(self.path, max_dim=700) as img:
+            img.load()
+            self.assertEqual(img.size, (750, 500))
+        self.assertEqual(read_bgr(self.path, 700).shape, (500, 750, 3))
+        self.assertEqual(ImageContext(self.path, max_dim=1400).image().size, (1500, 1000))
+        self.assertEqual(ImageContext(self.path).image().size, (3000, 2000))
+
+    def test_release_data_keeps_decoded_image(self):
+        context = ImageContext(self.path, max_dim=700)
+        expected_hash = context.content_hash
+        context.release_data()
+        self.assertIsNone(context.data)
+        # Decoded up front, so the image no longer holds the file buffer
+        self.assertIsNone(context.image().fp)
+        self.assertEqual(context.image().size, (750, 500))
+        self.assertEqual(context.bgr().shape, (500, 750, 3))
+        self.assertEqual(context.content_hash, expected_hash)
+        with self.assertRaises(ValueError):
+            context.file_obj()
+
+
+if __name__ == "__main__":
+    unittest.main()
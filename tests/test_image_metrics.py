@@ -0,0 +1,111 @@
+import unittest
+
+try:
+    import cv2
+    import numpy as np
+
+    from image_metrics import METRICS, compute_metrics, compute_metrics_batch
+except ImportError:
+    cv2 = None
+
+
+def legacy_metrics(img):
+    """The metrics PhotoScorer.score_photo computed before image_metrics."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    height, width = gray.shape
+    if max(height, width) > 800:
+        scale = 800 / max(height, width)
+        new_size = (int(width * scale), int(height * scale))
+        gray = cv2.resize(gray, new_size, interpolation=cv2.INTER_AREA)
+        hsv = cv2.resize(hsv, new_size, interpolation=cv2.INTER_AREA)
+        img = cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
+
+    B, G, R = cv2.split(img.astype("float"))
+    rg = np.abs(R - G)
+    yb = np.abs(0.5 * (R + G) - B)
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
+    hist = hist.ravel() / hist.sum()
+    hist = hist[hist > 0]
+    return {
+        "laplacian_var": float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+        "sobel_energy": float(
+            np.sum(np.square(cv2.Sobel(gray, cv2.CV_64F, 1, 0)))
+            + np.sum(np.square(cv2.Sobel(gray, cv2.CV_64F, 0, 1)))
+        ),
+        "noise": float(np.mean(np.abs(gray - cv2.GaussianBlur(gray, (3, 3), 0)))),
+        "brightness_mean": float(np.mean(gray)),
+        "brightness_median": float(np.median(gray)),
+        "saturation_mean": float(np.mean(hsv[:, :, 1])),
+        "saturation_std": float(np.std(hsv[:, :, 1])),
+        "contrast_std": float(np.std(gray)),
+        "contrast_range": float(gray.max() - gray.min()),
+        "colorfulness": float(
+            np.sqrt(rg.mean() ** 2 + yb.mean() ** 2) + 0.3 * (rg.std() + yb.std())
+        ),
+        "entropy": float(-np.sum(hist * np.log2(hist))),
+        "width": img.shape[1],
+        "height": img.shape[0],
+        "aspect_ratio": img.shape[1] / img.shape[0],
+    }
+
+
+def _photo(rng, height, width):
+    """Smooth gradient scene with shapes and sensor-like noise."""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    img = np.stack(
+        [x / width * 200, y / height * 180, (x + y) / (width + height) * 255], axis=-1
+    )
+    for _ in range(8):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        r = rng.integers(min(height, width) // 20, min(height, width) // 4)
+        cv2.circle(img, (int(cx), int(cy)), int(r), rng.integers(0, 256, 3).tolist(), -1)
+    img += rng.normal(0, 6, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+@unittest.skipUnless(cv2 is not None, "OpenCV/numpy not installed")
+class ImageMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(3)
+
+    def test_matches_legacy_without_resize(self):
+        img = _photo(self.rng, 480, 640)
+        new, old = compute_metrics(img), legacy_metrics(img)
+        self.assertEqual(new.keys(), old.keys())
+        for name in old:
+            if name == "noise":
+                continue
+            self.assertAlmostEqual(new[name], old[name], delta=1e-4 * max(1, abs(old[name])), msg=name)
+
+    def test_noise_is_absolute_difference(self):
+        # The legacy uint8 subtraction wrapped negative differences to 256 - d
+        img = _photo(self.rng, 240, 320)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY).astype(np.int16)
+        blur = cv2.GaussianBlur(gray.astype(np.uint8), (3, 3), 0).astype(np.int16)
+        expected = np.mean(np.abs(gray - blur))
+        self.assertAlmostEqual(compute_metrics(img)["noise"], expected, places=6)
+        self.assertGreater(legacy_metrics(img)["noise"], expected)
+
+    def test_close_to_legacy_after_resize(self):
+        img = _photo(self.rng, 1500, 2000)
+        new, old = compute_metrics(img), legacy_metrics(img)
+        self.assertEqual((new["width"], new["height"]), (800, 600))
+        # Gray/HSV from the shrunk frame differ from shrunk gray/HSV by rounding
+        for name in ("brightness_mean", "brightness_median", "contrast_std",
+                     "contrast_range", "entropy", "saturation_mean",
+                     "saturation_std", "colorfulness", "sobel_energy",
+                     "laplacian_var"):
+            self.assertAlmostEqual(new[name], old[name], delta=0.05 * max(1, abs(old[name])), msg=name)
+
+    def test_batch_matches_single_frames(self):
+        frames = np.stack([_photo(self.rng, 300, 400) for _ in range(4)])
+        batch = compute_metrics_batch(frames)
+        for frame, record in zip(frames, batch):
+            single = compute_metrics(frame)
+            for name in METRICS:
+                self.assertAlmostEqual(record[name], single[name], delta=1e-6 * max(1, abs(single[name])), msg=name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+
+from import_pipeline import ImportJob, ImportPipeline
+
+
+class ImportPipelineTest(unittest.TestCase):
+    def test_all_jobs_pass_every_stage(self):
+        seen = []
+        lock = threading.Lock()
+
+        def exif(job):
+            job.exif = {"name": job.file}
+
+        def db(job):
+            with lock:
+                seen.append(job.file)
+            job.photo_id = job.file
+
+        pipeline = ImportPipeline(
+            [("exif", exif, 3), ("db", db, 1)], queue_size=2
+        )
+        jobs = pipeline.run(ImportJob(i, collection_id=1) for i in range(50))
+
+        self.assertEqual(sorted(j.photo_id for j in jobs), list(range(50)))
+        self.assertEqual(sorted(seen), list(range(50)))
+
+    def test_failed_job_skips_later_stages(self):
+        def decode(job):
+            if job.file == 2:
+                raise ValueError("bad file")
+
+        def db(job):
+            job.photo_id = job.file
+
+        jobs = ImportPipeline([("decode", decode, 2), ("db", db, 1)]).run(
+            ImportJob(i, collection_id=1) for i in range(5)
+        )
+
+        failed = [j for j in jobs if j.error is not None]
+        self.assertEqual([j.file for j in failed], [2])
+        self.assertIsNone(failed[0].photo_id)
+        self.assertEqual(len(jobs), 5)
+
+    def test_batched_stage_receives_lists(self):
+        batch_sizes = []
+
+        def embed(jobs):
+            batch_sizes.append(len(jobs))
+            for job in jobs:
+                job.embedding = job.file * 2
+
+        jobs = ImportPipeline([("embed", embed, 1, 4)], queue_size=8).run(
+            ImportJob(i, collection_id=1) for i in range(10)
+        )
+
+        self.assertEqual(sorted(j.embedding for j in jobs), [i * 2 for i in range(10)])
+        self.assertTrue(all(size <= 4 for size in batch_sizes))
+        self.assertEqual(sum(batch_sizes), 10)
+
+    def test_batches_fill_behind_a_slow_stage(self):
+        batch_sizes = []
+
+        def decode(job):
+            time.sleep(0.06)  # like decoding a large photo
+
+        def embed(jobs):
+            batch_sizes.append(len(jobs))
+
+        ImportPipeline([("decode", decode, 1), ("embed", embed, 1, 4)]).run(
+            ImportJob(i, collection_id=1) for i in range(9)
+        )
+
+        self.assertEqual(batch_sizes, [4, 4, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import unittest
+
+try:
+    from db import Database
+except ImportError:  # psycopg2 / python-dotenv not installed
+    Database = None
+
+# Runs against a scratch database only: it creates and deletes rows
+TEST_DB_NAME = os.getenv("TEST_DB_NAME")
+
+
+@unittest.skipUnless(
+    Database is not None and TEST_DB_NAME, "set TEST_DB_NAME to a scratch database"
+)
+class NearDuplicateGroupPagingTest(unittest.TestCase):
+    METHOD = "paging-test"
+
+    def setUp(self):
+        os.environ["DB_NAME"] = TEST_DB_NAME
+        self.db = Database()
+        self.db.create_schema()
+        self.collection_id = self.db.add_collection(f"group-paging-{os.getpid()}")
+        self.group_ids = []
+
+    def tearDown(self):
+        self.db.delete_collection(self.collection_id)
+        self.db.execute(
+            "DELETE FROM near_duplicate_groups WHERE id = ANY(%s)", (self.group_ids,)
+        )
+        self.db.close()
+
+    def _group(self, size):
+        group_id = self.db.add_near_duplicate_group(self.METHOD)
+        self.group_ids.append(group_id)
+        for i in range(size):
+            pid = self.db.add_photo(self.collection_id, f"/g{group_id}_{i}.jpg", "x.jpg")
+            self.db.assign_photo_to_near_duplicate_group(group_id, pid)
+        return group_id
+
+    def test_empty_group_does_not_end_paging(self):
+        # Deleting every member leaves the group row behind
+        expected = [self._group(2)]
+        emptied = self._group(1)
+        for photo in self.db.get_photos_in_near_duplicate_group(emptied):
+            self.db.delete_photo(photo["id"])
+        expected += [self._group(2) for _ in range(3)]
+
+        first = self.db.get_near_duplicate_groups(method=self.METHOD, limit=2)
+        self.assertEqual([g["id"] for g in first], expected[:2])
+        found = [
+            g["id"]
+            for g in self.db.iter_near_duplicate_groups(method=self.METHOD, page_size=2)
+        ]
+        self.assertEqual(found, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import numpy as np
+    from PIL import Image
+
+    from duplicates import NearDuplicateDetector
+    from image_context import content_hash
+    from image_metrics import SCORER_VERSION
+    from import_pipeline import ImportJob, ImportPipeline
+    from photo_importer import PhotoImporter
+except ImportError:  # torch / CLIP / database driver not installed
+    PhotoImporter = None
+
+
+class FakeDatabase:
+    """Records what the importer's db stage writes."""
+
+    def __init__(self):
+        self.photos = {}
+        self.hash_rows = []
+        self.copies = []
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def add_photo(self, collection_id, file_path, file_name, content_hash=None,
+                  analysis_version=None):
+        photo_id = len(self.photos) + 1
+        self.photos[photo_id] = {
+            "file_path": file_path,
+            "content_hash": content_hash,
+            "analysis_version": analysis_version,
+        }
+        return photo_id
+
+    def add_embedding(self, photo_id, embedding):
+        pass
+
+    def add_exif_bulk(self, rows):
+        list(rows)
+
+    def add_photo_hashes(self, rows):
+        self.hash_rows.extend(rows)
+
+    def copy_analysis(self, source_id, target_id):
+        self.copies.append((source_id, target_id))
+
+    def find_analysed_photo(self, content_hash, analysis_version):
+        for photo_id in sorted(self.photos, reverse=True):
+            photo = self.photos[photo_id]
+            if (photo["content_hash"], photo["analysis_version"]) == (
+                content_hash, analysis_version
+            ):
+                return {"id": photo_id, "file_path": photo["file_path"]}
+        return None
+
+
+class FakeDetector:
+    HASH_VERSION = 3
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+
+    def hash_file(self, path):
+        return self.hashes
+
+
+def _importer(db, hashes):
+    importer = PhotoImporter.__new__(PhotoImporter)
+    importer.db = db
+    importer.duplicates = FakeDetector(hashes)
+    return importer
+
+
+def _job(name):
+    job = ImportJob(Path(name), collection_id=1)
+    job.embedding = np.zeros(4)
+    return job
+
+
+@unittest.skipUnless(PhotoImporter is not None, "torch, CLIP or psycopg2 not installed")
+class HashStageTest(unittest.TestCase):
+    def test_failed_hash_still_imports_photo(self):
+        db = FakeDatabase()
+        importer = _importer(db, hashes=None)
+        jobs = ImportPipeline(
+            [("hash", importer._hash_stage, 1), ("db", importer._db_stage, 1)]
+        ).run([_job("a.jpg")])
+
+        self.assertIsNone(jobs[0].error)
+        self.assertEqual(jobs[0].hashes, {})
+        self.assertEqual(db.hash_rows, [])
+        # Without hashes the analysis is incomplete, so it cannot seed the cache
+        self.assertIsNone(db.photos[jobs[0].photo_id]["analysis_version"])
+
+    def test_hashes_are_stored(self):
+        db = FakeDatabase()
+        importer = _importer(db, hashes={"phash": 7})
+        jobs = ImportPipeline(
+            [("hash", importer._hash_stage, 1), ("db", importer._db_stage, 1)]
+        ).run([_job("a.jpg")])
+
+        self.assertEqual(db.hash_rows, [(jobs[0].photo_id, "phash", 3, 7)])
+
+
+@unittest.skipUnless(PhotoImporter is not None, "torch, CLIP or psycopg2 not installed")
+class AnalysisCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.first = self._photo("first.jpg", 10)
+        self.copy = os.path.join(self.folder, "copy.jpg")
+        shutil.copy(self.first, self.copy)
+        self.db = FakeDatabase()
+        self.importer = _importer(self.db, hashes={"phash": 7})
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _photo(self, name, noise):
+        path = os.path.join(self.folder, name)
+        Image.effect_noise((320, 240), noise).convert("RGB").save(path)
+        return path
+
+    def _analysed(self, path, analysis_version=None, content_hash_of=None):
+        return self.db.add_photo(
+            1, path, os.path.basename(path),
+            content_hash=content_hash(content_hash_of or path),
+            analysis_version=analysis_version or PhotoImporter.ANALYSIS_VERSION,
+        )
+
+    def _import(self, path):
+        job = ImportJob(Path(path), collection_id=2)
+        self.importer._decode_stage(job)
+        return job
+
+    def test_hit_copies_analysis(self):
+        source_id = self._analysed(self.first)
+        stages = [
+            ("decode", self.importer._decode_stage, 1),
+            ("db", self.importer._db_stage, 1),
+        ]
+        jobs = ImportPipeline(stages).run([ImportJob(Path(self.copy), collection_id=2)])
+
+        self.assertEqual(jobs[0].cached_from, source_id)
+        self.assertEqual(self.db.copies, [(source_id, jobs[0].photo_id)])
+        self.assertEqual(
+            self.db.photos[jobs[0].photo_id]["analysis_version"],
+            PhotoImporter.ANALYSIS_VERSION,
+        )
+
+    def test_hit_when_source_file_is_gone(self):
+        source_id = self._analysed(self.first)
+        shutil.move(self.first, self.first + ".moved")
+        self.assertEqual(self._import(self.copy).cached_from, source_id)
+
+    def test_version_bump_misses(self):
+        version = PhotoImporter.ANALYSIS_VERSION
+        current = (
+            f"scorer{SCORER_VERSION}",
+            f"hash{NearDuplicateDetector.HASH_VERSION}",
+        )
+        for part in current:
+            self.assertIn(part, version)
+        older = (
+            version.replace(current[0], f"scorer{SCORER_VERSION - 1}"),
+            version.replace(current[1], f"hash{NearDuplicateDetector.HASH_VERSION - 1}"),
+        )
+        for analysis_version in older:
+            self._analysed(self.first, analysis_version)
+
+        job = self._import(self.copy)
+        self.assertIsNone(job.cached_from)
+        self.assertIsNotNone(job.context.image())
+
+    def test_content_hash_collision_is_analysed_again(self):
+        # A different file stored under the same sampled content hash
+        other = self._photo("other.jpg", 80)
+        self._analysed(other, content_hash_of=self.copy)
+
+        job = self._import(self.copy)
+        self.assertIsNone(job.cached_from)
+        self.assertIsNotNone(job.context.image())
+
+
+if __name__ == "__main__":
+    unittest.main()
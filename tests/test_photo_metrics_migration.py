@@ -0,0 +1,123 @@
+import os
+import unittest
+
+try:
+    from db import Database
+except ImportError:  # psycopg2 / python-dotenv not installed
+    Database = None
+
+# Runs against a scratch database only; everything is created in a schema
+# of its own, which is dropped afterwards
+TEST_DB_NAME = os.getenv("TEST_DB_NAME")
+
+LEGACY_TABLES = """
+    DROP VIEW scores;
+    DROP VIEW photo_quality;
+    CREATE TABLE scores (
+        id SERIAL PRIMARY KEY,
+        photo_id INT REFERENCES photos(id) ON DELETE CASCADE,
+        type TEXT,
+        value REAL,
+        scaled_value REAL CHECK (scaled_value >= 0 AND scaled_value <= 1)
+    );
+    CREATE TABLE photo_quality (
+        id SERIAL PRIMARY KEY,
+        photo_id INT REFERENCES photos(id) ON DELETE CASCADE,
+        quality_score REAL
+    );
+"""
+
+
+@unittest.skipUnless(
+    Database is not None and TEST_DB_NAME, "set TEST_DB_NAME to a scratch database"
+)
+class PhotoMetricsMigrationTest(unittest.TestCase):
+    SCHEMA = f"metrics_migration_{os.getpid()}"
+
+    def setUp(self):
+        os.environ["DB_NAME"] = TEST_DB_NAME
+        admin = Database()
+        admin.execute(f"CREATE SCHEMA {self.SCHEMA}")
+        admin.close()
+        # Every pooled connection creates and reads tables in the test schema
+        self.pgoptions = os.environ.get("PGOPTIONS")
+        os.environ["PGOPTIONS"] = f"-c search_path={self.SCHEMA}"
+        self.db = Database()
+        self.db.create_schema()
+
+    def tearDown(self):
+        self.db.execute(f"DROP SCHEMA {self.SCHEMA} CASCADE")
+        self.db.close()
+        if self.pgoptions is None:
+            del os.environ["PGOPTIONS"]
+        else:
+            os.environ["PGOPTIONS"] = self.pgoptions
+
+    def test_legacy_rows_are_migrated_and_readable_through_views(self):
+        self.db.execute(LEGACY_TABLES)
+        collection_id = self.db.add_collection("legacy")
+        scored = self.db.add_photo(collection_id, "/a.jpg", "a.jpg")
+        quality_only = self.db.add_photo(collection_id, "/b.jpg", "b.jpg")
+        self.db.execute_values(
+            "INSERT INTO scores (photo_id, type, value, scaled_value) VALUES %s",
+            [
+                (scored, "noise", 5.0, 0.1),
+                (scored, "laplacian_var", 120.0, 0.4),
+                # Rescoring appended rows; the latest one wins
+                (scored, "noise", 3.0, 0.2),
+            ],
+        )
+        self.db.execute_values(
+            "INSERT INTO photo_quality (photo_id, quality_score) VALUES %s",
+            [(scored, 0.5), (scored, 0.75), (quality_only, 0.25)],
+        )
+
+        self.db.create_schema()
+
+        tables = {
+            row["table_name"]: row["table_type"]
+            for row in self.db.fetch(
+                "SELECT table_name, table_type FROM information_schema.tables"
+                " WHERE table_schema = current_schema()"
+            )
+        }
+        self.assertEqual(tables["scores"], "VIEW")
+        self.assertEqual(tables["photo_quality"], "VIEW")
+        self.assertEqual(tables["scores_legacy"], "BASE TABLE")
+        self.assertEqual(tables["photo_quality_legacy"], "BASE TABLE")
+
+        metrics = {
+            row["photo_id"]: row
+            for row in self.db.fetch("SELECT * FROM photo_metrics ORDER BY photo_id")
+        }
+        self.assertEqual(set(metrics), {scored, quality_only})
+        self.assertEqual(metrics[scored]["noise"], 3.0)
+        self.assertAlmostEqual(metrics[scored]["noise_scaled"], 0.2)
+        self.assertEqual(metrics[scored]["laplacian_var"], 120.0)
+        self.assertIsNone(metrics[scored]["entropy"])
+        self.assertEqual(metrics[scored]["quality_score"], 0.75)
+        self.assertIsNone(metrics[quality_only]["noise"])
+        self.assertEqual(metrics[quality_only]["quality_score"], 0.25)
+
+        scores = self.db.fetch(
+            "SELECT photo_id, type, value FROM scores ORDER BY photo_id, type"
+        )
+        self.assertEqual(
+            [(r["photo_id"], r["type"], r["value"]) for r in scores],
+            [(scored, "laplacian_var", 120.0), (scored, "noise", 3.0)],
+        )
+        quality = self.db.fetch(
+            "SELECT id, photo_id, quality_score FROM photo_quality ORDER BY photo_id"
+        )
+        self.assertEqual(
+            [(r["id"], r["photo_id"], r["quality_score"]) for r in quality],
+            [(scored, scored, 0.75), (quality_only, quality_only, 0.25)],
+        )
+
+        # Running the schema again leaves the migrated data alone
+        self.db.create_schema()
+        self.assertEqual(len(self.db.fetch("SELECT * FROM photo_metrics")), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+try:
+    import numpy as np
+    from semantic_duplicates import similar_pairs
+except ImportError:  # numpy / database driver not installed
+    similar_pairs = None
+
+
+@unittest.skipUnless(similar_pairs is not None, "numpy or psycopg2 not installed")
+class SimilarPairsTest(unittest.TestCase):
+    def test_blocked_search_matches_full_matrix(self):
+        rng = np.random.default_rng(3)
+        base = rng.normal(size=(40, 16)).astype(np.float32)
+        # every third row gets a slightly perturbed copy
+        noise = rng.normal(scale=0.05, size=base[::3].shape).astype(np.float32)
+        copies = base[::3] + noise
+        matrix = np.vstack([base, copies])
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+        sims = matrix @ matrix.T
+        expected = {
+            (i, j)
+            for i in range(len(matrix))
+            for j in range(i + 1, len(matrix))
+            if sims[i, j] >= 0.9
+        }
+        for block_size in (7, 16, 1000):
+            found = set(similar_pairs(matrix, 0.9, block_size=block_size))
+            self.assertEqual(found, expected)
+        self.assertGreaterEqual(len(expected), len(copies))
+
+
+if __name__ == "__main__":
+    unittest.main()
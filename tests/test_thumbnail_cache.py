@@ -0,0 +1,59 @@
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    from PIL import Image
+
+    from thumbnail_cache import ThumbnailCache
+except ImportError:  # Pillow / OpenCV / rawpy not installed
+    ThumbnailCache = None
+
+
+@unittest.skipUnless(ThumbnailCache is not None, "Pillow/OpenCV/rawpy not installed")
+class ThumbnailCacheEvictionTest(unittest.TestCase):
+    SIZE = 120
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.image = Image.effect_noise((self.SIZE, self.SIZE), 60).convert("RGB")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _put(self, cache, key):
+        cache.put(key, self.SIZE, self.image)
+        time.sleep(0.01)  # distinct mtimes for the LRU order
+        return cache.path_for(key, self.SIZE)
+
+    def test_least_recently_used_entry_goes_first(self):
+        cache = ThumbnailCache(self.root, max_bytes=1 << 30)
+        entry = self._put(cache, "aa01").stat().st_size
+        # Room for three and a half entries; eviction goes down to 90%
+        cache.max_bytes = int(entry * 3.5)
+        self._put(cache, "bb02")
+        self._put(cache, "cc03")
+        self.assertIsNotNone(cache.get("aa01", self.SIZE))  # now the most recent
+        time.sleep(0.01)
+        self._put(cache, "dd04")
+
+        cached = {key for key in ("aa01", "bb02", "cc03", "dd04")
+                  if cache.path_for(key, self.SIZE).exists()}
+        self.assertEqual(cached, {"aa01", "cc03", "dd04"})
+        self.assertLessEqual(cache._total, cache.max_bytes)
+
+    def test_entry_larger_than_cap_is_kept_until_next_write(self):
+        cache = ThumbnailCache(self.root, max_bytes=100)
+        first = self._put(cache, "aa01")
+        self.assertTrue(first.exists())
+        self.assertIsNotNone(cache.get("aa01", self.SIZE))
+
+        second = self._put(cache, "bb02")
+        self.assertFalse(first.exists())
+        self.assertTrue(second.exists())
+        self.assertEqual(list(cache._index), [second])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+# thumbnail_cache.py
+
+import argparse
+import os
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+from image_context import content_hash, is_raw, open_image
+
+# Pillow resampling compatibility (always define a value)
+try:
+    RESAMPLE_LANCZOS = Image.Resampling.LANCZOS  # type: ignore[attr-defined]
+except (NameError, AttributeError):
+    RESAMPLE_LANCZOS = getattr(Image, "LANCZOS", getattr(Image, "BICUBIC", 0))
+
+# Background used to letterbox square thumbnails
+THUMB_BG = (30, 30, 30)
+
+
+def make_uniform_thumbnail(img, size, bg_color=THUMB_BG):
+    """
+    Create a square, letterboxed thumbnail of side `size` from a PIL image.
+    Preserves aspect ratio (no stretching) and centers on a background.
+    """
+    # Ensure RGB (avoid issues with palette/LA modes)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+
+    # Scale to fit within the square
+    size = int(size)
+    img_copy = img.copy()
+    img_copy.thumbnail((size, size), RESAMPLE_LANCZOS)
+
+    # Create square canvas and paste centered
+    canvas = Image.new("RGB", (size, size), color=bg_color)
+    x = (size - img_copy.width) // 2
+    y = (size - img_copy.height) // 2
+    if img_copy.mode == "RGBA":
+        canvas.paste(img_copy, (x, y), mask=img_copy.split()[-1])
+    else:
+        canvas.paste(img_copy, (x, y))
+    return canvas
+
+
+class ThumbnailCache:
+    """
+    On-disk thumbnail cache keyed by photo content hash.
+
+    For every photo the cache holds a square thumbnail for each grid size and
+    one larger preview. Files are stored as <root>/<key[:2]>/<key>_<size>.jpg.
+    When the cache grows past max_bytes, the least recently used files are
+    deleted (file mtime is bumped on every read). The file just written is
+    never evicted, so a cap smaller than one entry still serves the latest
+    image; it goes with the next write.
+    """
+
+    GRID_SIZES = (80, 120, 180)
+    PREVIEW_SIZE = 1600
+
+    def __init__(self, root=None, max_bytes=None):
+        """
+        :param root: cache directory (default: THUMB_CACHE_DIR or ~/.autocull/thumbnails)
+        :param max_bytes: size cap (default: THUMB_CACHE_MAX_MB, 2048 MB)
+        """
+        self.root = Path(
+            root
+            or os.getenv("THUMB_CACHE_DIR")
+            or Path.home() / ".autocull" / "thumbnails"
+        )
+        if max_bytes is None:
+            max_bytes = int(os.getenv("THUMB_CACHE_MAX_MB", "2048")) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = None  # path -> (bytes, last_used), built on first write
+        self._total = 0
+
+    # ----------------- Lookup -----------------
+    def path_for(self, key: str, size: int) -> Path:
+        return self.root / key[:2] / f"{key}_{int(size)}.jpg"
+
+    def get(self, key: str, size: int):
+        """Return the cached PIL image for key/size, or None on a miss."""
+        if not key:
+            return None
+        path = self.path_for(key, size)
+        try:
+            img = Image.open(path)
+            img.load()
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return img
+
+    def thumbnail(self, file_path, size, key=None):
+        """
+        Square thumbnail for a photo, rendered from the original on a miss.
+        Returns None if the photo cannot be read.
+        """
+        key = key or content_hash(file_path)
+        img = self.get(key, size)
+        if img is None:
+            img = self.store_all(key, self._open(file_path), extra_sizes=(size,)).get(size)
+        return img
+
+    def preview(self, file_path, key=None):
+        """Large preview (longest side PREVIEW_SIZE) for a photo."""
+        key = key or content_hash(file_path)
+        img = self.get(key, self.PREVIEW_SIZE)
+        if img is None:
+            img = self.store_all(key, self._open(file_path)).get(self.PREVIEW_SIZE)
+        return img
+
+    # ----------------- Writing -----------------
+    def store_all(self, key: str, image, extra_sizes=()):
+        """
+        Render and store every cached size from an already decoded image.
+
+        :return: dict size -> rendered PIL image
+        """
+        rendered = {}
+        for size in sorted(set(self.GRID_SIZES) | set(extra_sizes)):
+            rendered[size] = make_uniform_thumbnail(image, size)
+        preview = image.convert("RGB") if image.mode != "RGB" else image.copy()
+        preview.thumbnail((self.PREVIEW_SIZE, self.PREVIEW_SIZE), RESAMPLE_LANCZOS)
+        rendered[self.PREVIEW_SIZE] = preview
+
+        for size, img in rendered.items():
+            self.put(key, size, img)
+        return rendered
+
+    def put(self, key: str, size: int, image):
+        """Write one image to the cache and evict old entries if over the cap."""
+        path = self.path_for(key, size)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        quality = 90 if size == self.PREVIEW_SIZE else 85
+        image.save(tmp, "JPEG", quality=quality)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._load_index()
+            old = self._index.get(path)
+            if old:
+                self._total -= old[0]
+            stat = path.stat()
+            self._index[path] = (stat.st_size, stat.st_mtime)
+            self._total += stat.st_size
+            if self._total > self.max_bytes:
+                self._evict(keep=path)
+
+    # ----------------- LRU bookkeeping -----------------
+    def _touch(self, path: Path):
+        try:
+            os.utime(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._index is not None and path in self._index:
+                self._index[path] = (self._index[path][0], path.stat().st_mtime)
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total = 0
+        if self.root.exists():
+            for path in self.root.glob("*/*.jpg"):
+                stat = path.stat()
+                self._index[path] = (stat.st_size, stat.st_mtime)
+                self._total += stat.st_size
+
+    def _evict(self, keep=None):
+        """Drop least recently used files (except keep) until the cache is 90% of its cap."""
+        target = self.max_bytes * 0.9
+        for path, (nbytes, _) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            self._total -= nbytes
+            del self._index[path]
+
+    @staticmethod
+    def _open(file_path):
+        img = open_image(
+            file_path, raw=is_raw(file_path), max_dim=ThumbnailCache.PREVIEW_SIZE
+        )
+        return img if img.mode in ("RGB", "RGBA") else img.convert("RGB")
+
+    # ----------------- Rebuild -----------------
+    def rebuild(self, db, collection_id=None):
+        """
+        Regenerate cached thumbnails for existing photos.
+        Photos imported before content hashes existed get one stored.
+
+        :return: number of photos rendered
+        """
+        rendered = 0
+        for photo in db.get_photos(collection_id):
+            path = photo["file_path"]
+            try:
+                key = photo.get("content_hash")
+                if not key:
+                    key = content_hash(path)
+                    db.set_photo_content_hash(photo["id"], key)
+                self.store_all(key, self._open(path))
+                rendered += 1
+            except (OSError, ValueError) as e:
+                print(f"Failed to render thumbnails for {path}: {e}")
+        print(f"Rendered thumbnails for {rendered} photos into {self.root}")
+        return rendered
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Return the shared ThumbnailCache, creating it on first call."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ThumbnailCache()
+        return _cache
+
+
+if __name__ == "__main__":
+    from db import Database
+
+    parser = argparse.ArgumentParser(description="Manage the AutoCull thumbnail cache.")
+    parser.add_argument(
+        "--rebuild", action="store_true", help="re-render thumbnails for existing photos"
+    )
+    parser.add_argument("--collection", type=int, help="only this collection id")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        get_thumbnail_cache().rebuild(Database(), args.collection)
+    else:
+        parser.print_help()
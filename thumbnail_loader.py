@@ -0,0 +1,124 @@
+# thumbnail_loader.py
+
+import itertools
+import queue
+import threading
+import tkinter as tk
+
+from PIL import ImageTk
+
+
+class _Request:
+    """One pending thumbnail: what to load and who to hand it to."""
+
+    __slots__ = ("key", "load", "callback", "priority", "cancelled")
+
+    def __init__(self, key, load, callback, priority):
+        self.key = key
+        self.load = load
+        self.callback = callback
+        self.priority = priority
+        self.cancelled = False
+
+
+class ThumbnailLoader:
+    """
+    Loads thumbnails on background threads and delivers them to Tk.
+
+    `load` functions run on a worker thread and return a PIL image (or None).
+    Finished images are turned into ImageTk.PhotoImage objects and passed to
+    their callbacks on the Tk thread, a batch at a time, from an `after` loop.
+    Lower priority numbers are served first; a request is cancelled when it is
+    replaced by a new request with the same key or by cancel().
+    """
+
+    def __init__(self, widget, workers=4, interval=30, max_batch=24):
+        """
+        :param widget: any Tk widget; used to schedule work on the Tk thread
+        :param workers: number of decoding threads
+        :param interval: milliseconds between deliveries to Tk
+        :param max_batch: maximum thumbnails handed to Tk per delivery
+        """
+        self.widget = widget
+        self.interval = interval
+        self.max_batch = max_batch
+        self._requests = queue.PriorityQueue()
+        self._done = queue.Queue()
+        self._pending = {}  # key -> _Request, only touched on the Tk thread
+        self._seq = itertools.count()  # keeps FIFO order within a priority
+        self._drain_id = None
+        for n in range(workers):
+            threading.Thread(
+                target=self._work, name=f"thumb-loader-{n}", daemon=True
+            ).start()
+
+    # ----------------- Tk thread API -----------------
+    def request(self, key, load, callback, priority=0):
+        """
+        Queue a thumbnail load, replacing any pending request for `key`.
+
+        :param key: identifies the requester (e.g. the tile widget)
+        :param load: callable run on a worker; returns a PIL image or None
+        :param callback: called on the Tk thread with an ImageTk.PhotoImage or None
+        :param priority: lower is served first (0 = visible on screen)
+        """
+        self.cancel(key)
+        req = _Request(key, load, callback, priority)
+        self._pending[key] = req
+        self._requests.put((priority, next(self._seq), req))
+        self._schedule_drain()
+
+    def priority_of(self, key):
+        """Priority of the pending request for key, or None if nothing is pending."""
+        req = self._pending.get(key)
+        return req.priority if req is not None else None
+
+    def cancel(self, key):
+        """Cancel the pending request for key, if any."""
+        req = self._pending.pop(key, None)
+        if req is not None:
+            req.cancelled = True
+
+    def cancel_all(self):
+        for req in self._pending.values():
+            req.cancelled = True
+        self._pending.clear()
+
+    # ----------------- Internals -----------------
+    def _work(self):
+        while True:
+            _, _, req = self._requests.get()
+            if req.cancelled:
+                continue
+            try:
+                img = req.load()
+            except Exception as e:
+                print(f"Failed to load thumbnail for {req.key}: {e}")
+                img = None
+            if not req.cancelled:
+                self._done.put((req, img))
+
+    def _schedule_drain(self):
+        if self._drain_id is None:
+            try:
+                self._drain_id = self.widget.after(self.interval, self._drain)
+            except tk.TclError:
+                pass  # widget destroyed
+
+    def _drain(self):
+        """Hand up to max_batch finished thumbnails to their callbacks."""
+        self._drain_id = None
+        for _ in range(self.max_batch):
+            try:
+                req, img = self._done.get_nowait()
+            except queue.Empty:
+                break
+            if req.cancelled or self._pending.get(req.key) is not req:
+                continue
+            del self._pending[req.key]
+            try:
+                req.callback(ImageTk.PhotoImage(img) if img is not None else None)
+            except tk.TclError:
+                pass  # target widget went away
+        if self._pending or not self._done.empty():
+            self._schedule_drain()